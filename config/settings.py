@@ -12,13 +12,46 @@ NCBI_API_KEY = os.getenv("NCBI_API_KEY")
 
 DRUG_DB_PATH = Path(os.getenv("DRUG_DB_PATH", "data/drug_db/medex_data.json"))
 GUIDELINE_DIR = Path(os.getenv("GUIDELINE_DIR", "data/processed"))
+# Compacted columnar copy of GUIDELINE_DIR; ingestion reads it while its file
+# digests still match GUIDELINE_DIR
+CORPUS_PATH = Path(os.getenv("CORPUS_PATH", "data/corpus.arrow"))
 VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")  # chroma | faiss
 PERSIST_DIRECTORY = Path(os.getenv("PERSIST_DIRECTORY", "chroma_db"))
+FAISS_INDEX_DIR = Path(os.getenv("FAISS_INDEX_DIR", "faiss_index"))
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")  # flat | hnsw | ivf
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))  # 0: 4·sqrt(n)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+FAISS_STORAGE = os.getenv("FAISS_STORAGE", "float32")  # float32 | fp16 | int8 | pq
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "96"))  # PQ sub-quantizers; must divide dim
+FAISS_RESCORE_FACTOR = int(os.getenv("FAISS_RESCORE_FACTOR", "4"))
+# Split the store into independently rebuilt shards: "" (one store) | source_type
+# (bangladesh / global) | condition (one per disease topic)
+SHARD_BY = os.getenv("SHARD_BY", "")
+# Added to the score of hits from SHARD_LOCAL shards: the cosine when merging
+# shards, then the (0–1) rerank score before per-condition fusion
+SHARD_LOCAL = [s for s in os.getenv("SHARD_LOCAL", "bangladesh").split(",") if s]
+SHARD_LOCAL_BOOST = float(os.getenv("SHARD_LOCAL_BOOST", "0.05"))
+# Also build a PCA-reduced first-pass index of this many dims at ingest (0 = off)
+FAISS_REDUCED_DIM = int(os.getenv("FAISS_REDUCED_DIM", "0"))
 EMBEDDING_MODEL = os.getenv(
     "EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2"
 )
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "256"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "32"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+INGEST_QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "4"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "0"))  # >1: multi-process CPU engine
+EMBED_CACHE_DIR = Path(os.getenv("EMBED_CACHE_DIR", "cache/embeddings"))
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "512"))  # 0 disables
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "torch")  # torch | onnx (embedder + reranker)
+ONNX_MODEL_DIR = Path(os.getenv("ONNX_MODEL_DIR", "models/onnx"))
+# MinHash Jaccard above which two guideline records count as duplicates; 0 disables
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
 
 CONDITION_MIN_CONFIDENCE = float(os.getenv("MIN_CONDITION_CONF", "0.8"))
 ICD10_MAPPING_PATH = Path(
@@ -27,9 +60,41 @@ ICD10_MAPPING_PATH = Path(
 
 
 RETRIEVER_TOP_K = int(os.getenv("RETRIEVER_TOP_K", "5"))
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # dense | hybrid (dense + BM25)
+# FAISS first pass: full | reduced (FAISS_REDUCED_DIM index, full-dim rescoring of
+# RETRIEVER_FIRST_PASS_CANDIDATES per query)
+RETRIEVER_FIRST_PASS = os.getenv("RETRIEVER_FIRST_PASS", "full")
+RETRIEVER_FIRST_PASS_CANDIDATES = int(
+    os.getenv("RETRIEVER_FIRST_PASS_CANDIDATES", "200")
+)
+RETRIEVER_RRF_K = int(os.getenv("RETRIEVER_RRF_K", "60"))
+# Max results any one condition may fill; 0 → ceil(top_k / number of conditions)
+RETRIEVER_CONDITION_QUOTA = int(os.getenv("RETRIEVER_CONDITION_QUOTA", "0"))
+# Search only the condition-tag partitions a condition maps to via
+# ICD10_MAPPING_PATH; retry globally below RETRIEVER_MIN_PARTITION_HITS (0 → top-k)
+RETRIEVER_PREFILTER = os.getenv("RETRIEVER_PREFILTER", "1") == "1"
+RETRIEVER_MIN_PARTITION_HITS = int(os.getenv("RETRIEVER_MIN_PARTITION_HITS", "0"))
+# Maximal-marginal-relevance pick of the top-k from RETRIEVER_MMR_POOL·top-k fused
+# candidates: 1 → relevance only (off), lower → more diverse
+RETRIEVER_MMR_LAMBDA = float(os.getenv("RETRIEVER_MMR_LAMBDA", "0.7"))
+RETRIEVER_MMR_POOL = int(os.getenv("RETRIEVER_MMR_POOL", "3"))
+# In-process caches of query embeddings and of final results per condition set;
+# cleared when ingestion changes the index. 0 MB disables a level.
+QUERY_CACHE_MB = int(os.getenv("QUERY_CACHE_MB", "16"))
+RESULT_CACHE_MB = int(os.getenv("RESULT_CACHE_MB", "64"))
+RETRIEVER_CACHE_TTL = float(os.getenv("RETRIEVER_CACHE_TTL", "3600"))  # seconds
+# Serve known conditions (and the CONTEXT_TABLE_PAIRS most common pairs) from a
+# table precomputed after ingestion; see src/guideline_retriever/context_table.py
+CONTEXT_TABLE = os.getenv("CONTEXT_TABLE", "1") == "1"
+CONTEXT_TABLE_PAIRS = int(os.getenv("CONTEXT_TABLE_PAIRS", "200"))
 RERANK_CROSS_ENCODER = os.getenv(
     "RERANK_CROSS_ENCODER", "cross-encoder/ms-marco-MiniLM-L-6-v2"
 )
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+# Stop reranking a condition once the next candidate's dense score trails its
+# dense top-k by this share of its score range (0 → score every candidate)
+RERANK_STOP_GAP = float(os.getenv("RERANK_STOP_GAP", "0.25"))
+RERANK_CACHE_ENTRIES = int(os.getenv("RERANK_CACHE_ENTRIES", "50000"))  # 0 disables
 
 
 LLM_MODEL_NAME = os.getenv(
@@ -38,3 +103,20 @@ LLM_MODEL_NAME = os.getenv(
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", "256"))
 REPLY_TEMPERATURE = float(os.getenv("REPLY_TEMPERATURE", "0.3"))
 USE_4BIT_QUANT = os.getenv("USE_4BIT_QUANT", "true").lower() == "true"
+# transformers (HF model, GPU-oriented) | llama_cpp (GGUF int4/int8 on CPU)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "transformers")
+LLM_GGUF_PATH = Path(os.getenv("LLM_GGUF_PATH", "models/gguf/model.Q4_K_M.gguf"))
+LLM_CONTEXT = int(os.getenv("LLM_CONTEXT", "4096"))  # llama_cpp context window
+LLM_THREADS = int(os.getenv("LLM_THREADS", "0"))  # llama_cpp threads, 0 → all cores
+# Prefill the fixed system-prompt preamble once and reuse its KV cache
+LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "1") == "1"
+# Generated guidelines, persisted and shared by all workers (SQLite)
+ANSWER_CACHE_PATH = Path(os.getenv("ANSWER_CACHE_PATH", "cache/answers.sqlite"))
+ANSWER_CACHE_MB = int(os.getenv("ANSWER_CACHE_MB", "256"))  # 0 disables
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 86400)))  # seconds
+# Micro-batching of concurrent /guidelines requests into one generate call:
+# up to GEN_MAX_BATCH prompts, waiting at most GEN_BATCH_WAIT_MS for them
+# (GEN_MAX_BATCH=1 → one generate call per request)
+GEN_MAX_BATCH = int(os.getenv("GEN_MAX_BATCH", "8"))
+GEN_BATCH_WAIT_MS = float(os.getenv("GEN_BATCH_WAIT_MS", "20"))
+GEN_MAX_QUEUE = int(os.getenv("GEN_MAX_QUEUE", "64"))
@@ -1,3 +1,6 @@
+import json
+from typing import Iterator
+
 import gradio as gr
 import httpx
 from src.condition_extractor.schemas import Condition
@@ -5,15 +8,34 @@ from src.rag_generator.schemas import PatientGuideline
 from src.guideline_formatter.formatter import to_markdown
 
 DIAGNOSE_URL = "http://localhost:8000/diagnose"
-GUIDELINES_URL = "http://localhost:8000/guidelines"
+GUIDELINES_URL = "http://localhost:8000/guidelines/stream"
 HTTP_TIMEOUT = 30
 
 
-def run_pipeline(medicines: str) -> str:
+def _sse_events(response: httpx.Response) -> Iterator[tuple]:
+    """(event, decoded data) pairs from a text/event-stream response."""
+    event, data = "message", []
+    for line in response.iter_lines():
+        if line.startswith("event:"):
+            event = line[len("event:") :].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:") :].strip())
+        elif not line and data:
+            yield event, json.loads("\n".join(data))
+            event, data = "message", []
+
+
+def _partial_markdown(reply: str) -> str:
+    """Reply-so-far, shown while the model is still writing."""
+    return f"### 🏥 Writing your guideline…\n\n{reply}▌"
+
+
+def run_pipeline(medicines: str) -> Iterator[str]:
     """End-to-end pipeline: medicines → conditions → guidelines → markdown"""
     meds = [m.strip() for m in medicines.split(",") if m.strip()]
     if not meds:
-        return "❌ No medicines provided."
+        yield "❌ No medicines provided."
+        return
 
     with httpx.Client(timeout=HTTP_TIMEOUT) as client:
         # 1. Drug matching
@@ -21,7 +43,8 @@ def run_pipeline(medicines: str) -> str:
         r1.raise_for_status()
         drugs = r1.json().get("matched_drugs", [])
         if not drugs:
-            return "❌ No drug matches found."
+            yield "❌ No drug matches found."
+            return
 
         # 2. Build condition list with exact Pydantic schema
         conditions = []
@@ -38,13 +61,25 @@ def run_pipeline(medicines: str) -> str:
                 )
 
         if not conditions:
-            return "❌ No indications extracted."
+            yield "❌ No indications extracted."
+            return
 
-        # 3. Generate & format guideline
-        r2 = client.post(GUIDELINES_URL, json=conditions)
-        r2.raise_for_status()
-        guideline = PatientGuideline(**r2.json()["guideline"])
-        return to_markdown(guideline)
+        # 3. Generate & format guideline, showing tokens as they arrive
+        reply = ""
+        with client.stream(
+            "POST", GUIDELINES_URL, json=conditions, timeout=None
+        ) as r2:
+            r2.raise_for_status()
+            for event, data in _sse_events(r2):
+                if event == "token":
+                    reply += data
+                    yield _partial_markdown(reply)
+                elif event == "guideline":
+                    guideline = PatientGuideline(**data["guideline"])
+                    yield to_markdown(guideline)
+                elif event == "error":
+                    note = f"❌ Generation stopped: {data['detail']}"
+                    yield f"{data['markdown']}\n\n{note}"
 
 
 iface = gr.Interface(
@@ -59,4 +94,5 @@ iface = gr.Interface(
 )
 
 if __name__ == "__main__":
-    iface.launch(server_name="0.0.0.0", server_port=7860, share=False)
+    # Queueing lets the generator function push partial output
+    iface.queue().launch(server_name="0.0.0.0", server_port=7860, share=False)
@@ -0,0 +1,118 @@
+"""
+Generation throughput of single-request generate calls vs micro-batching.
+
+    python -m src.benchmarks.generation [--requests 16] [--concurrency 8]
+        [--max-batch 8] [--wait-ms 20]
+
+Each request is one condition name from data/mappings/icd10_keywords.json
+with the chunks `GuidelineRetriever` returns for it, cycled to `--requests`.
+"single" runs one `generate_batch([request])` per request, one after another,
+which is what concurrent requests amount to without batching. "batched"
+submits all requests from `--concurrency` client threads to a
+`GenerationScheduler`. Both report requests/s and per-request latency;
+"batched" also reports the scheduler's batch sizes, queue depth and waits.
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from pathlib import Path
+
+import numpy as np
+
+from src.rag_generator.scheduler import GenerationScheduler
+
+
+def _summary(latencies: list, elapsed: float) -> dict:
+    ms = 1000 * np.asarray(latencies)
+    return {
+        "requests_per_s": round(len(latencies) / elapsed, 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+    }
+
+
+def compare_batching(
+    generate_batch,
+    requests: list,
+    concurrency: int = 8,
+    max_batch: int = 8,
+    max_wait_ms: float = 20.0,
+) -> dict:
+    """`generate_batch(requests) -> results`, e.g. `RAGGenerator.generate_batch`."""
+    latencies = []
+    start = time.perf_counter()
+    for request in requests:
+        t0 = time.perf_counter()
+        generate_batch([request])
+        latencies.append(time.perf_counter() - t0)
+    single = _summary(latencies, time.perf_counter() - start)
+
+    scheduler = GenerationScheduler(
+        generate_batch, max_batch, max_wait_ms, max_queue=len(requests)
+    )
+
+    def _timed(request) -> float:
+        t0 = time.perf_counter()
+        scheduler.submit(request)
+        return time.perf_counter() - t0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(_timed, requests))
+    batched = _summary(latencies, time.perf_counter() - start)
+    batched["scheduler"] = scheduler.stats()
+
+    return {
+        "n_requests": len(requests),
+        "concurrency": concurrency,
+        "max_batch": max_batch,
+        "max_wait_ms": max_wait_ms,
+        "single": single,
+        "batched": batched,
+        "speedup": round(batched["requests_per_s"] / single["requests_per_s"], 2),
+    }
+
+
+def _main() -> None:
+    from config.settings import GEN_BATCH_WAIT_MS, GEN_MAX_BATCH, ICD10_MAPPING_PATH
+    from src.condition_extractor.schemas import Condition
+    from src.guideline_retriever.retriever import GuidelineRetriever
+    from src.rag_generator.generator import RAGGenerator
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-batch", type=int, default=max(2, GEN_MAX_BATCH))
+    parser.add_argument("--wait-ms", type=float, default=GEN_BATCH_WAIT_MS)
+    parser.add_argument("--out", type=Path, help="also write the results here as JSON")
+    args = parser.parse_args()
+
+    mapping = json.loads(Path(ICD10_MAPPING_PATH).read_text())
+    names = list(dict.fromkeys(e["conditions"][0] for e in mapping.values()))
+    retriever = GuidelineRetriever()
+    requests = []
+    for name in islice(cycle(names), args.requests):
+        conditions = [Condition(name=name, icd10=None, confidence=1.0)]
+        requests.append((conditions, retriever.retrieve(conditions)[0]))
+
+    generator = RAGGenerator(max_batch=1)
+    report = json.dumps(
+        compare_batching(
+            generator.generate_batch,
+            requests,
+            args.concurrency,
+            args.max_batch,
+            args.wait_ms,
+        ),
+        indent=2,
+    )
+    print(report)
+    if args.out:
+        args.out.write_text(report)
+
+
+if __name__ == "__main__":
+    _main()
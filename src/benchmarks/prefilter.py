@@ -0,0 +1,126 @@
+"""
+Latency vs. recall of condition-tag pre-filtering against global search.
+
+    python -m src.benchmarks.prefilter [--k 10] [--repeat 5]
+
+Queries are the condition names of data/mappings/icd10_keywords.json that map
+to at least one partition of the local store. For each, the global and the
+partition-filtered top-k are compared: `overlap@k` is the share of the global
+top-k the filtered search keeps, `on_topic@k` the share of hits tagged with
+one of the condition's partitions.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.condition_extractor.schemas import Condition
+from src.guideline_retriever.partitions import PartitionMap
+from src.guideline_retriever.search import SearchBackend, chunk_tags
+
+
+def _timed_search(backend: SearchBackend, vec, k, query, tags, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hits = backend.search(vec, k, [query], [tags] if tags else None)[0]
+        best = min(best, time.perf_counter() - start)
+    return hits, best
+
+
+def compare_prefilter(
+    backend: SearchBackend,
+    partitions: PartitionMap,
+    embedder,
+    conditions: list,
+    k: int = 10,
+    repeat: int = 5,
+) -> dict:
+    mapped = [(c, partitions.tags_for(c)) for c in conditions]
+    mapped = [(c, tags) for c, tags in mapped if tags]
+    vecs = embedder.encode([c.name for c, _ in mapped])
+
+    rows = []
+    for (cond, tags), vec in zip(mapped, vecs):
+        vec = vec[None, :]
+        global_hits, global_s = _timed_search(backend, vec, k, cond.name, None, repeat)
+        part_hits, part_s = _timed_search(backend, vec, k, cond.name, tags, repeat)
+        wanted = set(tags)
+        global_ids = {c.chunk_id for c in global_hits}
+        rows.append(
+            {
+                "condition": cond.name,
+                "tags": tags,
+                "global_ms": 1000 * global_s,
+                "filtered_ms": 1000 * part_s,
+                "overlap": len(global_ids & {c.chunk_id for c in part_hits}) / k,
+                "global_on_topic": np.mean(
+                    [bool(chunk_tags(c) & wanted) for c in global_hits] or [0.0]
+                ),
+                "filtered_on_topic": np.mean(
+                    [bool(chunk_tags(c) & wanted) for c in part_hits] or [0.0]
+                ),
+                "short": len(part_hits) < k,
+            }
+        )
+
+    def mean(key):
+        return round(float(np.mean([r[key] for r in rows])), 4) if rows else None
+
+    return {
+        "k": k,
+        "n_conditions": len(conditions),
+        "n_mapped": len(rows),
+        "global_ms_per_query": mean("global_ms"),
+        "filtered_ms_per_query": mean("filtered_ms"),
+        f"overlap@{k}": mean("overlap"),
+        f"global_on_topic@{k}": mean("global_on_topic"),
+        f"filtered_on_topic@{k}": mean("filtered_on_topic"),
+        "fallback_rate": mean("short"),
+        "per_condition": [
+            {key: (round(v, 4) if isinstance(v, float) else v) for key, v in r.items()}
+            for r in rows
+        ],
+    }
+
+
+def _main() -> None:
+    from config.settings import (
+        EMBEDDING_MODEL,
+        ICD10_MAPPING_PATH,
+        RETRIEVAL_MODE,
+        VECTOR_STORE_BACKEND,
+    )
+    from src.data_ingestion.embedders import Embedder
+    from src.guideline_retriever.search import build_search_backend
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mode", default=RETRIEVAL_MODE, choices=["dense", "hybrid"])
+    parser.add_argument("--out", type=Path, help="also write the results here as JSON")
+    args = parser.parse_args()
+
+    backend = build_search_backend(VECTOR_STORE_BACKEND, args.mode)
+    partitions = PartitionMap(ICD10_MAPPING_PATH, backend.condition_tags())
+    mapping = json.loads(Path(ICD10_MAPPING_PATH).read_text())
+    conditions = [
+        Condition(name=entry["conditions"][0], icd10=entry.get("icd10"), confidence=1.0)
+        for entry in mapping.values()
+    ]
+    report = json.dumps(
+        compare_prefilter(
+            backend, partitions, Embedder(EMBEDDING_MODEL), conditions, args.k, args.repeat
+        ),
+        indent=2,
+    )
+    print(report)
+    if args.out:
+        args.out.write_text(report)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,85 @@
+"""
+Prefill time per request with and without the system-prompt prefix cache.
+
+    python -m src.benchmarks.prefix_cache [--requests 16] [--repeat 2]
+
+Prompts are built as `RAGGenerator` builds them: one condition name from
+data/mappings/icd10_keywords.json with the chunks `GuidelineRetriever`
+returns for it. Each is run through the transformers backend with a single
+new token, so the time is prefill plus one decode step: first with the
+whole prompt prefilled, then starting from a copy of the warmed prefix cache.
+"""
+
+import argparse
+import json
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+import numpy as np
+
+
+def _timings(backend, prompts: list, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        for prompt in prompts:
+            start = time.perf_counter()
+            backend.generate([prompt])
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def compare_prefix_cache(backend, prompts: list, prefix: str, repeat: int = 2) -> dict:
+    """`backend` must not have a warmed prefix yet; it has one afterwards."""
+    cold = 1000 * np.asarray(_timings(backend, prompts, repeat))
+    backend.warm_prefix(prefix)
+    warm = 1000 * np.asarray(_timings(backend, prompts, repeat))
+    return {
+        "n_prompts": len(prompts),
+        "repeat": repeat,
+        **backend.stats(),
+        "full_prefill": {
+            "p50_ms": round(float(np.percentile(cold, 50)), 1),
+            "mean_ms": round(float(cold.mean()), 1),
+        },
+        "cached_prefix": {
+            "p50_ms": round(float(np.percentile(warm, 50)), 1),
+            "mean_ms": round(float(warm.mean()), 1),
+        },
+        "saved_per_request_ms": round(float(cold.mean() - warm.mean()), 1),
+    }
+
+
+def _main() -> None:
+    from config.settings import ICD10_MAPPING_PATH, REPLY_TEMPERATURE
+    from src.condition_extractor.schemas import Condition
+    from src.guideline_retriever.retriever import GuidelineRetriever
+    from src.rag_generator.backends import TransformersBackend
+    from src.rag_generator.generator import PROMPT_PREFIX, RAGGenerator
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--out", type=Path, help="also write the results here as JSON")
+    args = parser.parse_args()
+
+    mapping = json.loads(Path(ICD10_MAPPING_PATH).read_text())
+    names = list(dict.fromkeys(e["conditions"][0] for e in mapping.values()))
+    retriever = GuidelineRetriever()
+    prompts = []
+    for name in islice(cycle(names), args.requests):
+        conditions = [Condition(name=name, icd10=None, confidence=1.0)]
+        chunks, _ = retriever.retrieve(conditions)
+        prompts.append(RAGGenerator._prompt(conditions, chunks))
+
+    backend = TransformersBackend(max_tokens=1, temperature=REPLY_TEMPERATURE)
+    report = json.dumps(
+        compare_prefix_cache(backend, prompts, PROMPT_PREFIX, args.repeat), indent=2
+    )
+    print(report)
+    if args.out:
+        args.out.write_text(report)
+
+
+if __name__ == "__main__":
+    _main()
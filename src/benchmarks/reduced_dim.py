@@ -0,0 +1,129 @@
+"""
+Recall@k and latency of two-stage search (PCA-reduced first pass, full-dim
+rescoring) against full-dimension search over the ingested vectors.
+
+    python -m src.benchmarks.reduced_dim [--dims 64 128 256] [--candidates 200]
+
+Queries are sampled corpus vectors with their own row excluded, as in
+`vector_compression`; ground truth is exact inner-product search over the
+float32 rows. For each reduced dimension, recall is reported for the first
+pass alone and after rescoring each candidate-pool size, as
+`FaissIndex.search` does with RETRIEVER_FIRST_PASS=reduced.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from src.benchmarks.vector_compression import _drop_self, _recall
+from src.data_ingestion.faiss_store import (
+    VECTORS_FILE,
+    build_faiss_index,
+    build_reduced_index,
+    exact_rescore,
+)
+
+
+def compare_reduced(
+    vectors: np.ndarray,
+    dims=(64, 128, 256),
+    candidates=(100, 200, 400),
+    n_queries: int = 500,
+    k: int = 10,
+    index_type: str = "flat",
+    seed: int = 0,
+) -> list:
+    """One result dict per reduced dim; `vectors` must be L2-normalised."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+    queries = np.ascontiguousarray(vectors[picks])
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k + 1)
+    truth = _drop_self(truth, picks, k)
+
+    full = build_faiss_index(vectors, index_type)
+    start = time.perf_counter()
+    _, found = full.search(queries, k + 1)
+    full_s = time.perf_counter() - start
+    results = [
+        {
+            "dim": vectors.shape[1],
+            "index_type": index_type,
+            "index_bytes": len(faiss.serialize_index(full)),
+            "ms_per_query": round(1000 * full_s / len(queries), 4),
+            f"recall@{k}": round(_recall(_drop_self(found, picks, k), truth), 4),
+        }
+    ]
+
+    for dim in dims:
+        start = time.perf_counter()
+        index = build_reduced_index(vectors, dim, index_type)
+        if index is None:
+            continue
+        row = {
+            "dim": dim,
+            "index_type": index_type,
+            "index_bytes": len(faiss.serialize_index(index)),
+            "build_s": round(time.perf_counter() - start, 3),
+        }
+        start = time.perf_counter()
+        _, coarse = index.search(queries, k + 1)
+        row["first_pass_ms_per_query"] = round(
+            1000 * (time.perf_counter() - start) / len(queries), 4
+        )
+        row[f"first_pass_recall@{k}"] = round(
+            _recall(_drop_self(coarse, picks, k), truth), 4
+        )
+        for n_cand in candidates:
+            start = time.perf_counter()
+            _, cand = index.search(queries, max(n_cand, k) + 1)
+            _, rescored = exact_rescore(vectors, queries, cand, k + 1)
+            elapsed = time.perf_counter() - start
+            rescored = _drop_self(rescored, picks, k)
+            row[f"rescored_{n_cand}"] = {
+                "ms_per_query": round(1000 * elapsed / len(queries), 4),
+                f"recall@{k}": round(_recall(rescored, truth), 4),
+            }
+        results.append(row)
+    return results
+
+
+def _main() -> None:
+    from config.settings import FAISS_INDEX_DIR, FAISS_INDEX_TYPE
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--index-dir", type=Path, default=Path(FAISS_INDEX_DIR))
+    parser.add_argument("--index-type", default=FAISS_INDEX_TYPE)
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[100, 200, 400])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--out", type=Path, help="also write the results here as JSON")
+    args = parser.parse_args()
+
+    vectors = np.load(args.index_dir / VECTORS_FILE)
+    results = compare_reduced(
+        vectors,
+        dims=args.dims,
+        candidates=args.candidates,
+        n_queries=args.queries,
+        k=args.k,
+        index_type=args.index_type,
+    )
+    report = json.dumps(
+        {"n_vectors": len(vectors), "dim": vectors.shape[1], "results": results},
+        indent=2,
+    )
+    print(report)
+    if args.out:
+        args.out.write_text(report)
+
+
+if __name__ == "__main__":
+    _main()
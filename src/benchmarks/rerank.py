@@ -0,0 +1,132 @@
+"""
+Rerank latency before and after truncation, length bucketing, pair caching
+and early cutoff.
+
+    python -m src.benchmarks.rerank [--k 5] [--repeat 3] [--stop-gap 0.25]
+
+Each query is one condition name from data/mappings/icd10_keywords.json with
+its 2·k dense candidates, as the retriever reranks them. "before" scores every
+full-text pair in one `predict` call, as the retriever used to; "after" goes
+through `Reranker` with an empty pair cache, "after_warm" with the cache left
+from the previous pass. `topk_agreement` is the share of the baseline rerank
+top-k the reranker returns.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.guideline_retriever.rerank import Reranker
+
+
+def _percentiles(samples: list) -> dict:
+    ms = 1000 * np.asarray(samples)
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def _baseline(model, query, hits, k):
+    scores = np.asarray(model.predict([(query, c.text) for c in hits])).ravel()
+    return [hits[i].chunk_id for i in np.argsort(-scores)[:k]]
+
+
+def compare_rerank(
+    model,
+    candidates: list,
+    k: int = 5,
+    repeat: int = 3,
+    stop_gap: float = 0.25,
+    batch_size: int = 32,
+) -> dict:
+    """`candidates` holds (query, dense hits) per query."""
+    timings = {"before": [], "after": [], "after_warm": []}
+    agreement, scored = [], []
+    for _ in range(repeat):
+        reranker = Reranker(
+            model, k, batch_size=batch_size, stop_gap=stop_gap, cache_entries=100_000
+        )
+        for query, hits in candidates:
+            start = time.perf_counter()
+            reference = _baseline(model, query, hits, k)
+            timings["before"].append(time.perf_counter() - start)
+
+            for label in ("after", "after_warm"):
+                copies = [c.copy() for c in hits]
+                start = time.perf_counter()
+                ranked = reranker.rerank([query], [copies])[0]
+                timings[label].append(time.perf_counter() - start)
+            top = {c.chunk_id for c in ranked[:k]}
+            agreement.append(len(top & set(reference)) / max(1, len(reference)))
+            scored.append(len(ranked) / max(1, len(hits)))
+
+    return {
+        "k": k,
+        "n_queries": len(candidates),
+        "repeat": repeat,
+        "stop_gap": stop_gap,
+        **{label: _percentiles(t) for label, t in timings.items()},
+        f"top{k}_agreement": round(float(np.mean(agreement)), 4),
+        "share_of_pairs_scored": round(float(np.mean(scored)), 4),
+    }
+
+
+def _main() -> None:
+    from config.settings import (
+        EMBEDDING_MODEL,
+        ICD10_MAPPING_PATH,
+        MODEL_BACKEND,
+        ONNX_MODEL_DIR,
+        RERANK_BATCH_SIZE,
+        RERANK_CROSS_ENCODER,
+        RERANK_STOP_GAP,
+        RETRIEVAL_MODE,
+        VECTOR_STORE_BACKEND,
+    )
+    from src.data_ingestion.embedders import Embedder
+    from src.data_ingestion.onnx_backend import OnnxCrossEncoder, onnx_model_dir
+    from src.guideline_retriever.search import build_search_backend
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stop-gap", type=float, default=RERANK_STOP_GAP)
+    parser.add_argument("--mode", default=RETRIEVAL_MODE, choices=["dense", "hybrid"])
+    parser.add_argument("--out", type=Path, help="also write the results here as JSON")
+    args = parser.parse_args()
+
+    if MODEL_BACKEND == "onnx":
+        model = OnnxCrossEncoder(onnx_model_dir(ONNX_MODEL_DIR, RERANK_CROSS_ENCODER))
+    else:
+        from sentence_transformers import CrossEncoder
+
+        model = CrossEncoder(RERANK_CROSS_ENCODER)
+
+    mapping = json.loads(Path(ICD10_MAPPING_PATH).read_text())
+    queries = list(dict.fromkeys(e["conditions"][0] for e in mapping.values()))
+    backend = build_search_backend(VECTOR_STORE_BACKEND, args.mode)
+    vecs = Embedder(EMBEDDING_MODEL).encode(queries)
+    hits = backend.search(vecs, 2 * args.k, queries)
+    report = json.dumps(
+        compare_rerank(
+            model,
+            [(q, h) for q, h in zip(queries, hits) if h],
+            args.k,
+            args.repeat,
+            args.stop_gap,
+            RERANK_BATCH_SIZE,
+        ),
+        indent=2,
+    )
+    print(report)
+    if args.out:
+        args.out.write_text(report)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,230 @@
+"""
+Retrieval quality and latency of every GuidelineRetriever configuration.
+
+    python -m src.benchmarks.retrieval [--repeat 2] [--out results.json]
+
+Two labelled query sets, scored separately:
+
+* "icd10_mapping": from data/mappings/icd10_keywords.json, each entry's
+  condition name (with ICD-10 code) and each of its keyword patterns (free
+  text, no code). A chunk is relevant when it carries one of the entry's
+  condition tags; entries with no tags in the store are skipped.
+* "store_tags": one query per condition tag in the store, its topic as
+  plain words ("type_2_diabetes" → "type 2 diabetes"), relevant to chunks
+  with that tag. These labels come from the processed file names alone.
+
+Every combination of backend (chroma / faiss), mode (dense / hybrid),
+cross-encoder rerank (on / off), partition prefilter (on / off) and caching
+(on / off) is run over the queries `--repeat` times, so cached
+configurations show their warm latency. Backends whose store is missing are
+reported as skipped. The report goes to benchmark_results/retrieval.json by
+default. Per configuration, with k = RETRIEVER_TOP_K:
+
+* recall@k    share of queries with at least one relevant chunk in the top-k
+* precision@k share of returned chunks that are relevant
+* mrr         mean reciprocal rank of the first relevant chunk
+* p50/p99     per-query `retrieve()` latency over all passes
+
+The prefilter confines each query to the condition tags `PartitionMap`
+picks for it, which are the tags both label sets count as relevant, so its
+results would score near 1 by construction. Quality is therefore reported
+for prefilter=off only; prefilter=on reports latency.
+
+Models are loaded from the local Hugging Face cache only and run on CPU.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from src.condition_extractor.schemas import Condition
+
+CONFIG_AXES = {
+    "backend": ("chroma", "faiss"),
+    "mode": ("dense", "hybrid"),
+    "rerank": (False, True),
+    "prefilter": (False, True),
+    "cache": (False, True),
+}
+
+
+def labelled_queries(mapping_path: Path, known_tags: Set[str]) -> List[dict]:
+    """[{"condition", "relevant" (sorted tags), "kind", "labels"}] from the mapping."""
+    from src.guideline_retriever.partitions import PartitionMap
+
+    partitions = PartitionMap(mapping_path, known_tags)
+    entries = json.loads(Path(mapping_path).read_text())
+    queries, seen = [], set()
+    for entry in entries.values():
+        name = entry["conditions"][0]
+        tags = partitions.tags_for(Condition(name=name, icd10=None, confidence=1.0))
+        if not tags:
+            continue
+        candidates = [(name, entry.get("icd10"), "condition")]
+        candidates += [(p, None, "pattern") for p in entry.get("patterns", [])]
+        for text, icd10, kind in candidates:
+            if (text.lower(), icd10) in seen:
+                continue
+            seen.add((text.lower(), icd10))
+            queries.append(
+                {
+                    "condition": Condition(name=text, icd10=icd10, confidence=1.0),
+                    "relevant": tags,
+                    "kind": kind,
+                    "labels": "icd10_mapping",
+                }
+            )
+    return queries
+
+
+def tag_queries(known_tags: Set[str]) -> List[dict]:
+    """One query per store tag, labelled without the ICD-10 mapping."""
+    return [
+        {
+            "condition": Condition(
+                name=tag.replace("_", " "), icd10=None, confidence=1.0
+            ),
+            "relevant": [tag],
+            "kind": "topic",
+            "labels": "store_tags",
+        }
+        for tag in sorted(known_tags)
+    ]
+
+
+def _score(hits, relevant: Set[str], k: int) -> Tuple[float, float, float]:
+    from src.guideline_retriever.search import chunk_tags
+
+    flags = [bool(chunk_tags(c) & relevant) for c in hits[:k]]
+    first = next((rank for rank, ok in enumerate(flags, 1) if ok), None)
+    return float(any(flags)), sum(flags) / k, 1.0 / first if first else 0.0
+
+
+def run_config(
+    retriever, queries: List[dict], k: int, repeat: int, quality: bool = True
+) -> dict:
+    latencies = []
+    # label set → per-query (recall, precision, reciprocal rank)
+    scores: Dict[str, List[Tuple[float, float, float]]] = {}
+    for _ in range(repeat):
+        for q in queries:
+            start = time.perf_counter()
+            hits, _ = retriever.retrieve([q["condition"]])
+            latencies.append(time.perf_counter() - start)
+            scores.setdefault(q["labels"], []).append(
+                _score(hits, set(q["relevant"]), k)
+            )
+    ms = 1000 * np.asarray(latencies)
+    result = {"search_backend": type(retriever.search).__name__}
+    if quality:
+        for labels, rows in scores.items():
+            recall, precision, rr = np.mean(rows, axis=0)
+            result[labels] = {
+                f"recall@{k}": round(float(recall), 4),
+                f"precision@{k}": round(float(precision), 4),
+                "mrr": round(float(rr), 4),
+            }
+    else:
+        result["quality"] = "not reported: the prefilter uses the labels' tags"
+    return {
+        **result,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def run_suite(queries: List[dict], k: int, repeat: int, make_retriever) -> List[dict]:
+    """`make_retriever(**config)` builds a retriever or raises if it can't."""
+    results = []
+    names = list(CONFIG_AXES)
+    for values in itertools.product(*CONFIG_AXES.values()):
+        config = dict(zip(names, values))
+        label = ",".join(f"{n}={v}" for n, v in config.items())
+        print(f"Running {label} …")
+        try:
+            retriever = make_retriever(**config)
+        except Exception as exc:  # missing store, client library or model
+            results.append({**config, "skipped": f"{type(exc).__name__}: {exc}"})
+            continue
+        quality = not config.get("prefilter")
+        results.append(
+            {**config, **run_config(retriever, queries, k, repeat, quality)}
+        )
+        del retriever
+    return results
+
+
+def _settings_snapshot() -> Dict[str, object]:
+    from config import settings as s
+
+    names = (
+        "EMBEDDING_MODEL",
+        "MODEL_BACKEND",
+        "CHUNK_SIZE",
+        "CHUNK_OVERLAP",
+        "RERANK_CROSS_ENCODER",
+        "RETRIEVER_TOP_K",
+        "FAISS_INDEX_TYPE",
+        "FAISS_STORAGE",
+        "RETRIEVER_FIRST_PASS",
+        "RETRIEVER_PREFILTER",
+        "RETRIEVER_MMR_LAMBDA",
+        "SHARD_BY",
+        "DEDUP_THRESHOLD",
+    )
+    return {n: getattr(s, n) for n in names}
+
+
+def _main() -> None:
+    # Offline and CPU-only, whatever the environment says
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+    from config.settings import (
+        ICD10_MAPPING_PATH,
+        RETRIEVER_TOP_K,
+        VECTOR_STORE_BACKEND,
+    )
+    from src.guideline_retriever.retriever import GuidelineRetriever
+    from src.guideline_retriever.search import build_search_backend
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument(
+        "--out", type=Path, default=Path("benchmark_results/retrieval.json")
+    )
+    args = parser.parse_args()
+
+    known_tags = build_search_backend(VECTOR_STORE_BACKEND, "dense").condition_tags()
+    queries = labelled_queries(ICD10_MAPPING_PATH, known_tags)
+    queries += tag_queries(known_tags)
+    results = run_suite(queries, RETRIEVER_TOP_K, args.repeat, GuidelineRetriever)
+    report = json.dumps(
+        {
+            "k": RETRIEVER_TOP_K,
+            "repeat": args.repeat,
+            "n_queries": {
+                labels: sum(q["labels"] == labels for q in queries)
+                for labels in ("icd10_mapping", "store_tags")
+            },
+            "settings": _settings_snapshot(),
+            "results": results,
+        },
+        indent=2,
+        default=str,
+    )
+    print(report)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,130 @@
+"""
+Index size and recall@k of each FAISS_STORAGE mode over the ingested vectors.
+
+    python -m src.benchmarks.vector_compression [--queries 500] [--k 10]
+
+Each sampled corpus vector is used as a query with itself excluded from the
+results; ground truth is exact inner-product search over the float32 rows.
+Recall is reported straight from the compressed codes and after exact
+rescoring of `rescore_factor`·k candidates, as `FaissIndex.search` does.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from src.data_ingestion.faiss_store import (
+    STORAGE_MODES,
+    VECTORS_FILE,
+    build_faiss_index,
+    exact_rescore,
+)
+
+
+def _drop_self(rows: np.ndarray, picks: np.ndarray, k: int) -> np.ndarray:
+    """First k rows per query other than the query's own row."""
+    out = np.full((len(rows), k), -1, dtype=np.int64)
+    for i, (r, own) in enumerate(zip(rows, picks)):
+        r = r[(r != own) & (r >= 0)][:k]
+        out[i, : len(r)] = r
+    return out
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = [len(set(f[f >= 0]) & set(t)) / len(t) for f, t in zip(found, truth)]
+    return float(np.mean(hits))
+
+
+def compare_storage(
+    vectors: np.ndarray,
+    n_queries: int = 500,
+    k: int = 10,
+    index_type: str = "flat",
+    rescore_factor: int = 4,
+    pq_m: int = 96,
+    seed: int = 0,
+) -> list:
+    """One result dict per storage mode; `vectors` must be L2-normalised."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+    queries = np.ascontiguousarray(vectors[picks])
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k + 1)
+    truth = _drop_self(truth, picks, k)
+
+    results = []
+    for storage in STORAGE_MODES:
+        start = time.perf_counter()
+        index = build_faiss_index(vectors, index_type, storage, pq_m=pq_m)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, coarse = index.search(queries, k + 1)
+        search_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, cand = index.search(queries, k * rescore_factor + 1)
+        _, rescored = exact_rescore(vectors, queries, cand, k + 1)
+        rescore_s = time.perf_counter() - start
+
+        results.append(
+            {
+                "storage": storage,
+                "index_type": index_type,
+                "index_bytes": len(faiss.serialize_index(index)),
+                "build_s": round(build_s, 3),
+                "search_ms_per_query": round(1000 * search_s / len(queries), 4),
+                "rescored_ms_per_query": round(1000 * rescore_s / len(queries), 4),
+                f"recall@{k}": round(_recall(_drop_self(coarse, picks, k), truth), 4),
+                f"recall@{k}_rescored": round(
+                    _recall(_drop_self(rescored, picks, k), truth), 4
+                ),
+            }
+        )
+    return results
+
+
+def _main() -> None:
+    from config.settings import (
+        FAISS_INDEX_DIR,
+        FAISS_INDEX_TYPE,
+        FAISS_PQ_M,
+        FAISS_RESCORE_FACTOR,
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--index-dir", type=Path, default=Path(FAISS_INDEX_DIR))
+    parser.add_argument("--index-type", default=FAISS_INDEX_TYPE)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=FAISS_RESCORE_FACTOR)
+    parser.add_argument("--pq-m", type=int, default=FAISS_PQ_M)
+    parser.add_argument("--out", type=Path, help="also write the results here as JSON")
+    args = parser.parse_args()
+
+    vectors = np.load(args.index_dir / VECTORS_FILE)
+    results = compare_storage(
+        vectors,
+        n_queries=args.queries,
+        k=args.k,
+        index_type=args.index_type,
+        rescore_factor=args.rescore_factor,
+        pq_m=args.pq_m,
+    )
+    report = json.dumps(
+        {"n_vectors": len(vectors), "dim": vectors.shape[1], "results": results},
+        indent=2,
+    )
+    print(report)
+    if args.out:
+        args.out.write_text(report)
+
+
+if __name__ == "__main__":
+    _main()
@@ -4,6 +4,16 @@ from src.data_ingestion.schemas import DrugEntry
 from src.condition_extractor.schemas import Condition
 from .patterns import ICD10_MAP, FULL_ICD10_MAP
 
+# Common medical term variations → (condition, icd10, confidence)
+FUZZY_PATTERNS = {
+    "diabetic": ("Type 2 Diabetes Mellitus", "E11", 0.9),
+    "hypertensive": ("Essential Hypertension", "I10", 0.9),
+    "infected": ("Bacterial Infection", "A49", 0.8),
+    "inflammatory": ("Inflammatory Condition", "M79.3", 0.7),
+    "cardiac": ("Cardiac Condition", "I25", 0.7),
+    "respiratory": ("Respiratory Condition", "J98", 0.7),
+}
+
 
 class ConditionExtractor:
     def extract(self, drug: DrugEntry) -> List[Condition]:
@@ -56,17 +66,7 @@ class ConditionExtractor:
         """Perform fuzzy matching for common medical variations."""
         fuzzy_results = []
 
-        # Common medical term variations
-        fuzzy_patterns = {
-            "diabetic": ("Type 2 Diabetes Mellitus", "E11", 0.9),
-            "hypertensive": ("Essential Hypertension", "I10", 0.9),
-            "infected": ("Bacterial Infection", "A49", 0.8),
-            "inflammatory": ("Inflammatory Condition", "M79.3", 0.7),
-            "cardiac": ("Cardiac Condition", "I25", 0.7),
-            "respiratory": ("Respiratory Condition", "J98", 0.7),
-        }
-
-        for pattern, (condition, icd10, confidence) in fuzzy_patterns.items():
+        for pattern, (condition, icd10, confidence) in FUZZY_PATTERNS.items():
             if re.search(rf"\b{re.escape(pattern)}\b", text):
                 fuzzy_results.append(
                     Condition(
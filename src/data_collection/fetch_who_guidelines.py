@@ -2,6 +2,8 @@ import os
 import json
 import uuid
 
+from config.settings import EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP
+from src.data_ingestion.chunking import TokenChunker
 from src.preprocessing.pdf_to_text import process_pdf_to_chunks
 from src.preprocessing.clean_text import remove_stopwords, lemmatize_text
 
@@ -12,8 +14,8 @@ PROCESSED_JSON_DIR = "data/processed"
 
 def fetch_who_guidelines() -> None:
     """
-    Extract text from PDF files in the raw directory, process them into chunks,
-    clean the text, and save the results as JSON files.
+    Extract text from PDF files in the raw directory, split them into
+    embedding-model-sized chunks, clean the text, and save the results as JSON.
     """
     if not os.path.exists(RAW_PDF_DIR):
         print(f"ERROR: Directory {RAW_PDF_DIR} does not exist!")
@@ -26,19 +28,23 @@ def fetch_who_guidelines() -> None:
     os.makedirs(PROCESSED_JSON_DIR, exist_ok=True)
     print(f"Created/verified output directory: {os.path.abspath(PROCESSED_JSON_DIR)}")
 
+    chunker = TokenChunker.from_pretrained(EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP)
+
     all_docs = []
     for filename in pdf_files:
         pdf_path = os.path.join(RAW_PDF_DIR, filename)
         try:
-            chunks = process_pdf_to_chunks(pdf_path)
+            chunks = process_pdf_to_chunks(pdf_path, chunker)
             print(f"  Extracted {len(chunks)} chunks from {filename}")
 
             for chunk in chunks:
-                if chunk.strip():  # Only add non-empty chunks
+                if chunk["text"].strip():  # Only add non-empty chunks
                     # Clean the text
-                    cleaned_chunk = remove_stopwords(chunk)
+                    cleaned_chunk = remove_stopwords(chunk["text"])
                     cleaned_chunk = lemmatize_text(cleaned_chunk)
 
+                    # char_start/char_end locate the chunk on the raw page
+                    # text; the stored body is its stopword-free lemmatised form
                     doc_id = str(uuid.uuid4())
                     document = {
                         "id": doc_id,
@@ -47,6 +53,9 @@ def fetch_who_guidelines() -> None:
                         "source": f"WHO Guidelines: {filename}",
                         "language": "en",
                         "source_type": "Global",
+                        "page": chunk["page"],
+                        "char_start": chunk["char_start"],
+                        "char_end": chunk["char_end"],
                     }
                     all_docs.append(document)
         except Exception as e:
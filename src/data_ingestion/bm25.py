@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .schemas import GuidelineChunk
+
+logger = logging.getLogger(__name__)
+
+DIRNAME = "bm25"
+META_FILE = "bm25_meta.json"
+VOCAB_FILE = "vocab.json"
+IDS_FILE = "doc_ids.json"
+# doc-major term counts (kept for incremental rebuilds) and term-major postings
+ARRAYS = (
+    "doc_indptr",
+    "doc_terms",
+    "doc_tfs",
+    "post_indptr",
+    "post_docs",
+    "post_weights",
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric runs, so "E11.9" → e11, 9 and "ORS" → ors."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as fh:
+        np.save(fh, array)
+    os.replace(tmp, path)
+
+
+class Bm25Index:
+    """
+    Read side of the sparse index: CSR postings whose weights already hold
+    idf · tf·(k1+1) / (tf + k1·(1 - b + b·dl/avgdl)), so a query's BM25
+    scores are one `bincount` over the concatenated postings of its terms.
+    Arrays are memory-mapped.
+    """
+
+    def __init__(self, index_dir: Path) -> None:
+        self.dir = Path(index_dir)
+        self.vocab = {
+            t: i for i, t in enumerate(json.loads((self.dir / VOCAB_FILE).read_text()))
+        }
+        self.doc_ids: List[str] = json.loads((self.dir / IDS_FILE).read_text())
+        self.indptr = np.load(self.dir / "post_indptr.npy", mmap_mode="r")
+        self.docs = np.load(self.dir / "post_docs.npy", mmap_mode="r")
+        self.weights = np.load(self.dir / "post_weights.npy", mmap_mode="r")
+
+    @staticmethod
+    def exists(index_dir: Path) -> bool:
+        return (Path(index_dir) / META_FILE).exists()
+
+    def scores(self, query: str) -> np.ndarray:
+        terms = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not terms:
+            return np.zeros(len(self.doc_ids), dtype=np.float32)
+        spans = [slice(self.indptr[t], self.indptr[t + 1]) for t in terms]
+        docs = np.concatenate([self.docs[s] for s in spans])
+        weights = np.concatenate([self.weights[s] for s in spans])
+        return np.bincount(docs, weights=weights, minlength=len(self.doc_ids))
+
+    def search(self, queries: List[str], k: int) -> List[List[Tuple[str, float]]]:
+        """Top-k (chunk_id, score) per query, best first; zero scores are dropped."""
+        results = []
+        for query in queries:
+            scores = self.scores(query)
+            n = min(k, len(scores))
+            if not n:
+                results.append([])
+                continue
+            top = np.argpartition(-scores, n - 1)[:n]
+            top = top[np.argsort(-scores[top])]
+            results.append(
+                [(self.doc_ids[i], float(scores[i])) for i in top if scores[i] > 0]
+            )
+        return results
+
+
+class Bm25Builder:
+    """
+    Write side, maintained by the ingestion pipeline next to the vector store.
+
+    Per-chunk term counts are kept doc-major so upserts and deletes only touch
+    their own rows; `save()` re-derives the vocabulary, document lengths and
+    weighted postings from them, which is a few numpy passes over the corpus.
+    """
+
+    def __init__(self, index_dir: Path, k1: float = 1.2, b: float = 0.75) -> None:
+        self.dir = Path(index_dir)
+        self.k1 = k1
+        self.b = b
+        self._terms: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._vocab: Dict[str, int] = {}
+        self._dirty = False
+        self._load()
+
+    def _term_id(self, term: str) -> int:
+        return self._vocab.setdefault(term, len(self._vocab))
+
+    def _load(self) -> None:
+        if not Bm25Index.exists(self.dir):
+            return
+        meta = json.loads((self.dir / META_FILE).read_text())
+        self._dirty = (meta["k1"], meta["b"]) != (self.k1, self.b)
+        self._vocab = {
+            t: i for i, t in enumerate(json.loads((self.dir / VOCAB_FILE).read_text()))
+        }
+        ids = json.loads((self.dir / IDS_FILE).read_text())
+        indptr = np.load(self.dir / "doc_indptr.npy")
+        terms = np.load(self.dir / "doc_terms.npy")
+        tfs = np.load(self.dir / "doc_tfs.npy")
+        for i, cid in enumerate(ids):
+            s, e = indptr[i], indptr[i + 1]
+            self._terms[cid] = (terms[s:e], tfs[s:e])
+
+    def add_chunks(self, chunks: List[GuidelineChunk]) -> None:
+        for chunk in chunks:
+            ids = np.fromiter(
+                (self._term_id(t) for t in tokenize(chunk.text)), dtype=np.int64
+            )
+            terms, tfs = np.unique(ids, return_counts=True)
+            self._terms[chunk.chunk_id] = (terms.astype(np.int32), tfs.astype(np.int32))
+        self._dirty = self._dirty or bool(chunks)
+
+    def delete(self, ids: List[str]) -> None:
+        for cid in ids:
+            if self._terms.pop(cid, None) is not None:
+                self._dirty = True
+
+    def reset(self) -> None:
+        self._terms.clear()
+        self._vocab.clear()
+        self._dirty = True
+        if self.dir.exists():
+            shutil.rmtree(self.dir)
+
+    def save(self) -> None:
+        if not self._dirty and Bm25Index.exists(self.dir):
+            return
+        ids = list(self._terms)
+        lens = np.array([len(self._terms[c][0]) for c in ids], dtype=np.int64)
+        doc_indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(lens, out=doc_indptr[1:])
+        if ids:
+            raw_terms = np.concatenate([self._terms[c][0] for c in ids])
+            tfs = np.concatenate([self._terms[c][1] for c in ids])
+        else:
+            raw_terms = np.zeros(0, dtype=np.int32)
+            tfs = np.zeros(0, dtype=np.int32)
+
+        # Compact the vocabulary to terms that are still referenced.
+        used = np.unique(raw_terms)
+        inverse = {i: t for t, i in self._vocab.items()}
+        vocab = [inverse[int(i)] for i in used]
+        terms = np.searchsorted(used, raw_terms).astype(np.int32)
+        self._vocab = {t: i for i, t in enumerate(vocab)}
+        for cid, s, e in zip(ids, doc_indptr[:-1], doc_indptr[1:]):
+            self._terms[cid] = (terms[s:e], tfs[s:e])
+
+        doc_of = np.repeat(np.arange(len(ids), dtype=np.int32), lens)
+        dl = np.bincount(doc_of, weights=tfs, minlength=len(ids))
+        avgdl = float(dl.mean()) if len(ids) else 0.0
+        order = np.lexsort((doc_of, terms))
+        post_terms, post_docs, post_tfs = terms[order], doc_of[order], tfs[order]
+        post_indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(post_terms, minlength=len(vocab)), out=post_indptr[1:])
+
+        n = len(ids)
+        df = np.diff(post_indptr)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * dl[post_docs] / max(avgdl, 1e-9))
+        weights = idf[post_terms] * post_tfs * (self.k1 + 1) / (post_tfs + norm)
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / META_FILE).unlink(missing_ok=True)
+        arrays = dict(
+            doc_indptr=doc_indptr,
+            doc_terms=terms,
+            doc_tfs=tfs,
+            post_indptr=post_indptr,
+            post_docs=post_docs,
+            post_weights=weights.astype(np.float32),
+        )
+        for name in ARRAYS:
+            _save_array(self.dir / f"{name}.npy", arrays[name])
+        (self.dir / VOCAB_FILE).write_text(json.dumps(vocab, ensure_ascii=False))
+        (self.dir / IDS_FILE).write_text(json.dumps(ids))
+        # Written last: its presence marks a complete index.
+        (self.dir / META_FILE).write_text(
+            json.dumps({"k1": self.k1, "b": self.b, "n_docs": n, "avgdl": avgdl})
+        )
+        logger.info(
+            "Wrote BM25 index: %d chunks, %d terms, %d postings (%.1f MB)",
+            n,
+            len(vocab),
+            len(post_docs),
+            sum(a.nbytes for a in arrays.values()) / 2**20,
+        )
+        self._dirty = False
@@ -0,0 +1,124 @@
+import re
+from typing import List, Tuple
+
+import numpy as np
+
+from .schemas import GuidelineChunk
+
+# A sentence starts after terminal punctuation (optionally closed by a quote or
+# bracket) followed by whitespace, or after a blank line.
+_SENTENCE_BREAK_RE = re.compile(r"[.!?][\"')\]]?\s+|\n\s*\n")
+
+Span = Tuple[int, int]
+
+
+class TokenChunker:
+    """
+    Split documents into sentence-aligned windows sized in model tokens.
+
+    Works on a `tokenizers.Tokenizer` (the Rust "fast" tokenizer behind every
+    HF `*TokenizerFast`) so a whole batch of documents is tokenised in one call
+    and token → character offsets come for free. Windows end on a sentence
+    boundary whenever one exists; a sentence longer than the window is cut at
+    a token boundary. Consecutive windows share up to `chunk_overlap` tokens,
+    in whole sentences unless the previous window had to be hard-cut.
+    """
+
+    def __init__(self, tokenizer, chunk_size: int, chunk_overlap: int) -> None:
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError("chunk_overlap must be in [0, chunk_size)")
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    @classmethod
+    def from_pretrained(
+        cls, model_name: str, chunk_size: int, chunk_overlap: int
+    ) -> "TokenChunker":
+        """Use the embedding model's own tokenizer, capped at its max length."""
+        from transformers import AutoTokenizer
+
+        hf_tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        # Leave room for the [CLS]/[SEP] tokens the model adds itself.
+        window = min(chunk_size, hf_tokenizer.model_max_length - 2)
+        return cls(
+            hf_tokenizer.backend_tokenizer, window, min(chunk_overlap, window - 1)
+        )
+
+    @property
+    def config(self) -> dict:
+        return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
+
+    def spans(self, texts: List[str]) -> List[List[Span]]:
+        """Character spans of every window, for each text in the batch."""
+        encodings = self.tokenizer.encode_batch(texts, add_special_tokens=False)
+        return [
+            self._windows(text, enc.offsets) for text, enc in zip(texts, encodings)
+        ]
+
+    def _windows(self, text: str, offsets: List[Span]) -> List[Span]:
+        if not offsets:
+            return [(0, len(text))] if text.strip() else []
+        offs = np.asarray(offsets, dtype=np.int64)
+        n = len(offs)
+        if n <= self.chunk_size:
+            return [(int(offs[0, 0]), int(offs[-1, 1]))]
+
+        # Token indices at which a new sentence begins.
+        sent_starts = np.fromiter(
+            (m.end() for m in _SENTENCE_BREAK_RE.finditer(text)), dtype=np.int64
+        )
+        boundaries = np.unique(np.searchsorted(offs[:, 0], sent_starts, side="left"))
+        boundaries = boundaries[(boundaries > 0) & (boundaries < n)]
+
+        spans: List[Span] = []
+        start = 0
+        while True:
+            end = start + self.chunk_size
+            if end >= n:
+                spans.append((int(offs[start, 0]), int(offs[-1, 1])))
+                return spans
+            # Last sentence boundary inside (start, end]
+            i = np.searchsorted(boundaries, end, side="right") - 1
+            on_sentence = i >= 0 and boundaries[i] > start
+            if on_sentence:
+                end = int(boundaries[i])
+            spans.append((int(offs[start, 0]), int(offs[end - 1, 1])))
+
+            # Overlap by whole sentences when the window ended on one (none
+            # if the last sentence is longer than the overlap); after a hard
+            # cut, overlap by plain tokens.
+            next_start = max(end - self.chunk_overlap, start + 1)
+            if on_sentence:
+                j = np.searchsorted(boundaries, next_start, side="left")
+                next_start = int(boundaries[j]) if boundaries[j] < end else end
+            start = next_start
+
+    def split(self, docs: List[GuidelineChunk]) -> List[GuidelineChunk]:
+        """
+        Split a batch of documents into model-sized chunks.
+
+        Documents that already fit are returned unchanged. Split pieces carry
+        `char_start`/`char_end` offsets into the document's text as given
+        (shifted by the document's own offset, e.g. its position on a PDF
+        page) and keep its page and source metadata. Split before cleaning:
+        blank lines only mark sentence breaks while they are still there.
+        """
+        out: List[GuidelineChunk] = []
+        for doc, spans in zip(docs, self.spans([d.text for d in docs])):
+            if len(spans) <= 1:
+                out.append(doc)
+                continue
+            base = doc.char_start or 0
+            for start, end in spans:
+                out.append(
+                    doc.copy(
+                        update={
+                            "text": doc.text[start:end],
+                            "char_start": base + start,
+                            "char_end": base + end,
+                        }
+                    )
+                )
+        return out
+
@@ -2,7 +2,8 @@ import json
 import pandas as pd
 from pathlib import Path
 from typing import List
-from schemas import DrugEntry
+from .schemas import DrugEntry, GuidelineChunk
+from .hashing import normalise_text
 import config
 
 
@@ -19,6 +20,17 @@ def clean_drugs(raw: List[dict]) -> pd.DataFrame:
     return df
 
 
+def clean_chunks(chunks: List[GuidelineChunk]) -> List[GuidelineChunk]:
+    """Normalise whitespace and drop chunks with no text."""
+    cleaned = []
+    for c in chunks:
+        text = normalise_text(c.text)
+        if text:
+            c.text = text
+            cleaned.append(c)
+    return cleaned
+
+
 def run():
     raw = load_raw(config.raw_drug)
     df = clean_drugs(raw)
@@ -1,19 +1,61 @@
 from config.settings import (
     DRUG_DB_PATH,
     GUIDELINE_DIR,
+    CORPUS_PATH,
     VECTOR_STORE_BACKEND,
     PERSIST_DIRECTORY,
+    FAISS_INDEX_DIR,
+    FAISS_INDEX_TYPE,
+    FAISS_HNSW_M,
+    FAISS_IVF_NLIST,
+    FAISS_STORAGE,
+    FAISS_PQ_M,
+    FAISS_REDUCED_DIM,
+    SHARD_BY,
     EMBEDDING_MODEL,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
+    INGEST_BATCH_SIZE,
+    INGEST_QUEUE_DEPTH,
+    EMBED_BATCH_SIZE,
+    EMBED_WORKERS,
+    EMBED_CACHE_DIR,
+    EMBED_CACHE_MAX_MB,
+    MODEL_BACKEND,
+    ONNX_MODEL_DIR,
+    DEDUP_THRESHOLD,
+    BM25_K1,
+    BM25_B,
+    CONTEXT_TABLE,
 )
 
 settings = {
     "drug_db_path": DRUG_DB_PATH,
     "guideline_dir": GUIDELINE_DIR,
+    "corpus_path": CORPUS_PATH,
     "vector_store_backend": VECTOR_STORE_BACKEND,
     "persist_directory": PERSIST_DIRECTORY,
+    "faiss_index_dir": FAISS_INDEX_DIR,
+    "faiss_index_type": FAISS_INDEX_TYPE,
+    "faiss_hnsw_m": FAISS_HNSW_M,
+    "faiss_ivf_nlist": FAISS_IVF_NLIST,
+    "faiss_storage": FAISS_STORAGE,
+    "faiss_pq_m": FAISS_PQ_M,
+    "faiss_reduced_dim": FAISS_REDUCED_DIM,
+    "shard_by": SHARD_BY,
     "embedding_model": EMBEDDING_MODEL,
     "chunk_size": CHUNK_SIZE,
     "chunk_overlap": CHUNK_OVERLAP,
+    "ingest_batch_size": INGEST_BATCH_SIZE,
+    "ingest_queue_depth": INGEST_QUEUE_DEPTH,
+    "embed_batch_size": EMBED_BATCH_SIZE,
+    "embed_workers": EMBED_WORKERS,
+    "embed_cache_dir": EMBED_CACHE_DIR,
+    "embed_cache_max_mb": EMBED_CACHE_MAX_MB,
+    "model_backend": MODEL_BACKEND,
+    "onnx_model_dir": ONNX_MODEL_DIR,
+    "dedup_threshold": DEDUP_THRESHOLD,
+    "bm25_k1": BM25_K1,
+    "bm25_b": BM25_B,
+    "context_table": CONTEXT_TABLE,
 }
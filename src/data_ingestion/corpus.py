@@ -0,0 +1,162 @@
+"""
+Columnar copy of `data/processed/*.json` in one Arrow IPC file.
+
+    python -m src.data_ingestion.corpus            # compact GUIDELINE_DIR → CORPUS_PATH
+
+The file is uncompressed so every column is memory-mapped rather than
+parsed: `read_source` slices one file's rows straight off the mapped
+columns. Rows are grouped by source file, and
+the schema metadata keeps each file's byte digest and row range so the ingest
+manifest treats the corpus exactly like the directory it was built from.
+"""
+
+import argparse
+import json
+import logging
+import os
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pyarrow as pa
+
+from .hashing import file_digest
+from .readers import (
+    GuidelineSource,
+    list_guideline_files,
+    read_guideline_records,
+    record_to_chunk,
+)
+from .schemas import GuidelineChunk
+
+logger = logging.getLogger(__name__)
+
+CORPUS_SCHEMA = pa.schema(
+    [
+        ("doc_id", pa.string()),  # PMID, WHO record id, or text hash
+        ("source_file", pa.string()),
+        ("condition_tag", pa.string()),
+        ("source_type", pa.string()),
+        ("pmid", pa.string()),
+        ("title", pa.string()),
+        ("text", pa.string()),
+        ("mesh_terms", pa.list_(pa.string())),
+        ("page", pa.int32()),
+        ("char_start", pa.int32()),
+        ("char_end", pa.int32()),
+    ]
+)
+_SOURCES_KEY = b"sources"
+_CHUNK_FIELDS = [f for f in GuidelineChunk.model_fields if f in CORPUS_SCHEMA.names]
+
+
+def _rows(records: List[dict], source_file: str) -> List[dict]:
+    rows = []
+    for record in records:
+        chunk = record_to_chunk(record, source_file)
+        row = chunk.model_dump()
+        row["doc_id"] = chunk.pmid or record.get("id") or chunk.chunk_id
+        row["title"] = record.get("title")
+        row["mesh_terms"] = record.get("mesh_terms")
+        rows.append(row)
+    return rows
+
+
+def compact_corpus(dir_path: Path, out_path: Path, batch_rows: int = 1024) -> int:
+    """Write every processed JSON file under `dir_path` to `out_path`; returns the row count."""
+    tables, sources, start = [], {}, 0
+    for file_path in list_guideline_files(dir_path):
+        rows = _rows(read_guideline_records(file_path), file_path.name)
+        tables.append(pa.Table.from_pylist(rows, schema=CORPUS_SCHEMA))
+        sources[file_path.name] = {
+            "digest": file_digest(file_path),
+            "start": start,
+            "stop": start + len(rows),
+        }
+        start += len(rows)
+
+    table = pa.concat_tables(tables) if tables else CORPUS_SCHEMA.empty_table()
+    table = table.replace_schema_metadata({_SOURCES_KEY: json.dumps(sources)})
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=batch_rows)
+    os.replace(tmp, out_path)
+    logger.info("Compacted %d records from %d files into %s", start, len(sources), out_path)
+    return start
+
+
+class GuidelineCorpus:
+    """Memory-mapped, read-only view of a compacted corpus file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._reader = pa.ipc.open_file(pa.memory_map(str(self.path), "r"))
+        self.table = self._reader.read_all()
+        meta = self._reader.schema.metadata or {}
+        self._sources: Dict[str, dict] = json.loads(meta.get(_SOURCES_KEY, b"{}"))
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def read_source(self, name: str) -> List[GuidelineChunk]:
+        entry = self._sources[name]
+        rows = self.table.select(_CHUNK_FIELDS).slice(
+            entry["start"], entry["stop"] - entry["start"]
+        )
+        return [GuidelineChunk(**row) for row in rows.to_pylist()]
+
+    def sources(self) -> Iterator[GuidelineSource]:
+        for name, entry in self._sources.items():
+            yield GuidelineSource(name, entry["digest"], partial(self.read_source, name))
+
+    def stale_sources(self, dir_path: Path) -> List[str]:
+        """Files under `dir_path` added, changed or removed since the corpus was built."""
+        current = {f.name: file_digest(f) for f in list_guideline_files(dir_path)}
+        built = {name: entry["digest"] for name, entry in self._sources.items()}
+        return sorted(
+            name
+            for name in current.keys() | built.keys()
+            if current.get(name) != built.get(name)
+        )
+
+
+def pick_guideline_source(dir_path: Path, corpus_path: Path) -> Path:
+    """
+    The corpus file if it was built from `dir_path` as it is now, otherwise
+    `dir_path` itself (with a warning when a stale corpus is skipped). A
+    corpus without its source directory alongside is used as is.
+    """
+    if not corpus_path.exists():
+        return dir_path
+    if not list_guideline_files(dir_path):
+        return corpus_path
+    stale = GuidelineCorpus(corpus_path).stale_sources(dir_path)
+    if stale:
+        logger.warning(
+            "%s is out of date with %s (%d files differ, e.g. %s); reading the "
+            "directory instead. Rebuild it with `python -m src.data_ingestion.corpus`.",
+            corpus_path,
+            dir_path,
+            len(stale),
+            stale[0],
+        )
+        return dir_path
+    return corpus_path
+
+
+def _main() -> None:
+    from .config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--src", type=Path, default=settings["guideline_dir"])
+    parser.add_argument("--out", type=Path, default=settings["corpus_path"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    compact_corpus(args.src, args.out)
+
+
+if __name__ == "__main__":
+    _main()
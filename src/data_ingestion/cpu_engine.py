@@ -0,0 +1,103 @@
+import multiprocessing as mp
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+# Per-process model, loaded once by `_init_worker`.
+_MODEL = None
+
+
+_THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def _init_worker(model_name: str, num_threads: int, onnx_dir: Optional[Path]) -> None:
+    # BLAS/OpenMP pool sizes come from the environment the pool was spawned
+    # with (see CpuEmbeddingEngine); torch's own pools are pinned here.
+    global _MODEL
+    if onnx_dir is not None:
+        from .onnx_backend import OnnxSentenceEncoder
+
+        _MODEL = OnnxSentenceEncoder(onnx_dir, num_threads=num_threads)
+        return
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+    _MODEL = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    return _MODEL.encode(
+        texts,
+        batch_size=len(texts),
+        show_progress_bar=False,
+        convert_to_numpy=True,
+    ).astype(np.float32, copy=False)
+
+
+class CpuEmbeddingEngine:
+    """
+    Multi-process SentenceTransformer encoder for CPU-only hosts.
+
+    Inputs are sorted by length and cut into batches, so each batch pads to
+    texts of similar length. Batches are spread over a pool of worker
+    processes, each with a fixed torch thread count, and the vectors are
+    written back in input order.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        num_workers: int,
+        batch_size: int = 32,
+        threads_per_worker: Optional[int] = None,
+        onnx_dir: Optional[Path] = None,
+    ) -> None:
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(
+            1, (os.cpu_count() or 1) // num_workers
+        )
+        # spawn: torch's thread pools are not fork-safe. A spawned worker
+        # re-imports the parent's main module, which may import torch (and
+        # size its OpenMP pool) before any initializer runs, so the thread
+        # caps go into the environment the workers start with.
+        saved = {var: os.environ.get(var) for var in _THREAD_VARS}
+        os.environ.update(dict.fromkeys(_THREAD_VARS, str(self.threads_per_worker)))
+        try:
+            self.pool = mp.get_context("spawn").Pool(
+                num_workers,
+                initializer=_init_worker,
+                initargs=(model_name, self.threads_per_worker, onnx_dir),
+            )
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        # Character length is a cheap, monotone-enough proxy for token length.
+        order = np.argsort(np.fromiter((len(t) for t in texts), dtype=np.int64))
+        buckets = [
+            order[i : i + self.batch_size] for i in range(0, len(order), self.batch_size)
+        ]
+
+        out: Optional[np.ndarray] = None
+        results = self.pool.imap(_encode_batch, [[texts[j] for j in b] for b in buckets])
+        for idx, vecs in zip(buckets, results):
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[idx] = vecs
+        return out
+
+    def close(self) -> None:
+        self.pool.close()
+        self.pool.join()
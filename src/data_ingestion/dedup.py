@@ -0,0 +1,265 @@
+import os
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .schemas import GuidelineChunk
+
+# Signature cache, next to the vector store
+DIRNAME = "dedup"
+
+# Multiply-shift hashing: the high 32 bits of (a·x + b) mod 2^64 (uint64
+# arithmetic wraps) permute the 32-bit shingle hashes without a modulo.
+_SHIFT = np.uint64(32)
+_BASE = np.uint64(1000003)
+_EMPTY = np.uint64(np.iinfo(np.uint64).max)
+
+# merged_* list on the kept record → the field it extends
+_PRIMARY = {
+    "merged_sources": "source_file",
+    "merged_conditions": "condition_tag",
+    "merged_source_types": "source_type",
+}
+
+# Per-record dedup inputs: what clustering and merging read instead of the text
+RecordKeys = Dict[str, np.ndarray]
+# Surviving record's position in its source → merged_* values it picks up
+Survivors = List[Tuple[int, Dict[str, List[str]]]]
+
+
+@dataclass
+class DedupStats:
+    records_in: int = 0
+    pmid_duplicates: int = 0
+    near_duplicates: int = 0
+    chars_in: int = 0
+    chars_dropped: int = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.pmid_duplicates + self.near_duplicates
+
+    def __str__(self) -> str:
+        return (
+            f"{self.dropped}/{self.records_in} records dropped "
+            f"({self.pmid_duplicates} same PMID, {self.near_duplicates} near-duplicate), "
+            f"{self.chars_dropped / max(self.chars_in, 1):.1%} of the text to embed"
+        )
+
+
+class Deduplicator:
+    """
+    Collapse records that appear in several processed files before they are
+    chunked and embedded: first by PMID, then by MinHash/LSH over word
+    shingles for near-identical text without a shared PMID.
+
+    The first record of each cluster (in file order) is kept and the others'
+    source file, condition tag and source type are merged into its metadata.
+
+    With a `cache_dir`, each source's signatures and merge metadata are kept
+    on disk under its digest (`source_keys`), so a run only parses and
+    MinHashes the sources that changed; clustering the cached signatures is
+    cheap by comparison.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_words: int = 5,
+        seed: int = 0,
+        cache_dir: Optional[Path] = None,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        # Signatures depend on these; bands and threshold only on clustering
+        self._params = f"{num_perm}-{shingle_words}-{seed}"
+        self.stats = DedupStats()
+        self._word_hashes: Dict[str, int] = {}
+
+    def _word_ids(self, text: str) -> np.ndarray:
+        cache = self._word_hashes
+        ids = []
+        for word in text.lower().split():
+            h = cache.get(word)
+            if h is None:
+                h = cache[word] = zlib.crc32(word.encode("utf-8"))
+            ids.append(h)
+        return np.array(ids, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = self._word_ids(text)
+        if not len(words):
+            return np.full(len(self._a), _EMPTY)
+        n = min(self.shingle_words, len(words))
+        count = len(words) - n + 1
+        with np.errstate(over="ignore"):
+            # Polynomial hash of each n-word window, then the permutations.
+            shingles = np.zeros(count, dtype=np.uint64)
+            for k in range(n):
+                shingles = shingles * _BASE + words[k : k + count]
+            hashed = (np.outer(shingles, self._a) + self._b) >> _SHIFT
+        return hashed.min(axis=0)
+
+    def keys(self, docs: List[GuidelineChunk]) -> RecordKeys:
+        return {
+            "pmid": np.array([d.pmid or "" for d in docs], dtype=str),
+            **{
+                attr: np.array([getattr(d, attr) or "" for d in docs], dtype=str)
+                for attr in _PRIMARY.values()
+            },
+            "chars": np.array([len(d.text) for d in docs], dtype=np.int64),
+            "sig": (
+                np.stack([self.signature(d.text) for d in docs])
+                if docs
+                else np.empty((0, len(self._a)), dtype=np.uint64)
+            ),
+        }
+
+    def source_keys(
+        self, name: str, digest: str, load: Callable[[], List[GuidelineChunk]]
+    ) -> RecordKeys:
+        """`keys` of one source; `load()` is only called when the cache misses."""
+        if self.cache_dir is None:
+            return self.keys(load())
+        path = self.cache_dir / f"{name}.npz"
+        stamp = f"{digest}:{self._params}"
+        if path.exists():
+            with np.load(path) as data:
+                if str(data["stamp"]) == stamp:
+                    return {k: data[k] for k in data.files if k != "stamp"}
+        keys = self.keys(load())
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, stamp=np.array(stamp), **keys)
+        os.replace(tmp, path)
+        return keys
+
+    def prune_cache(self, names) -> None:
+        """Drop cached keys of sources not in `names`."""
+        if self.cache_dir is None or not self.cache_dir.exists():
+            return
+        live = {f"{name}.npz" for name in names}
+        for path in self.cache_dir.glob("*.npz"):
+            if path.name not in live:
+                path.unlink()
+
+    def _clusters(self, pmids: np.ndarray, sigs: np.ndarray) -> List[int]:
+        """Index of each record's cluster representative (the earliest member)."""
+        parent = list(range(len(pmids)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i: int, j: int) -> None:
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+
+        by_pmid: Dict[str, int] = {}
+        for i, pmid in enumerate(pmids):
+            if pmid:
+                union(by_pmid.setdefault(pmid, i), i)
+        pmid_roots = [find(i) for i in range(len(pmids))]
+
+        # Records with a PMID twin are already settled; their twin stands in.
+        todo = [i for i in range(len(pmids)) if pmid_roots[i] == i]
+        buckets: Dict[tuple, List[int]] = defaultdict(list)
+        for i in todo:
+            for band in range(self.bands):
+                rows = sigs[i][band * self.rows : (band + 1) * self.rows]
+                buckets[(band, rows.tobytes())].append(i)
+        for members in buckets.values():
+            for pos, j in enumerate(members[1:], 1):
+                for i in members[:pos]:
+                    if find(i) == find(j):
+                        break
+                    if np.mean(sigs[i] == sigs[j]) >= self.threshold:
+                        union(i, j)
+                        break
+
+        roots = [find(i) for i in range(len(pmids))]
+        self.stats.pmid_duplicates += sum(1 for i, r in enumerate(pmid_roots) if r != i)
+        self.stats.near_duplicates += sum(
+            1 for i, r in enumerate(roots) if r != i and pmid_roots[i] == i
+        )
+        return roots
+
+    def resolve(self, keys: Dict[str, RecordKeys]) -> Dict[str, Survivors]:
+        """
+        Cluster every source's records at once; returns, per source, the
+        records that survive and the merged_* values each picks up.
+        """
+        self.stats = DedupStats()
+        flat = [(name, j) for name, k in keys.items() for j in range(len(k["chars"]))]
+        out: Dict[str, Survivors] = {name: [] for name in keys}
+        if not flat:
+            return out
+        cols = {
+            col: np.concatenate([k[col] for k in keys.values()])
+            for col in ["pmid", "chars", "sig", *_PRIMARY.values()]
+        }
+        roots = self._clusters(cols["pmid"], cols["sig"])
+        self.stats.records_in = len(flat)
+        self.stats.chars_in = int(cols["chars"].sum())
+
+        merged: Dict[int, Dict[str, List[str]]] = {}
+        for i, root in enumerate(roots):
+            if root == i:
+                merged[i] = {}
+                continue
+            self.stats.chars_dropped += int(cols["chars"][i])
+            add = merged[root]
+            for field, attr in _PRIMARY.items():
+                value = str(cols[attr][i])
+                if value and value != cols[attr][root]:
+                    if value not in add.get(field, []):
+                        add.setdefault(field, []).append(value)
+
+        for i, (name, j) in enumerate(flat):
+            if i in merged:
+                out[name].append((j, merged[i]))
+        return out
+
+    @staticmethod
+    def merge(docs: List[GuidelineChunk], survivors: Survivors) -> List[GuidelineChunk]:
+        """Apply one source's `resolve` result to its records."""
+        out = []
+        for j, add in survivors:
+            doc = docs[j]
+            if add:
+                doc = doc.copy(
+                    update={
+                        field: getattr(doc, field)
+                        + [v for v in values if v not in getattr(doc, field)]
+                        for field, values in add.items()
+                    }
+                )
+            out.append(doc)
+        return out
+
+    def apply(
+        self, sources: Dict[str, List[GuidelineChunk]]
+    ) -> Dict[str, List[GuidelineChunk]]:
+        """Deduplicate across all sources; returns the surviving docs per source."""
+        keys = {name: self.keys(docs) for name, docs in sources.items()}
+        survivors = self.resolve(keys)
+        return {
+            name: self.merge(docs, survivors[name]) for name, docs in sources.items()
+        }
@@ -1,15 +1,68 @@
-from typing import List
+from pathlib import Path
+from typing import List, Optional
 
+import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
 
+from .cpu_engine import CpuEmbeddingEngine
+from .embedding_cache import EmbeddingCache
+from .onnx_backend import OnnxSentenceEncoder, embedding_variant
+
 
 class Embedder:
-    def __init__(self, model_name: str) -> None:
+    def __init__(
+        self,
+        model_name: str,
+        num_workers: int = 0,
+        batch_size: int = 32,
+        cache: Optional[EmbeddingCache] = None,
+        onnx_dir: Optional[Path] = None,
+    ) -> None:
+        """`onnx_dir`: serve from the exported int8 ONNX model instead of torch."""
+        self.model_name = model_name
+        self.variant = embedding_variant(model_name, "torch" if onnx_dir is None else "onnx")
+        self.batch_size = batch_size
+        self.cache = cache
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = SentenceTransformer(model_name, device=self.device)
+        self.engine: Optional[CpuEmbeddingEngine] = None
+        self.model = None  # SentenceTransformer or OnnxSentenceEncoder
+        if self.device == "cpu" and num_workers > 1:
+            self.engine = CpuEmbeddingEngine(
+                model_name, num_workers, batch_size, onnx_dir=onnx_dir
+            )
+        elif onnx_dir is not None:
+            self.model = OnnxSentenceEncoder(onnx_dir)
+        else:
+            self.model = SentenceTransformer(model_name, device=self.device)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Return a (len(texts), dim) float32 array, reusing cached vectors."""
+        if self.cache is None:
+            return self._encode(texts)
 
-    def encode(self, texts: List[str]) -> List[List[float]]:
+        keys = self.cache.keys_for(texts)
+        vectors, missing = self.cache.get(keys)
+        if len(missing):
+            fresh = self._encode([texts[i] for i in missing])
+            if vectors is None:
+                vectors = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+            vectors[missing] = fresh
+            self.cache.put(keys[missing], fresh)
+        return vectors
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self.engine is not None:
+            return self.engine.encode(texts)
         return self.model.encode(
-            texts, batch_size=32, show_progress_bar=True, convert_to_numpy=True
-        ).tolist()
+            texts,
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        ).astype(np.float32, copy=False)
+
+    def close(self) -> None:
+        if self.engine is not None:
+            self.engine.close()
+        if self.cache is not None:
+            self.cache.flush()
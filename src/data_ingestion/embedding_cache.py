@@ -0,0 +1,259 @@
+import json
+import logging
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .hashing import text_hash
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = np.uint64(0)
+
+
+def model_slug(model_name: str) -> str:
+    """Filesystem-safe directory name for a model ID."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+
+
+class EmbeddingCache:
+    """
+    Persistent text → vector cache for one embedding model.
+
+    Layout under `root/<model>/`:
+        vectors.f32  memory-mapped (capacity, dim) float32 rows
+        keys.u64     memory-mapped key of the text each row currently holds
+        index.npz    per-slot 64-bit text-hash key and last-use tick
+        meta.json    model name, dim, capacity
+
+    The index is kept in RAM as a sorted key array, so a batch lookup is a
+    single `np.searchsorted`; vectors are read straight from the page cache.
+    When full, the least recently used tenth of the slots is evicted.
+
+    A read-only cache (used at query time) never writes and never evicts. It
+    shares the files with a writer in another process, so it reloads the
+    index whenever the writer rewrites it, and only trusts a row whose
+    `keys.u64` entry still names the requested text: the writer clears that
+    entry before reusing a slot and sets it once the new row is written.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        model_name: str,
+        max_bytes: int,
+        read_only: bool = False,
+    ) -> None:
+        self.dir = Path(root) / model_slug(model_name)
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    # ------------------------------------------------------------------ io
+    def _reset(self) -> None:
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._slot_keys: Optional[np.memmap] = None
+        self._keys = np.zeros(0, dtype=np.uint64)
+        self._ticks = np.zeros(0, dtype=np.uint64)
+        self._clock = 0
+        self._sorted_keys = np.zeros(0, dtype=np.uint64)
+        self._sorted_slots = np.zeros(0, dtype=np.int64)
+
+    def _stamp(self) -> tuple:
+        """Changes whenever a writer rewrites the index or recreates the cache."""
+        stamp = []
+        for name in ("meta.json", "index.npz"):
+            try:
+                stamp.append((self.dir / name).stat().st_mtime_ns)
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _load(self) -> None:
+        self._reset()
+        self._loaded_stamp = self._stamp()
+        meta_path = self.dir / "meta.json"
+        if not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text())
+        if meta.get("model") != self.model_name:
+            logger.warning("Ignoring embedding cache built for %s", meta.get("model"))
+            return
+        keys_path = self.dir / "keys.u64"
+        if self.read_only and not keys_path.exists():
+            # Written before rows carried their key: nothing can be verified
+            logger.warning("Embedding cache %s predates slot keys; ignoring it", self.dir)
+            return
+        try:
+            with np.load(self.dir / "index.npz") as index:
+                keys = index["keys"].copy()
+                ticks = index["ticks"].copy()
+        except FileNotFoundError:
+            return  # created, but not flushed yet
+        self.dim, self.capacity = meta["dim"], meta["capacity"]
+        self._keys, self._ticks = keys, ticks
+        self._clock = int(self._ticks.max(initial=0))
+        mode = "r" if self.read_only else "r+"
+        self._vectors = np.memmap(
+            self.dir / "vectors.f32",
+            dtype=np.float32,
+            mode=mode,
+            shape=(self.capacity, self.dim),
+        )
+        if not keys_path.exists():
+            self._slot_keys = np.memmap(
+                keys_path, dtype=np.uint64, mode="w+", shape=(self.capacity,)
+            )
+            self._slot_keys[:] = self._keys
+        else:
+            self._slot_keys = np.memmap(
+                keys_path, dtype=np.uint64, mode=mode, shape=(self.capacity,)
+            )
+        self._reindex()
+
+    def _refresh(self) -> None:
+        """Read-only: pick up whatever the writer has flushed since the last look."""
+        if self._stamp() != self._loaded_stamp:
+            self._load()
+
+    def _create(self, dim: int) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.capacity = max(1, self.max_bytes // (dim * 4))
+        self._vectors = np.memmap(
+            self.dir / "vectors.f32",
+            dtype=np.float32,
+            mode="w+",
+            shape=(self.capacity, dim),
+        )
+        self._slot_keys = np.memmap(
+            self.dir / "keys.u64", dtype=np.uint64, mode="w+", shape=(self.capacity,)
+        )
+        self._keys = np.zeros(self.capacity, dtype=np.uint64)
+        self._ticks = np.zeros(self.capacity, dtype=np.uint64)
+        (self.dir / "meta.json").write_text(
+            json.dumps({"model": self.model_name, "dim": dim, "capacity": self.capacity})
+        )
+
+    def flush(self) -> None:
+        if self.read_only or self._vectors is None:
+            return
+        # Vectors first: the index must never point at rows not yet on disk.
+        self._vectors.flush()
+        self._slot_keys.flush()
+        tmp = self.dir / "index.tmp.npz"
+        np.savez(tmp, keys=self._keys, ticks=self._ticks)
+        tmp.replace(self.dir / "index.npz")
+
+    # ----------------------------------------------------------- lookups
+    @staticmethod
+    def keys_for(texts: List[str]) -> np.ndarray:
+        keys = np.fromiter(
+            (int(text_hash(t)[:16], 16) for t in texts), dtype=np.uint64, count=len(texts)
+        )
+        keys[keys == _EMPTY] = 1  # 0 marks a free slot
+        return keys
+
+    def _reindex(self) -> None:
+        used = np.flatnonzero(self._keys != _EMPTY)
+        order = np.argsort(self._keys[used])
+        self._sorted_keys = self._keys[used][order]
+        self._sorted_slots = used[order]
+
+    def _find(self, keys: np.ndarray) -> np.ndarray:
+        """Slot of each key, or -1."""
+        if not len(self._sorted_keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.searchsorted(self._sorted_keys, keys)
+        pos = np.minimum(pos, len(self._sorted_keys) - 1)
+        found = self._sorted_keys[pos] == keys
+        return np.where(found, self._sorted_slots[pos], -1)
+
+    def get(self, keys: np.ndarray) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """
+        Return `(vectors, missing)`: a (len(keys), dim) array with every cached
+        row filled in (None while the cache is still empty) and the positions
+        that still need encoding.
+        """
+        if self.read_only:
+            self._refresh()
+        slots = self._find(keys)
+        hit = slots >= 0
+        vectors = None
+        if self.dim is not None and hit.any():
+            vectors = np.empty((len(keys), self.dim), dtype=np.float32)
+            before = self._slot_keys[slots[hit]]
+            vectors[hit] = self._vectors[slots[hit]]
+            after = self._slot_keys[slots[hit]]
+            # A slot the writer reused (or is rewriting) no longer holds this text
+            valid = (before == keys[hit]) & (after == keys[hit])
+            stale = np.flatnonzero(hit)[~valid]
+            hit[stale] = False
+            if not self.read_only:
+                self._clock += 1
+                self._ticks[slots[hit]] = self._clock
+        self.hits += int(hit.sum())
+        self.misses += int((~hit).sum())
+        missing = np.flatnonzero(~hit)
+        if self.dim is None:
+            return None, missing
+        if vectors is None:
+            vectors = np.empty((len(keys), self.dim), dtype=np.float32)
+        return vectors, missing
+
+    def put(self, keys: np.ndarray, vectors: np.ndarray) -> None:
+        if self.read_only or not len(keys):
+            return
+        if self.dim is None:
+            self._create(vectors.shape[1])
+        keys, first = np.unique(keys, return_index=True)
+        vectors = vectors[first][: self.capacity]
+        keys = keys[: self.capacity]
+
+        slots = self._find(keys)
+        new = slots < 0
+        free = np.flatnonzero(self._keys == _EMPTY)
+        shortfall = int(new.sum()) - len(free)
+        if shortfall > 0:
+            victims = self._evict(max(shortfall, self.capacity // 10), keep=slots[~new])
+            free = np.concatenate([free, victims])
+        slots[new] = free[: int(new.sum())]
+
+        self._clock += 1
+        # Readers check the slot key around each row read: clear it while the
+        # row is rewritten, set it once the new row is in place.
+        self._slot_keys[slots] = _EMPTY
+        self._vectors[slots] = vectors
+        self._slot_keys[slots] = keys
+        self._keys[slots] = keys
+        self._ticks[slots] = self._clock
+        self._reindex()
+
+    def _evict(self, n: int, keep: np.ndarray) -> np.ndarray:
+        used = np.setdiff1d(np.flatnonzero(self._keys != _EMPTY), keep)
+        n = min(n, len(used))
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        victims = used[np.argpartition(self._ticks[used], n - 1)[:n]]
+        self._keys[victims] = _EMPTY
+        self._slot_keys[victims] = _EMPTY
+        self._ticks[victims] = 0
+        logger.debug("Evicted %d cached embeddings", n)
+        return victims
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": int(len(self._sorted_keys)),
+            "capacity": self.capacity,
+        }
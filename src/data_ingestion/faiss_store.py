@@ -0,0 +1,507 @@
+import json
+import logging
+import math
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+import faiss
+import numpy as np
+import pyarrow as pa
+
+from .schemas import GuidelineChunk
+from .vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+REDUCED_INDEX_FILE = "index_reduced.faiss"
+VECTORS_FILE = "vectors.npy"
+PENDING_FILE = "pending.f32"
+META_FILE = "meta.arrow"
+INFO_FILE = "faiss_meta.json"
+
+# Row i of the metadata sidecar describes FAISS id i.
+META_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("text", pa.string()),
+        ("source", pa.string()),
+        ("condition", pa.string()),
+        ("pmid", pa.string()),
+        ("page", pa.int32()),
+        ("char_start", pa.int32()),
+        ("char_end", pa.int32()),
+        ("source_type", pa.string()),
+        ("sources", pa.string()),
+        ("conditions", pa.string()),
+        ("source_types", pa.string()),
+    ]
+)
+
+
+def normalise_rows(x: np.ndarray) -> np.ndarray:
+    """L2-normalise (a copy of) `x` so inner product == cosine similarity."""
+    x = np.array(x, dtype=np.float32, order="C", copy=True)
+    faiss.normalize_L2(x)
+    return x
+
+
+# Codes kept in the index for each FAISS_STORAGE mode.
+_CODECS = {"float32": "Flat", "fp16": "SQfp16", "int8": "SQ8", "pq": "PQ{pq_m}x8"}
+STORAGE_MODES = tuple(_CODECS)
+
+
+def factory_string(
+    n: int,
+    index_type: str,
+    storage: str = "float32",
+    hnsw_m: int = 32,
+    ivf_nlist: int = 0,
+    pq_m: int = 96,
+) -> str:
+    """`faiss.index_factory` description for an index structure + code storage."""
+    if storage not in _CODECS:
+        raise ValueError(f"Unknown FAISS storage mode: {storage}")
+    if storage == "pq" and n < 256:
+        # 8-bit PQ needs at least 256 training points per sub-quantizer.
+        logger.warning("Only %d vectors: too few to train PQ, storing int8", n)
+        storage = "int8"
+    codec = _CODECS[storage].format(pq_m=pq_m)
+    if index_type == "flat":
+        return codec
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m},{codec}"
+    if index_type == "ivf":
+        # 4·sqrt(n) lists, but no fewer than ~39 training points per centroid
+        nlist = ivf_nlist or max(1, min(int(4 * math.sqrt(n)), n // 39))
+        return f"IVF{nlist},{codec}"
+    raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+
+def build_faiss_index(
+    vectors: np.ndarray,
+    index_type: str,
+    storage: str = "float32",
+    hnsw_m: int = 32,
+    ivf_nlist: int = 0,
+    pq_m: int = 96,
+) -> faiss.Index:
+    """Inner-product index over already-normalised `vectors`."""
+    n, d = vectors.shape
+    description = factory_string(n, index_type, storage, hnsw_m, ivf_nlist, pq_m)
+    index = faiss.index_factory(d, description, faiss.METRIC_INNER_PRODUCT)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = max(40, 2 * hnsw_m)
+    if not index.is_trained:
+        index.train(vectors)
+    if n:
+        index.add(vectors)
+    return index
+
+
+def build_reduced_index(
+    vectors: np.ndarray,
+    dim: int,
+    index_type: str,
+    hnsw_m: int = 32,
+    ivf_nlist: int = 0,
+) -> Optional[faiss.Index]:
+    """
+    First-pass index over a `dim`-dimensional PCA projection of `vectors`,
+    re-normalised so inner product stays a cosine. The PCA is part of the
+    index, so it is searched with full-dimension queries.
+    """
+    n, d = vectors.shape
+    if not 0 < dim < d or n <= dim:
+        logger.warning("Cannot reduce %d vectors of dim %d to %d; skipping", n, d, dim)
+        return None
+    structure = factory_string(n, index_type, "float32", hnsw_m, ivf_nlist)
+    index = faiss.index_factory(
+        d, f"PCA{dim},L2norm,{structure}", faiss.METRIC_INNER_PRODUCT
+    )
+    index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def exact_rescore(vectors: np.ndarray, queries: np.ndarray, cand: np.ndarray, k: int):
+    """
+    Exact top-k of each (normalised) query among its candidate rows of
+    `vectors` (-1 = padding). Returns (scores, rows) like `Index.search`.
+    """
+    valid = cand >= 0
+    rows = np.where(valid, cand, 0)
+    # (n_queries, n_cand, dim) gather — from the page cache when `vectors` is a
+    # memmap — then a single einsum.
+    exact = np.einsum("qd,qcd->qc", queries, vectors[rows])
+    exact[~valid] = -np.inf
+    order = np.argsort(-exact, axis=1)[:, :k]
+    scores = np.take_along_axis(exact, order, axis=1)
+    top = np.take_along_axis(cand, order, axis=1)
+    top[np.isneginf(scores)] = -1
+    return scores.astype(np.float32), top
+
+
+def read_meta(path: Path) -> pa.Table:
+    """Zero-copy, memory-mapped read of the Arrow metadata sidecar."""
+    with pa.memory_map(str(path), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _write_atomic(path: Path, write) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+class FaissIndex:
+    """
+    Read-only view of a `FaissVectorStore` directory for query serving.
+
+    The index file is memory-mapped where the index type allows it and the
+    metadata sidecar is an uncompressed Arrow IPC file, also mapped, so a
+    worker's startup cost and private memory don't grow with the corpus.
+
+    When the index holds compressed codes (fp16 / int8 / PQ), `search` asks it
+    for `rescore_factor`·k candidates and re-ranks them by exact inner product
+    against the float32 vectors, read from the memory-mapped `vectors.npy`.
+
+    With `first_pass="reduced"` and a reduced-dimension index on disk (see
+    `build_reduced_index`), that index picks `first_pass_candidates` rows
+    per query instead and the float32 vectors rescore them the same way.
+    """
+
+    def __init__(
+        self,
+        index_dir: Path,
+        ef_search: int = 64,
+        nprobe: int = 8,
+        rescore_factor: int = 4,
+        first_pass: str = "full",
+        first_pass_candidates: int = 200,
+    ) -> None:
+        if first_pass not in ("full", "reduced"):
+            raise ValueError(f"Unknown first-pass mode: {first_pass}")
+        self.dir = Path(index_dir)
+        info = json.loads((self.dir / INFO_FILE).read_text())
+        self.storage = info.get("storage", "float32")
+        self.rescore_factor = rescore_factor if self.storage != "float32" else 1
+        self.vectors = np.load(self.dir / VECTORS_FILE, mmap_mode="r")
+        self.index = _read_index(self.dir / INDEX_FILE, ef_search, nprobe)
+        self.reduced = None
+        self.first_pass_candidates = first_pass_candidates
+        if first_pass == "reduced":
+            if (self.dir / REDUCED_INDEX_FILE).exists():
+                self.reduced = _read_index(
+                    self.dir / REDUCED_INDEX_FILE, ef_search, nprobe
+                )
+            else:
+                logger.warning(
+                    "No reduced-dimension index in %s (set FAISS_REDUCED_DIM and "
+                    "re-run ingestion); searching full vectors",
+                    self.dir,
+                )
+        self.meta = read_meta(self.dir / META_FILE)
+        self._row_of: Optional[Dict[str, int]] = None
+        self._tag_rows: Optional[Dict[str, np.ndarray]] = None
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def search(self, queries: np.ndarray, k: int):
+        """(scores, rows) arrays of shape (n_queries, k); missing rows are -1."""
+        queries = normalise_rows(queries)
+        k = min(k, max(1, self.ntotal))
+        if self.reduced is not None:
+            n_cand = min(max(k, self.first_pass_candidates), self.ntotal)
+            _, cand = self.reduced.search(queries, n_cand)
+            return self.rescore(queries, cand, k)
+        if self.rescore_factor <= 1:
+            return self.index.search(queries, k)
+        _, cand = self.index.search(queries, min(k * self.rescore_factor, self.ntotal))
+        return self.rescore(queries, cand, k)
+
+    def rescore(self, queries: np.ndarray, cand: np.ndarray, k: int):
+        return exact_rescore(self.vectors, queries, cand, k)
+
+    def rows_for(self, ids: List[str]) -> List[Optional[int]]:
+        """FAISS row of each chunk ID (None where unknown)."""
+        if self._row_of is None:
+            self._row_of = {
+                cid: row for row, cid in enumerate(self.meta.column("id").to_pylist())
+            }
+        return [self._row_of.get(cid) for cid in ids]
+
+    def _partitions(self) -> Dict[str, np.ndarray]:
+        if self._tag_rows is None:
+            tag_rows: Dict[str, List[int]] = {}
+            primary = self.meta.column("condition").to_pylist()
+            merged = (
+                self.meta.column("conditions").to_pylist()
+                if "conditions" in self.meta.column_names
+                else [None] * len(primary)
+            )
+            for row, (tag, more) in enumerate(zip(primary, merged)):
+                for t in {tag, *(more or "").split(",")} - {None, ""}:
+                    tag_rows.setdefault(t, []).append(row)
+            self._tag_rows = {
+                t: np.array(rows, dtype=np.int64) for t, rows in tag_rows.items()
+            }
+        return self._tag_rows
+
+    def condition_tags(self) -> Set[str]:
+        return set(self._partitions())
+
+    def partition_rows(self, tags: Sequence[str]) -> np.ndarray:
+        """Sorted rows whose condition tag (or a merged duplicate's) is in `tags`."""
+        parts = [self._partitions()[t] for t in tags if t in self._partitions()]
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, np.int64)
+
+    def search_rows(self, queries: np.ndarray, rows: np.ndarray, k: int):
+        """Exact top-k among `rows` only, read from the memory-mapped vectors."""
+        queries = normalise_rows(queries)
+        if not len(rows):
+            empty = np.full((len(queries), k), -1, dtype=np.int64)
+            return np.full((len(queries), k), -np.inf, dtype=np.float32), empty
+        cand = np.broadcast_to(rows, (len(queries), len(rows)))
+        return exact_rescore(self.vectors, queries, cand, min(k, len(rows)))
+
+    def records(self, rows: np.ndarray) -> List[dict]:
+        return self.meta.take(pa.array(rows, type=pa.int64())).to_pylist()
+
+
+def _read_index(path: Path, ef_search: int, nprobe: int) -> faiss.Index:
+    try:
+        index = faiss.read_index(str(path), faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        # HNSW graphs cannot be mapped; fall back to a regular load.
+        index = faiss.read_index(str(path))
+    inner = faiss.downcast_index(
+        index.index if isinstance(index, faiss.IndexPreTransform) else index
+    )
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+    elif isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = nprobe
+    return index
+
+
+class FaissVectorStore(VectorStore):
+    """
+    FAISS-backed store: `index.faiss` (inner product over L2-normalised
+    vectors), `vectors.npy` (the same vectors, for rebuilds and rescoring) and
+    `meta.arrow` (text + metadata, one row per FAISS id).
+
+    With a compressed `storage` mode only the codes live in the index; the
+    float32 rows in `vectors.npy` serve as the exact-rescoring tier. A
+    `reduced_dim` > 0 also writes `index_reduced.faiss`, a PCA-projected
+    first-pass index for two-stage search.
+
+    FAISS graph/IVF indexes do not support in-place upserts cheaply, so changes
+    are buffered and `save()` compacts the rows and rebuilds the index; at our
+    corpus size that is far cheaper than the embedding work it follows. The
+    buffered vectors go straight to `pending.f32` as they arrive, and `save()`
+    streams old and new rows into the new `vectors.npy` block by block, so the
+    vectors never have to fit in RAM next to the index being built. A change
+    of index type, storage or reduced_dim alone also makes `save()` rebuild,
+    from the saved vectors, without re-embedding anything.
+    """
+
+    # Rows copied per block when compacting into a new vectors.npy
+    COPY_BLOCK = 65536
+
+    def __init__(
+        self,
+        index_dir: Path,
+        index_type: str = "flat",
+        storage: str = "float32",
+        hnsw_m: int = 32,
+        ivf_nlist: int = 0,
+        pq_m: int = 96,
+        reduced_dim: int = 0,
+    ) -> None:
+        self.persist_dir = Path(index_dir)
+        self.index_type = index_type
+        self.storage = storage
+        self.hnsw_m = hnsw_m
+        self.ivf_nlist = ivf_nlist
+        self.pq_m = pq_m
+        self.reduced_dim = reduced_dim
+        # chunk ID → (record, row in pending.f32); the vectors stay on disk
+        self._pending: Dict[str, tuple] = {}
+        self._pending_rows = 0
+        self._pending_dim = 0
+        self._deleted: set = set()
+        self._load()
+        # Rows staged by an earlier process that never saved are not ours
+        self._drop_pending_file()
+
+    def _load(self) -> None:
+        self._vectors = None
+        self._meta = META_SCHEMA.empty_table()
+        # Settings the saved files were built with (reduced_dim as requested,
+        # whether or not the reduced index could be built then)
+        self._saved_build: Optional[dict] = None
+        if (self.persist_dir / META_FILE).exists():
+            self._vectors = np.load(self.persist_dir / VECTORS_FILE, mmap_mode="r")
+            self._meta = read_meta(self.persist_dir / META_FILE)
+            info = json.loads((self.persist_dir / INFO_FILE).read_text())
+            self._saved_build = info.get("build")
+
+    def _build_settings(self) -> dict:
+        """Everything that shapes the index files, short of the vectors."""
+        return {
+            "index_type": self.index_type,
+            "storage": self.storage,
+            "hnsw_m": self.hnsw_m,
+            "ivf_nlist": self.ivf_nlist,
+            "pq_m": self.pq_m,
+            "reduced_dim": self.reduced_dim,
+        }
+
+    def _drop_pending_file(self) -> None:
+        (self.persist_dir / PENDING_FILE).unlink(missing_ok=True)
+        self._pending_rows = 0
+
+    def add_chunks(self, chunks: List[GuidelineChunk], embeddings: np.ndarray) -> None:
+        if not len(chunks):
+            return
+        vectors = normalise_rows(np.asarray(embeddings)[: len(chunks)])
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        with (self.persist_dir / PENDING_FILE).open("ab") as fh:
+            fh.write(vectors.tobytes())
+        for chunk in chunks:
+            record = {"id": chunk.chunk_id, "text": chunk.text, **chunk.metadata()}
+            # A later upsert of the same ID wins; its earlier row is just skipped
+            self._pending[chunk.chunk_id] = (record, self._pending_rows)
+            self._pending_rows += 1
+            self._deleted.discard(chunk.chunk_id)
+        self._pending_dim = vectors.shape[1]
+
+    def delete(self, ids: List[str]) -> None:
+        for cid in ids:
+            self._pending.pop(cid, None)
+            self._deleted.add(cid)
+
+    def reset(self) -> None:
+        self._pending.clear()
+        self._pending_rows = 0
+        self._deleted.clear()
+        self._vectors = None
+        self._meta = META_SCHEMA.empty_table()
+        self._saved_build = None
+        if self.persist_dir.exists():
+            shutil.rmtree(self.persist_dir)
+
+    def _write_vectors(self, path: Path, keep: List[int], staged: List[int]) -> None:
+        """Old rows `keep`, then pending.f32 rows `staged`, copied block by block."""
+        dim = self._vectors.shape[1] if self._vectors is not None else self._pending_dim
+        out = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float32, shape=(len(keep) + len(staged), dim)
+        )
+        pos = 0
+        sources = [(self._vectors, keep)]
+        if staged:
+            pending = np.memmap(
+                self.persist_dir / PENDING_FILE,
+                dtype=np.float32,
+                mode="r",
+                shape=(self._pending_rows, dim),
+            )
+            sources.append((pending, staged))
+        for source, rows in sources:
+            for i in range(0, len(rows), self.COPY_BLOCK):
+                block = rows[i : i + self.COPY_BLOCK]
+                out[pos : pos + len(block)] = source[block]
+                pos += len(block)
+        out.flush()
+        del out
+
+    def save(self) -> None:
+        if (
+            not self._pending
+            and not self._deleted
+            and self._vectors is not None
+            and self._saved_build == self._build_settings()
+        ):
+            return
+
+        # Keep old rows that were neither deleted nor overwritten, then append.
+        old_ids = self._meta.column("id").to_pylist()
+        keep = [
+            i
+            for i, cid in enumerate(old_ids)
+            if cid not in self._deleted and cid not in self._pending
+        ]
+        records = self._meta.take(pa.array(keep, type=pa.int64())).to_pylist()
+        records += [rec for rec, _ in self._pending.values()]
+        staged = [row for _, row in self._pending.values()]
+        if not records:
+            # Every row was deleted: don't leave the old files being served
+            logger.warning("FAISS store is empty; removing its index files")
+            self.reset()
+            return
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        vectors_tmp = self.persist_dir / (VECTORS_FILE + ".tmp")
+        self._write_vectors(vectors_tmp, keep, staged)
+        # Index builds read the new file through the page cache
+        vectors = np.load(vectors_tmp, mmap_mode="r")
+        meta = pa.Table.from_pylist(
+            [{k: r.get(k) for k in META_SCHEMA.names} for r in records],
+            schema=META_SCHEMA,
+        )
+        index = build_faiss_index(
+            vectors, self.index_type, self.storage, self.hnsw_m, self.ivf_nlist, self.pq_m
+        )
+        reduced = None
+        if self.reduced_dim:
+            reduced = build_reduced_index(
+                vectors, self.reduced_dim, self.index_type, self.hnsw_m, self.ivf_nlist
+            )
+
+        os.replace(vectors_tmp, self.persist_dir / VECTORS_FILE)
+        _write_atomic(self.persist_dir / META_FILE, lambda p: _write_meta(p, meta))
+        _write_atomic(
+            self.persist_dir / INDEX_FILE, lambda p: faiss.write_index(index, str(p))
+        )
+        if reduced is not None:
+            _write_atomic(
+                self.persist_dir / REDUCED_INDEX_FILE,
+                lambda p: faiss.write_index(reduced, str(p)),
+            )
+        else:
+            (self.persist_dir / REDUCED_INDEX_FILE).unlink(missing_ok=True)
+        self._saved_build = self._build_settings()
+        (self.persist_dir / INFO_FILE).write_text(
+            json.dumps(
+                {
+                    "index_type": self.index_type,
+                    "storage": self.storage,
+                    "dim": vectors.shape[1],
+                    "reduced_dim": self.reduced_dim if reduced is not None else 0,
+                    "count": len(vectors),
+                    "build": self._saved_build,
+                }
+            )
+        )
+        logger.info(
+            "Wrote FAISS %s/%s index with %d vectors",
+            self.index_type,
+            self.storage,
+            len(vectors),
+        )
+
+        self._vectors = np.load(self.persist_dir / VECTORS_FILE, mmap_mode="r")
+        self._meta = meta
+        self._pending.clear()
+        self._deleted.clear()
+        self._drop_pending_file()
+
+
+def _write_meta(path: Path, table: pa.Table) -> None:
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
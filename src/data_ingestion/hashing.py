@@ -0,0 +1,26 @@
+import hashlib
+import re
+from pathlib import Path
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalise_text(text: str) -> str:
+    """Collapse runs of whitespace so re-formatting a record does not change its hash."""
+    return _WS_RE.sub(" ", text or "").strip()
+
+
+def text_hash(text: str) -> str:
+    """Deterministic 128-bit content hash of the normalised text."""
+    return hashlib.blake2b(
+        normalise_text(text).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+def file_digest(path: Path, block_size: int = 1 << 20) -> str:
+    """Hash a file's raw bytes without loading it all at once."""
+    h = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -0,0 +1,192 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+from .chunking import TokenChunker
+from .cleaners import clean_chunks
+from .dedup import Deduplicator
+from .hashing import text_hash
+from .readers import GuidelineSource, iter_guideline_sources
+from .schemas import GuidelineChunk
+
+logger = logging.getLogger(__name__)
+
+
+def index_version(persist_dir: Path) -> str:
+    """
+    Changes whenever ingestion writes a new state to the store at
+    `persist_dir` (the manifest is saved last); "none" before the first run.
+    """
+    try:
+        st = (Path(persist_dir) / IngestManifest.FILENAME).stat()
+    except FileNotFoundError:
+        return "none"
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+@dataclass
+class IngestPlan:
+    """What one incremental run has to do to bring the store up to date."""
+
+    upserts: List[GuidelineChunk] = field(default_factory=list)
+    deletes: List[str] = field(default_factory=list)
+    # file name → {"digest": str, "chunks": {chunk_id: fingerprint}}
+    changed_files: Dict[str, dict] = field(default_factory=dict)
+    removed_files: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (
+            self.upserts or self.deletes or self.changed_files or self.removed_files
+        )
+
+
+class IngestManifest:
+    """
+    JSON record of what is already indexed, kept next to the vector store.
+
+    `dir_path` is the `processed/` directory or the compacted corpus file.
+    Unchanged files are skipped by byte digest without being parsed. For changed
+    files, chunks are compared by content-hash ID and metadata fingerprint, so
+    only new or modified chunks are embedded. Chunk IDs no longer referenced by
+    any file are deleted.
+    """
+
+    FILENAME = "ingest_manifest.json"
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # Embedding model + chunking settings the indexed vectors were built with
+        self.index_config: Optional[dict] = None
+        self.files: Dict[str, dict] = {}
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            self.index_config = data.get("index_config")
+            self.files = data.get("files", {})
+
+    def clear(self) -> None:
+        self.files = {}
+
+    def live_ids(self) -> Set[str]:
+        return {cid for entry in self.files.values() for cid in entry["chunks"]}
+
+    def iter_upserts(
+        self,
+        dir_path: Path,
+        plan: IngestPlan,
+        chunker: Optional[TokenChunker] = None,
+        dedup: Optional[Deduplicator] = None,
+    ) -> Iterator[GuidelineChunk]:
+        """
+        Yield new or modified chunks one file at a time, filling in `plan`.
+
+        Each changed file's records are split into model-sized windows as one
+        batch, given a `chunker`, and then cleaned. Splitting the raw text
+        lets paragraph breaks count as sentence boundaries.
+
+        A `dedup` pass clusters every record at once. Its per-source
+        signatures are cached under the file digest, so only changed files
+        are parsed for it, one at a time, and their records are dropped once
+        keyed; a file is reprocessed (and parsed again) when its digest or its
+        dedup outcome changed (an edit elsewhere can drop its records or move
+        merged tags onto them).
+
+        `plan.removed_files` and `plan.deletes` are only known once the
+        generator is exhausted.
+        """
+        known = {
+            cid: fp for entry in self.files.values() for cid, fp in entry["chunks"].items()
+        }
+        emitted: Set[str] = set()
+        seen_files = set()
+
+        sources = list(iter_guideline_sources(dir_path))
+
+        def _records(source: GuidelineSource) -> List[GuidelineChunk]:
+            # MinHash shingles on words, so raw whitespace doesn't matter here
+            return [c for c in source.load() if c.text.strip()]
+
+        survivors = None
+        if dedup is not None:
+            # Only the compact keys stay resident, never the whole corpus
+            survivors = dedup.resolve(
+                {
+                    s.name: dedup.source_keys(s.name, s.digest, partial(_records, s))
+                    for s in sources
+                }
+            )
+            dedup.prune_cache(s.name for s in sources)
+
+        for source in sources:
+            seen_files.add(source.name)
+            entry = self.files.get(source.name)
+            outcome = None
+            if survivors is not None:
+                outcome = text_hash(json.dumps(survivors[source.name]))
+            if (
+                entry is not None
+                and entry["digest"] == source.digest
+                and entry.get("dedup") == outcome
+            ):
+                continue
+
+            if survivors is not None:
+                chunks = dedup.merge(_records(source), survivors[source.name])
+            else:
+                chunks = source.load()
+            if chunker is not None:
+                chunks = chunker.split(chunks)
+            chunks = clean_chunks(chunks)
+            keyed = [(c, c.chunk_id, c.fingerprint()) for c in chunks]
+            fingerprints = {cid: fp for _, cid, fp in keyed}
+            for c, cid, fp in keyed:
+                if known.get(cid) != fp and cid not in emitted:
+                    emitted.add(cid)
+                    yield c
+            plan.changed_files[source.name] = {
+                "digest": source.digest,
+                "chunks": fingerprints,
+            }
+            if outcome is not None:
+                plan.changed_files[source.name]["dedup"] = outcome
+
+        plan.removed_files = sorted(set(self.files) - seen_files)
+
+        new_files = {
+            name: entry
+            for name, entry in self.files.items()
+            if name not in plan.removed_files
+        }
+        new_files.update(plan.changed_files)
+        new_ids = {cid for entry in new_files.values() for cid in entry["chunks"]}
+        plan.deletes = sorted(self.live_ids() - new_ids)
+
+    def plan(
+        self,
+        dir_path: Path,
+        chunker: Optional[TokenChunker] = None,
+        dedup: Optional[Deduplicator] = None,
+    ) -> IngestPlan:
+        plan = IngestPlan()
+        plan.upserts = list(self.iter_upserts(dir_path, plan, chunker, dedup))
+        return plan
+
+    def apply(self, plan: IngestPlan) -> None:
+        for name in plan.removed_files:
+            self.files.pop(name, None)
+        self.files.update(plan.changed_files)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {"index_config": self.index_config, "files": self.files},
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        tmp.replace(self.path)
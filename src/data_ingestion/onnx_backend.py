@@ -0,0 +1,292 @@
+"""
+Int8 ONNX Runtime drop-ins for the SentenceTransformer embedder and the
+CrossEncoder reranker.
+
+    python -m src.data_ingestion.onnx_backend export   # fp32 export + int8 quantisation
+    python -m src.data_ingestion.onnx_backend parity   # compare against the torch models
+
+`OnnxSentenceEncoder.encode` and `OnnxCrossEncoder.predict` mirror the
+sentence-transformers methods the rest of the code calls, so `Embedder` and
+`GuidelineRetriever` switch backends via MODEL_BACKEND=onnx alone. A model
+that has not been exported, or a missing onnxruntime, falls back to torch
+with a warning (see `select_onnx_dir`).
+"""
+
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embedding_cache import model_slug
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+CONFIG_FILE = "onnx_config.json"
+MODEL_BACKENDS = ("torch", "onnx")
+
+logger = logging.getLogger(__name__)
+
+
+def onnx_model_dir(root: Path, model_name: str) -> Path:
+    return Path(root) / model_slug(model_name)
+
+
+def select_onnx_dir(backend: str, root: Path, model_name: str) -> Optional[Path]:
+    """
+    Directory to serve `model_name` from with ONNX Runtime, or None for
+    torch: MODEL_BACKEND=torch, or "onnx" without an export of the model
+    under `root` or without onnxruntime installed.
+    """
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(
+            f"Unknown MODEL_BACKEND: {backend} (expected one of {MODEL_BACKENDS})"
+        )
+    if backend == "torch":
+        return None
+    model_dir = onnx_model_dir(root, model_name)
+    # Written last by `export_model`
+    if not (model_dir / CONFIG_FILE).exists():
+        logger.warning(
+            "No ONNX export of %s in %s (run `python -m "
+            "src.data_ingestion.onnx_backend export`); using torch",
+            model_name,
+            model_dir,
+        )
+        return None
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        logger.warning(
+            "MODEL_BACKEND=onnx needs onnxruntime; using torch for %s", model_name
+        )
+        return None
+    return model_dir
+
+
+def embedding_variant(model_name: str, backend: str) -> str:
+    """Name for the vectors a backend produces; int8 vectors differ slightly from
+    fp32 ones, so caches and the index must not mix them."""
+    return f"{model_name}+onnx-int8" if backend == "onnx" else model_name
+
+
+# ------------------------------------------------------------------ export
+def export_model(model_name: str, out_dir: Path, cross_encoder: bool = False) -> Path:
+    """Export `model_name` to ONNX with dynamic batch/sequence axes, then quantise
+    its weights to int8. Returns the path of the quantised model."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if cross_encoder:
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        output = "logits"
+        config = {"kind": "cross-encoder", "max_length": min(tokenizer.model_max_length, 512)}
+        sample = tokenizer(["query"], ["passage text"], return_tensors="pt")
+    else:
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize, Pooling
+
+        st = SentenceTransformer(model_name, device="cpu")
+        model = st[0].auto_model
+        output = "last_hidden_state"
+        pooling = next(m for m in st if isinstance(m, Pooling))
+        config = {
+            "kind": "embedding",
+            "max_length": st.max_seq_length,
+            "pooling": "cls" if pooling.pooling_mode_cls_token else "mean",
+            "normalize": any(isinstance(m, Normalize) for m in st),
+        }
+        sample = tokenizer(["a sample sentence"], return_tensors="pt")
+
+    input_names = list(sample.keys())
+
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, inner) -> None:
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *args):
+            return getattr(self.inner(**dict(zip(input_names, args))), output)
+
+    model.eval()
+    axes = {name: {0: "batch", 1: "seq"} for name in input_names}
+    axes["output"] = {0: "batch"} if cross_encoder else {0: "batch", 1: "seq"}
+    fp32_path = out_dir / FP32_FILE
+    with torch.no_grad():
+        torch.onnx.export(
+            _Wrapper(model),
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["output"],
+            dynamic_axes=axes,
+            opset_version=14,
+        )
+
+    int8_path = out_dir / INT8_FILE
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(out_dir)
+    config["model_name"] = model_name
+    (out_dir / CONFIG_FILE).write_text(json.dumps(config, indent=2))
+    return int8_path
+
+
+# ----------------------------------------------------------------- runtime
+class _OnnxModel:
+    def __init__(
+        self, model_dir: Path, quantized: bool = True, num_threads: Optional[int] = None
+    ) -> None:
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.config = json.loads((model_dir / CONFIG_FILE).read_text())
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(model_dir / (INT8_FILE if quantized else FP32_FILE)),
+            opts,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _run(self, *texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        enc = self.tokenizer(
+            *texts,
+            padding=True,
+            truncation=True,
+            max_length=self.config["max_length"],
+            return_tensors="np",
+        )
+        feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self.input_names}
+        return self.session.run(None, feeds)[0], enc["attention_mask"]
+
+
+class OnnxSentenceEncoder(_OnnxModel):
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+    ) -> np.ndarray:
+        out = []
+        for i in range(0, len(texts), batch_size):
+            hidden, mask = self._run(texts[i : i + batch_size])
+            if self.config["pooling"] == "cls":
+                pooled = hidden[:, 0]
+            else:
+                m = mask[..., None].astype(np.float32)
+                pooled = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+            if self.config["normalize"]:
+                pooled /= np.linalg.norm(pooled, axis=1, keepdims=True).clip(1e-12)
+            out.append(pooled.astype(np.float32))
+        return np.concatenate(out) if out else np.zeros((0, 0), dtype=np.float32)
+
+
+class OnnxCrossEncoder(_OnnxModel):
+    @property
+    def max_length(self) -> int:
+        return self.config["max_length"]
+
+    def predict(
+        self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32
+    ) -> np.ndarray:
+        """
+        Relevance per (query, passage) pair: the sigmoid of the logit, the
+        0–1 scale `CrossEncoder.predict` returns for single-label models.
+        """
+        scores = []
+        for i in range(0, len(pairs), batch_size):
+            queries, passages = zip(*pairs[i : i + batch_size])
+            logits, _ = self._run(list(queries), list(passages))
+            scores.append(1.0 / (1.0 + np.exp(-logits[:, 0].astype(np.float32))))
+        return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+
+
+# ------------------------------------------------------------------ parity
+def parity_report(
+    embedding_model: str,
+    rerank_model: str,
+    onnx_root: Path,
+    passages: List[str],
+    queries: List[str],
+    k: int = 5,
+) -> dict:
+    """
+    Compare int8 ONNX against the fp32 torch models: per-text cosine between
+    the two embeddings, and top-k overlap of the reranked `passages` per query.
+    """
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+    ref = SentenceTransformer(embedding_model, device="cpu").encode(
+        passages, convert_to_numpy=True, normalize_embeddings=True
+    )
+    got = OnnxSentenceEncoder(onnx_model_dir(onnx_root, embedding_model)).encode(passages)
+    got = got / np.linalg.norm(got, axis=1, keepdims=True).clip(1e-12)
+    cos = (ref * got).sum(axis=1)
+
+    ref_ce = CrossEncoder(rerank_model, device="cpu")
+    onnx_ce = OnnxCrossEncoder(onnx_model_dir(onnx_root, rerank_model))
+    overlaps = []
+    for q in queries:
+        pairs = [(q, p) for p in passages]
+        top_ref = set(np.argsort(-np.asarray(ref_ce.predict(pairs)))[:k])
+        top_onnx = set(np.argsort(-onnx_ce.predict(pairs))[:k])
+        overlaps.append(len(top_ref & top_onnx) / k)
+
+    return {
+        "embedding_cosine_mean": float(cos.mean()),
+        "embedding_cosine_min": float(cos.min()),
+        f"rerank_top{k}_overlap_mean": float(np.mean(overlaps)),
+        f"rerank_top{k}_overlap_min": float(np.min(overlaps)),
+        "n_passages": len(passages),
+        "n_queries": len(queries),
+    }
+
+
+def _main() -> None:
+    from config.settings import (
+        EMBEDDING_MODEL,
+        GUIDELINE_DIR,
+        ONNX_MODEL_DIR,
+        RERANK_CROSS_ENCODER,
+    )
+    from src.condition_extractor.patterns import FULL_ICD10_MAP
+
+    from .readers import iter_guideline_chunks
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--passages", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        for name, is_ce in ((EMBEDDING_MODEL, False), (RERANK_CROSS_ENCODER, True)):
+            path = export_model(name, onnx_model_dir(ONNX_MODEL_DIR, name), is_ce)
+            print(f"Exported {name} → {path}")
+        return
+
+    corpus = [c.text for c in iter_guideline_chunks(GUIDELINE_DIR) if c.text.strip()]
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(corpus), min(args.passages, len(corpus)), replace=False)
+    passages = [corpus[i] for i in picks]
+    queries = [conds[0] for conds, _, _ in FULL_ICD10_MAP.values()]
+    report = parity_report(
+        EMBEDDING_MODEL, RERANK_CROSS_ENCODER, ONNX_MODEL_DIR, passages, queries, args.k
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,12 +1,24 @@
+import argparse
 import logging
+import time
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
 
 from .config import settings
 from .schemas import DrugEntry, GuidelineChunk
-from .readers import load_drug_entries, iter_guideline_chunks
-from .cleaners import clean_chunks
+from .readers import load_drug_entries
+from .bm25 import DIRNAME as BM25_DIRNAME, Bm25Builder
+from .chunking import TokenChunker
+from .corpus import pick_guideline_source
+from .dedup import DIRNAME as DEDUP_DIRNAME, Deduplicator
 from .embedders import Embedder
+from .embedding_cache import EmbeddingCache
+from .manifest import IngestManifest, IngestPlan
+from .onnx_backend import embedding_variant, select_onnx_dir
+from .shards import SHARDS_DIRNAME, ShardedVectorStore
+from .stages import background, batched
 from .vector_store import ChromaVectorStore, VectorStore
 
 logger = logging.getLogger(__name__)
@@ -19,42 +31,240 @@ class IngestionPipeline:
         guideline_dir: Path,
         embedder: Embedder,
         vector_store: VectorStore,
+        manifest: IngestManifest,
+        chunker: Optional[TokenChunker] = None,
+        dedup: Optional[Deduplicator] = None,
+        sparse_index: Optional[Bm25Builder] = None,
+        batch_size: int = 256,
+        queue_depth: int = 4,
     ) -> None:
         self.drug_path = drug_path
         self.guideline_dir = guideline_dir
         self.embedder = embedder
         self.vector_store = vector_store
+        self.manifest = manifest
+        self.chunker = chunker
+        self.dedup = dedup
+        self.sparse_index = sparse_index
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        self.embed_seconds = 0.0
+
+    def _embed(
+        self, batches: Iterable[List[GuidelineChunk]]
+    ) -> Iterator[Tuple[List[GuidelineChunk], np.ndarray]]:
+        for batch in batches:
+            t0 = time.perf_counter()
+            embeddings = self.embedder.encode([c.text for c in batch])
+            self.embed_seconds += time.perf_counter() - t0
+            yield batch, embeddings
+
+    def _index_config(self) -> dict:
+        config = {"embedding_model": self.embedder.variant}
+        if self.chunker is not None:
+            config.update(self.chunker.config)
+        if self.sparse_index is not None:
+            # Adding the sparse index to an existing store needs every chunk once
+            config["sparse_index"] = "bm25"
+        if isinstance(self.vector_store, ShardedVectorStore):
+            config["shard_by"] = self.vector_store.by
+        return config
 
-    def run(self) -> None:
+    def run(self, incremental: bool = True) -> None:
         logger.info("Loading drug entries …")
         drugs: List[DrugEntry] = load_drug_entries(self.drug_path)
         logger.info("Loaded %d drug entries", len(drugs))
 
-        logger.info("Streaming & cleaning guideline chunks …")
-        chunks: List[GuidelineChunk] = list(iter_guideline_chunks(self.guideline_dir))
-        chunks = clean_chunks(chunks)
-        logger.info("Prepared %d chunks", len(chunks))
+        index_config = self._index_config()
+        if not incremental or self.manifest.index_config != index_config:
+            logger.info("Full rebuild: clearing vector store and manifest …")
+            self.vector_store.reset()
+            if self.sparse_index is not None:
+                self.sparse_index.reset()
+            self.manifest.clear()
+            self.manifest.index_config = index_config
 
-        logger.info("Embedding chunks …")
-        texts = [c.text for c in chunks]
-        embeddings = self.embedder.encode(texts)
+        # read+clean → embed → write, each stage on its own thread and at most
+        # `queue_depth` batches ahead of the next, so memory stays flat.
+        logger.info("Streaming changed chunks through embed → store …")
+        started = time.perf_counter()
+        self.embed_seconds = 0.0
+        plan = IngestPlan()
+        batches = background(
+            batched(
+                self.manifest.iter_upserts(
+                    self.guideline_dir, plan, self.chunker, self.dedup
+                ),
+                self.batch_size,
+            ),
+            self.queue_depth,
+        )
+        embedded = background(self._embed(batches), self.queue_depth)
+        upserted = 0
+        try:
+            for chunks, embeddings in embedded:
+                self.vector_store.add_chunks(chunks, embeddings)
+                if self.sparse_index is not None:
+                    self.sparse_index.add_chunks(chunks)
+                upserted += len(chunks)
+                logger.info("Upserted %d chunks", upserted)
+        finally:
+            # Stop both stage threads now if the write stage failed, rather than
+            # whenever the exception's traceback is garbage-collected.
+            embedded.close()
+            batches.close()
+        elapsed = time.perf_counter() - started
+        if upserted:
+            logger.info(
+                "Throughput: %.1f docs/s embedding, %.1f docs/s end-to-end",
+                upserted / max(self.embed_seconds, 1e-9),
+                upserted / max(elapsed, 1e-9),
+            )
 
-        logger.info("Persisting to vector store …")
-        self.vector_store.add_chunks(chunks, embeddings)
+        logger.info(
+            "%d changed / %d removed files: %d chunks upserted, %d to delete",
+            len(plan.changed_files),
+            len(plan.removed_files),
+            upserted,
+            len(plan.deletes),
+        )
+        if plan.deletes:
+            self.vector_store.delete(plan.deletes)
         self.vector_store.save()
+        if self.sparse_index is not None:
+            if plan.deletes:
+                self.sparse_index.delete(plan.deletes)
+            self.sparse_index.save()
+        if self.embedder.cache is not None:
+            self.embedder.cache.flush()
+            logger.info("Embedding cache: %s", self.embedder.cache.stats())
+
+        # Only record the new state once the store has it.
+        if not plan.is_empty:
+            self.manifest.apply(plan)
+            self.manifest.save()
+
+        if self.dedup is not None and self.dedup.stats.dropped:
+            stats = self.dedup.stats
+            indexed = len(self.manifest.live_ids())
+            # Dropped text would have chunked like the text that was kept
+            kept_chars = max(stats.chars_in - stats.chars_dropped, 1)
+            saved = indexed * stats.chars_dropped / kept_chars
+            logger.info(
+                "Dedup: %s; ~%d fewer vectors in an index of %d", stats, saved, indexed
+            )
+
+
+def build_vector_store() -> VectorStore:
+    backend = settings["vector_store_backend"]
+    if settings["shard_by"]:
+        root = (
+            settings["faiss_index_dir"]
+            if backend == "faiss"
+            else settings["persist_directory"]
+        )
+        return ShardedVectorStore(
+            root, settings["shard_by"], lambda name: _build_store(backend, name)
+        )
+    return _build_store(backend)
+
+
+def _build_store(backend: str, shard: Optional[str] = None) -> VectorStore:
+    if backend == "faiss":
+        from .faiss_store import FaissVectorStore
+
+        index_dir = settings["faiss_index_dir"]
+        if shard is not None:
+            index_dir = index_dir / SHARDS_DIRNAME / shard
+        return FaissVectorStore(
+            index_dir,
+            index_type=settings["faiss_index_type"],
+            storage=settings["faiss_storage"],
+            hnsw_m=settings["faiss_hnsw_m"],
+            ivf_nlist=settings["faiss_ivf_nlist"],
+            pq_m=settings["faiss_pq_m"],
+            reduced_dim=settings["faiss_reduced_dim"],
+        )
+    if backend == "chroma":
+        collection = "guidelines" if shard is None else f"guidelines_{shard}"
+        return ChromaVectorStore(settings["persist_directory"], collection)
+    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {backend}")
 
 
 def build_default_pipeline() -> IngestionPipeline:
-    embedder = Embedder(settings["embedding_model"])
-    vector_store: VectorStore = ChromaVectorStore(settings["persist_directory"])
+    onnx_dir = select_onnx_dir(
+        settings["model_backend"],
+        settings["onnx_model_dir"],
+        settings["embedding_model"],
+    )
+    cache = None
+    if settings["embed_cache_max_mb"] > 0:
+        cache = EmbeddingCache(
+            settings["embed_cache_dir"],
+            embedding_variant(
+                settings["embedding_model"], "onnx" if onnx_dir else "torch"
+            ),
+            max_bytes=settings["embed_cache_max_mb"] << 20,
+        )
+    embedder = Embedder(
+        settings["embedding_model"],
+        num_workers=settings["embed_workers"],
+        batch_size=settings["embed_batch_size"],
+        cache=cache,
+        onnx_dir=onnx_dir,
+    )
+    chunker = TokenChunker.from_pretrained(
+        settings["embedding_model"], settings["chunk_size"], settings["chunk_overlap"]
+    )
+    guideline_source = pick_guideline_source(
+        settings["guideline_dir"], settings["corpus_path"]
+    )
+    logger.info("Reading guidelines from %s", guideline_source)
+    vector_store = build_vector_store()
+    dedup = None
+    if settings["dedup_threshold"] > 0:
+        dedup = Deduplicator(
+            threshold=settings["dedup_threshold"],
+            cache_dir=vector_store.persist_dir / DEDUP_DIRNAME,
+        )
+    manifest = IngestManifest(vector_store.persist_dir / IngestManifest.FILENAME)
+    sparse_index = Bm25Builder(
+        vector_store.persist_dir / BM25_DIRNAME,
+        k1=settings["bm25_k1"],
+        b=settings["bm25_b"],
+    )
     return IngestionPipeline(
         drug_path=settings["drug_db_path"],
-        guideline_dir=settings["guideline_dir"],
+        guideline_dir=guideline_source,
         embedder=embedder,
         vector_store=vector_store,
+        manifest=manifest,
+        chunker=chunker,
+        dedup=dedup,
+        sparse_index=sparse_index,
+        batch_size=settings["ingest_batch_size"],
+        queue_depth=settings["ingest_queue_depth"],
     )
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build / refresh the guideline index")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="drop the index and re-embed everything instead of applying the diff",
+    )
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO)
-    build_default_pipeline().run()
+    pipeline = build_default_pipeline()
+    try:
+        pipeline.run(incremental=not args.full)
+    finally:
+        pipeline.embedder.close()
+
+    if settings["context_table"]:
+        from src.guideline_retriever.context_table import build_context_table
+
+        logger.info("Refreshing the per-condition context table …")
+        build_context_table(full=args.full)
@@ -1,9 +1,23 @@
 import json
+import re
+from functools import partial
 from pathlib import Path
-from typing import List, Iterable
+from typing import Callable, Iterable, List, NamedTuple
 
+from .hashing import file_digest
 from .schemas import DrugEntry, GuidelineChunk
 
+# fetch_pubmed names files "<topic>_<region>.json"; the topic is the tag.
+_REGION_SUFFIX_RE = re.compile(r"_(bangladesh|global|bd)$")
+
+
+class GuidelineSource(NamedTuple):
+    """One unit of change tracking: a processed JSON file, or its rows in the corpus."""
+
+    name: str
+    digest: str
+    load: Callable[[], List[GuidelineChunk]]
+
 
 def load_drug_entries(path: Path) -> List[DrugEntry]:
     """Read medex_data.json and return validated list."""
@@ -14,20 +28,70 @@ def load_drug_entries(path: Path) -> List[DrugEntry]:
     return [DrugEntry(**item) for item in raw]
 
 
-def iter_guideline_chunks(dir_path: Path) -> Iterable[GuidelineChunk]:
+def list_guideline_files(dir_path: Path) -> List[Path]:
+    """Every `processed/*.json` file, in a stable order."""
+    return sorted(dir_path.glob("*.json"))
+
+
+def condition_tag_for(file_name: str) -> str:
+    """Fallback tag for records without one: the file's topic, e.g. "dengue"."""
+    return _REGION_SUFFIX_RE.sub("", Path(file_name).stem)
+
+
+def record_to_chunk(record: dict, source_file: str) -> GuidelineChunk:
     """
-    Stream every JSON file in `processed/*.json`.
-    Each file MUST contain a list of dicts with at least:
-        {"condition_tag": str, "text": str, ...}
+    One processed record. PubMed dumps carry the text in "abstract", WHO PDF
+    chunks in "body".
     """
-    for file_path in dir_path.glob("*.json"):
-        with file_path.open("rt", encoding="utf-8") as fh:
-            data = json.load(fh)
-        for record in data:
-            yield GuidelineChunk(
-                condition_tag=record.get("condition_tag", "general"),
-                text=record.get("abstract", "") or record.get("text", ""),
-                source_file=file_path.name,
-                pmid=record.get("pmid"),
-                page=record.get("page"),
-            )
+    return GuidelineChunk(
+        condition_tag=record.get("condition_tag") or condition_tag_for(source_file),
+        text=record.get("abstract", "")
+        or record.get("text", "")
+        or record.get("body", ""),
+        source_file=source_file,
+        pmid=record.get("pmid"),
+        page=record.get("page"),
+        char_start=record.get("char_start"),
+        char_end=record.get("char_end"),
+        source_type=record.get("source_type"),
+    )
+
+
+def read_guideline_records(file_path: Path) -> List[dict]:
+    with file_path.open("rt", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def read_guideline_file(file_path: Path) -> List[GuidelineChunk]:
+    """
+    Parse one processed JSON file.
+    The file MUST contain a list of dicts with at least:
+        {"text" | "abstract" | "body": str, ...}
+    """
+    return [
+        record_to_chunk(record, file_path.name)
+        for record in read_guideline_records(file_path)
+    ]
+
+
+def iter_guideline_sources(path: Path) -> Iterable[GuidelineSource]:
+    """
+    Sources under `path`: the files of a `processed/` directory, or the
+    per-file row ranges of a compacted corpus (see `corpus.py`). Both report
+    the JSON file's byte digest, so switching between them re-embeds nothing.
+    """
+    if path.is_file():
+        from .corpus import GuidelineCorpus
+
+        yield from GuidelineCorpus(path).sources()
+        return
+    for file_path in list_guideline_files(path):
+        yield GuidelineSource(
+            file_path.name, file_digest(file_path), partial(read_guideline_file, file_path)
+        )
+
+
+def iter_guideline_chunks(path: Path) -> Iterable[GuidelineChunk]:
+    """Stream every record of `processed/*.json` or of the compacted corpus."""
+    for source in iter_guideline_sources(path):
+        yield from source.load()
@@ -1,6 +1,9 @@
-from typing import Optional
+import json
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
+from .hashing import text_hash
+
 
 class DrugEntry(BaseModel):
     brand_name: str
@@ -22,3 +25,44 @@ class GuidelineChunk(BaseModel):
     source_file: str
     pmid: Optional[str] = None
     page: Optional[int] = None
+    # Offsets into the raw source text (the record, or its PDF page for WHO
+    # chunks), not into `text`, which has since been cleaned
+    char_start: Optional[int] = None
+    char_end: Optional[int] = None
+    source_type: Optional[str] = None
+    # Tags of duplicate records folded into this one (see dedup.py)
+    merged_sources: List[str] = Field(default_factory=list)
+    merged_conditions: List[str] = Field(default_factory=list)
+    merged_source_types: List[str] = Field(default_factory=list)
+
+    @property
+    def chunk_id(self) -> str:
+        """Content-hash ID: identical text always maps to the same vector-store row."""
+        return text_hash(self.text)
+
+    def metadata(self) -> dict:
+        """Vector-store metadata (Chroma rejects None values, so drop them)."""
+        meta = {"source": self.source_file, "condition": self.condition_tag}
+        if self.pmid is not None:
+            meta["pmid"] = self.pmid
+        if self.page is not None:
+            meta["page"] = self.page
+        if self.char_start is not None:
+            meta["char_start"] = self.char_start
+            meta["char_end"] = self.char_end
+        if self.source_type is not None:
+            meta["source_type"] = self.source_type
+        # Chroma metadata values must be scalars, so merged tags are joined
+        if self.merged_sources:
+            meta["sources"] = ",".join([self.source_file] + self.merged_sources)
+        if self.merged_conditions:
+            meta["conditions"] = ",".join([self.condition_tag] + self.merged_conditions)
+        if self.merged_source_types:
+            meta["source_types"] = ",".join(
+                [self.source_type or ""] + self.merged_source_types
+            ).strip(",")
+        return meta
+
+    def fingerprint(self) -> str:
+        """Hash of text + metadata; changes whenever the stored row would change."""
+        return text_hash(self.text + json.dumps(self.metadata(), sort_keys=True))
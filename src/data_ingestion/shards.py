@@ -0,0 +1,138 @@
+import json
+import logging
+import re
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .schemas import GuidelineChunk
+from .vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+SHARDS_DIRNAME = "shards"
+SHARDS_FILE = "shards.json"
+SHARD_BY = ("source_type", "condition")
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+def shard_name(
+    by: str, source_type: Optional[str], condition_tag: Optional[str]
+) -> str:
+    """Shard name: "bangladesh" / "global" by source type, or the topic."""
+    if by == "source_type":
+        # "Bangladesh-specific" → bangladesh, "Global" → global
+        value = (source_type or "").split("-")[0]
+    elif by == "condition":
+        value = condition_tag or ""
+    else:
+        raise ValueError(f"Unknown SHARD_BY: {by}")
+    return _SLUG_RE.sub("_", value.lower()).strip("_") or "unknown"
+
+
+def shard_for(chunk: GuidelineChunk, by: str) -> str:
+    """Shard name of a chunk."""
+    return shard_name(by, chunk.source_type, chunk.condition_tag)
+
+
+def read_shard_names(persist_dir: Path) -> List[str]:
+    path = Path(persist_dir) / SHARDS_FILE
+    if not path.exists():
+        return []
+    return sorted(json.loads(path.read_text())["shards"])
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    One independent store per shard (`shard_for`), created on demand by
+    `make_shard(name)`. Upserts and deletes are routed to the shard that
+    owns the chunk and `save()` only rebuilds shards that changed, so each
+    index stays small and a change to local evidence never rebuilds the
+    global pool.
+
+    `shards.json` in `persist_dir` lists the shards and which chunk IDs each
+    holds; the ingest manifest and the BM25 index stay at `persist_dir`,
+    covering all shards.
+    """
+
+    def __init__(
+        self,
+        persist_dir: Path,
+        by: str,
+        make_shard: Callable[[str], VectorStore],
+    ) -> None:
+        if by not in SHARD_BY:
+            raise ValueError(f"Unknown SHARD_BY: {by}")
+        self.persist_dir = Path(persist_dir)
+        self.by = by
+        self.make_shard = make_shard
+        self.shards: Dict[str, VectorStore] = {}
+        self._shard_of: Dict[str, str] = {}
+        path = self.persist_dir / SHARDS_FILE
+        if path.exists():
+            data = json.loads(path.read_text())
+            for name, ids in data["shards"].items():
+                self._shard(name)
+                self._shard_of.update(dict.fromkeys(ids, name))
+
+    def _shard(self, name: str) -> VectorStore:
+        if name not in self.shards:
+            self.shards[name] = self.make_shard(name)
+        return self.shards[name]
+
+    def add_chunks(self, chunks: List[GuidelineChunk], embeddings: np.ndarray) -> None:
+        routed: Dict[str, List[int]] = {}
+        moved: Dict[str, List[str]] = {}
+        for i, chunk in enumerate(chunks):
+            name = shard_for(chunk, self.by)
+            old = self._shard_of.get(chunk.chunk_id)
+            if old is not None and old != name:
+                moved.setdefault(old, []).append(chunk.chunk_id)
+            self._shard_of[chunk.chunk_id] = name
+            routed.setdefault(name, []).append(i)
+        for name, ids in moved.items():
+            self._shard(name).delete(ids)
+        for name, rows in routed.items():
+            self._shard(name).add_chunks([chunks[i] for i in rows], embeddings[rows])
+
+    def delete(self, ids: List[str]) -> None:
+        routed: Dict[str, List[str]] = {}
+        for cid in ids:
+            name = self._shard_of.pop(cid, None)
+            if name is not None:
+                routed.setdefault(name, []).append(cid)
+        for name, shard_ids in routed.items():
+            self._shard(name).delete(shard_ids)
+
+    def reset(self) -> None:
+        for shard in self.shards.values():
+            shard.reset()
+        self.shards.clear()
+        self._shard_of.clear()
+        (self.persist_dir / SHARDS_FILE).unlink(missing_ok=True)
+        if (self.persist_dir / SHARDS_DIRNAME).exists():
+            shutil.rmtree(self.persist_dir / SHARDS_DIRNAME)
+
+    def save(self) -> None:
+        ids: Dict[str, List[str]] = {name: [] for name in self.shards}
+        for cid, name in self._shard_of.items():
+            ids[name].append(cid)
+        for name in sorted(self.shards):
+            if ids[name]:
+                self.shards[name].save()
+            else:
+                # Last chunk gone: drop the shard rather than keep a stale index
+                self.shards.pop(name).reset()
+                del ids[name]
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        (self.persist_dir / SHARDS_FILE).write_text(
+            json.dumps({"by": self.by, "shards": ids})
+        )
+        logger.info(
+            "Shards by %s: %s",
+            self.by,
+            ", ".join(f"{name}={len(v)}" for name, v in sorted(ids.items())),
+        )
@@ -0,0 +1,66 @@
+import queue
+import threading
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Group a stream into lists of at most `size` items."""
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def background(items: Iterable[T], maxsize: int) -> Iterator[T]:
+    """
+    Drain `items` on a worker thread into a bounded queue and yield from it.
+
+    Chaining `background(...)` calls turns a generator pipeline into overlapping
+    stages: each stage runs ahead of its consumer by at most `maxsize` items, so
+    memory stays bounded no matter how long the stream is. Exceptions raised by
+    the producer are re-raised in the consumer.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as exc:  # surfaced in the consumer
+            put(_Failure(exc))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,35 @@
+import tempfile
+from pathlib import Path
+
+from data_ingestion.bm25 import Bm25Builder, Bm25Index
+from data_ingestion.schemas import GuidelineChunk
+
+
+def _chunk(text: str) -> GuidelineChunk:
+    return GuidelineChunk(condition_tag="diarrhea", text=text, source_file="d.json")
+
+
+def test_exact_terms_rank_first_and_survive_incremental_updates():
+    docs = [
+        _chunk("Give ORS after every loose stool"),
+        _chunk("Zinc for ten days shortens diarrhoea"),
+        _chunk("Keep giving fluids and food; ORS, ORS and more ORS"),
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = Path(tmp_dir) / "bm25"
+        builder = Bm25Builder(index_dir)
+        builder.add_chunks(docs)
+        builder.save()
+
+        hits = Bm25Index(index_dir).search(["ors"], 5)[0]
+        assert [cid for cid, _ in hits] == [docs[2].chunk_id, docs[0].chunk_id]
+
+        # Reopened builder: drop one chunk, add another
+        builder = Bm25Builder(index_dir)
+        builder.delete([docs[2].chunk_id])
+        builder.add_chunks([_chunk("Zinc tablets dissolve in ORS")])
+        builder.save()
+
+        index = Bm25Index(index_dir)
+        assert len(index.search(["ors"], 5)[0]) == 2
+        assert docs[1].chunk_id in {cid for cid, _ in index.search(["zinc"], 5)[0]}
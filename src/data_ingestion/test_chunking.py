@@ -0,0 +1,61 @@
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from data_ingestion.chunking import TokenChunker
+from data_ingestion.schemas import GuidelineChunk
+
+
+def _whitespace_tokenizer() -> Tokenizer:
+    tok = Tokenizer(WordLevel({"[UNK]": 0}, unk_token="[UNK]"))
+    tok.pre_tokenizer = Whitespace()
+    return tok
+
+
+def test_windows_respect_size_and_sentences():
+    chunker = TokenChunker(_whitespace_tokenizer(), chunk_size=12, chunk_overlap=7)
+    text = " ".join(f"Sentence {i} has five tokens." for i in range(10))
+    tok = chunker.tokenizer
+    [spans] = chunker.spans([text])
+
+    assert len(spans) > 1
+    for start, end in spans:
+        piece = text[start:end]
+        assert len(tok.encode(piece, add_special_tokens=False).ids) <= 12
+        assert piece.startswith("Sentence") and piece.endswith(".")
+    # Windows overlap by one sentence and cover the whole text
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    assert all(b[0] < a[1] for a, b in zip(spans, spans[1:]))
+
+
+def test_split_keeps_metadata_and_offsets():
+    chunker = TokenChunker(_whitespace_tokenizer(), chunk_size=8, chunk_overlap=0)
+    long_doc = GuidelineChunk(
+        condition_tag="dengue",
+        text="word " * 20,
+        source_file="who.json",
+        page=3,
+        char_start=100,
+    )
+    short_doc = GuidelineChunk(condition_tag="dengue", text="Drink ORS.", source_file="a")
+
+    out = chunker.split([long_doc, short_doc])
+    assert out[-1] is short_doc
+    pieces = out[:-1]
+    assert len(pieces) == 3
+    assert all(p.page == 3 and p.condition_tag == "dengue" for p in pieces)
+    assert pieces[0].char_start == 100
+    assert long_doc.text[pieces[1].char_start - 100 : pieces[1].char_end - 100] == (
+        pieces[1].text
+    )
+
+
+def test_blank_lines_break_sentences_without_punctuation():
+    chunker = TokenChunker(_whitespace_tokenizer(), chunk_size=6, chunk_overlap=0)
+    text = "Warning signs\n\nfever rash bleeding gums vomiting\n\nseek care today"
+    [spans] = chunker.spans([text])
+    assert [text[a:b] for a, b in spans] == [
+        "Warning signs",
+        "fever rash bleeding gums vomiting",
+        "seek care today",
+    ]
@@ -0,0 +1,34 @@
+from data_ingestion.dedup import Deduplicator
+from data_ingestion.schemas import GuidelineChunk
+
+ABSTRACT = (
+    "Oral rehydration solution remains the first line treatment for acute "
+    "watery diarrhoea in children and adults, and zinc supplementation for "
+    "ten to fourteen days shortens the episode in young children."
+)
+
+
+def _doc(source: str, tag: str, text: str, pmid=None) -> GuidelineChunk:
+    return GuidelineChunk(condition_tag=tag, text=text, source_file=source, pmid=pmid)
+
+
+def test_pmid_and_near_duplicates_merge_into_first_record():
+    dedup = Deduplicator(threshold=0.8)
+    out = dedup.apply(
+        {
+            "diarrhea_bangladesh.json": [
+                _doc("diarrhea_bangladesh.json", "diarrhea", ABSTRACT, "7")
+            ],
+            "cholera_global.json": [
+                _doc("cholera_global.json", "cholera", "Different text, same PMID", "7"),
+                _doc("cholera_global.json", "cholera", ABSTRACT + " Results.", "8"),
+                _doc("cholera_global.json", "cholera", "Cholera vaccines are safe"),
+            ],
+        }
+    )
+
+    assert [c.text for c in out["cholera_global.json"]] == ["Cholera vaccines are safe"]
+    (kept,) = out["diarrhea_bangladesh.json"]
+    assert kept.merged_sources == ["cholera_global.json"]
+    assert kept.metadata()["conditions"] == "diarrhea,cholera"
+    assert dedup.stats.pmid_duplicates == 1 and dedup.stats.near_duplicates == 1
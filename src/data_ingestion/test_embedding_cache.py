@@ -0,0 +1,69 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from data_ingestion.embedding_cache import EmbeddingCache
+
+DIM = 4
+
+
+def _vec(i: int) -> np.ndarray:
+    return np.full((1, DIM), float(i), dtype=np.float32)
+
+
+def _put(cache: EmbeddingCache, text: str, i: int) -> None:
+    cache.put(EmbeddingCache.keys_for([text]), _vec(i))
+
+
+def _get(cache: EmbeddingCache, text: str):
+    vectors, missing = cache.get(EmbeddingCache.keys_for([text]))
+    return None if len(missing) else vectors[0, 0]
+
+
+def test_least_recently_used_rows_are_evicted():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Room for 4 rows; a full cache evicts max(shortfall, capacity // 10)
+        cache = EmbeddingCache(Path(tmp_dir), "m", max_bytes=4 * DIM * 4)
+        for i in range(4):
+            _put(cache, f"t{i}", i)
+        assert _get(cache, "t0") == 0  # t0 is now the most recently used
+        _put(cache, "t4", 4)
+
+        assert _get(cache, "t1") is None
+        assert [_get(cache, t) for t in ("t0", "t2", "t3", "t4")] == [0, 2, 3, 4]
+        assert cache.stats()["entries"] == 4
+
+
+def test_reader_sees_flushed_rows_and_never_a_reused_slot():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        writer = EmbeddingCache(root, "m", max_bytes=2 * DIM * 4)
+        _put(writer, "old", 1)
+        _put(writer, "other", 2)
+        writer.flush()
+
+        reader = EmbeddingCache(root, "m", max_bytes=0, read_only=True)
+        assert _get(reader, "old") == 1
+
+        # The writer evicts "old" and reuses its slot without flushing yet:
+        # the reader's index still maps "old" to that slot.
+        _get(writer, "other")
+        _put(writer, "new", 3)
+        assert _get(reader, "old") is None
+        assert _get(reader, "other") == 2
+
+        # After a flush the reader reloads the index and finds the new row
+        writer.flush()
+        assert _get(reader, "new") == 3
+        assert _get(reader, "old") is None
+
+
+def test_read_only_cache_never_writes():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        reader = EmbeddingCache(root, "m", max_bytes=1 << 20, read_only=True)
+        _put(reader, "t", 1)
+        reader.flush()
+        assert _get(reader, "t") is None
+        assert not any(root.iterdir())
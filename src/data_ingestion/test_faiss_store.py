@@ -0,0 +1,224 @@
+import json
+import tempfile
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from data_ingestion.faiss_store import (
+    INDEX_FILE,
+    INFO_FILE,
+    PENDING_FILE,
+    REDUCED_INDEX_FILE,
+    FaissIndex,
+    FaissVectorStore,
+)
+from data_ingestion.schemas import GuidelineChunk
+
+DIM = 16
+
+
+def _chunks(n: int, start: int = 0):
+    chunks = [
+        GuidelineChunk(condition_tag="dengue", text=f"doc {i}", source_file="d.json")
+        for i in range(start, start + n)
+    ]
+    rng = np.random.default_rng(start)
+    return chunks, rng.normal(size=(n, DIM)).astype(np.float32)
+
+
+def test_pending_vectors_are_staged_on_disk_until_save():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = Path(tmp_dir) / "faiss"
+        store = FaissVectorStore(index_dir)
+        for batch in range(3):
+            store.add_chunks(*_chunks(10, 10 * batch))
+        # Only IDs and row numbers are held; the vectors sit in pending.f32
+        assert (index_dir / PENDING_FILE).stat().st_size == 30 * DIM * 4
+        assert all(isinstance(row, int) for _, row in store._pending.values())
+
+        store.save()
+        assert not (index_dir / PENDING_FILE).exists()
+        chunks, vectors = _chunks(10, 10)
+        index = FaissIndex(index_dir)
+        _, rows = index.search(vectors[:1], 1)
+        assert index.records(rows[0])[0]["id"] == chunks[0].chunk_id
+
+
+def test_skipped_reduced_index_does_not_force_rebuilds():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = Path(tmp_dir) / "faiss"
+        store = FaissVectorStore(index_dir, reduced_dim=8)
+        store.add_chunks(*_chunks(5))  # too few vectors to fit an 8-d PCA
+        store.save()
+        info = json.loads((index_dir / INFO_FILE).read_text())
+        assert info["reduced_dim"] == 0 and info["build"]["reduced_dim"] == 8
+        assert not (index_dir / REDUCED_INDEX_FILE).exists()
+
+        written = (index_dir / INFO_FILE).stat().st_mtime_ns
+        reopened = FaissVectorStore(index_dir, reduced_dim=8)
+        reopened.save()
+        assert (index_dir / INFO_FILE).stat().st_mtime_ns == written
+
+
+def test_storage_change_alone_rebuilds_from_saved_vectors():
+    chunks, vectors = _chunks(50)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = Path(tmp_dir) / "faiss"
+        store = FaissVectorStore(index_dir)
+        store.add_chunks(chunks, vectors)
+        store.save()
+        flat = faiss.read_index(str(index_dir / INDEX_FILE))
+        assert isinstance(flat, faiss.IndexFlat)
+
+        # Nothing pending or deleted: only the storage setting differs
+        FaissVectorStore(index_dir, storage="int8").save()
+        rebuilt = faiss.read_index(str(index_dir / INDEX_FILE))
+        assert isinstance(rebuilt, faiss.IndexScalarQuantizer)
+        assert rebuilt.ntotal == 50
+        index = FaissIndex(index_dir)
+        assert index.storage == "int8"
+        _, rows = index.search(vectors[3:4], 1)
+        assert index.records(rows[0])[0]["id"] == chunks[3].chunk_id
+
+        written = (index_dir / INFO_FILE).stat().st_mtime_ns
+        FaissVectorStore(index_dir, storage="int8").save()
+        assert (index_dir / INFO_FILE).stat().st_mtime_ns == written
+
+
+def test_compressed_storage_rescored_to_exact_order():
+    chunks, vectors = _chunks(300)
+    queries = vectors[:5] + 0.1
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    q_unit = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = np.argsort(-(q_unit @ unit.T), axis=1)[:, :5]
+    for storage in ("fp16", "int8", "pq"):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir) / "faiss"
+            store = FaissVectorStore(index_dir, storage=storage, pq_m=2)
+            store.add_chunks(chunks, vectors)
+            store.save()
+            index = FaissIndex(index_dir, rescore_factor=8)
+            assert index.storage == storage
+
+            scores, rows = index.search(queries, 5)
+            # Candidates come from the codes; the final order is exact cosine
+            assert (rows[:, 0] == exact[:, 0]).all(), storage
+            expected = np.take_along_axis(q_unit @ unit.T, rows, axis=1)
+            assert np.allclose(scores, expected, atol=1e-5), storage
+
+
+def test_scalar_storage_modes_shrink_the_index():
+    # (At this size a PQ index is mostly codebook, so it is left out here.)
+    chunks, vectors = _chunks(300)
+    sizes = {}
+    for storage in ("float32", "fp16", "int8"):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir) / "faiss"
+            store = FaissVectorStore(index_dir, storage=storage, pq_m=4)
+            store.add_chunks(chunks, vectors)
+            store.save()
+            sizes[storage] = (index_dir / "index.faiss").stat().st_size
+    assert sizes["float32"] > sizes["fp16"] > sizes["int8"]
+
+
+def test_delete_then_resave_drops_rows_and_keeps_the_rest():
+    chunks, vectors = _chunks(20)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = Path(tmp_dir) / "faiss"
+        store = FaissVectorStore(index_dir, storage="int8")
+        store.add_chunks(chunks, vectors)
+        store.save()
+
+        store = FaissVectorStore(index_dir, storage="int8")
+        store.delete([c.chunk_id for c in chunks[:5]])
+        replacement, new_vectors = _chunks(1, 100)
+        store.add_chunks(replacement, new_vectors)
+        store.save()
+
+        index = FaissIndex(index_dir)
+        assert index.ntotal == 16
+        deleted, kept = index.rows_for([chunks[0].chunk_id, chunks[5].chunk_id])
+        assert deleted is None and kept is not None
+        # Surviving rows still line up with their vectors and metadata
+        _, rows = index.search(vectors[7:8], 1)
+        assert index.records(rows[0])[0]["id"] == chunks[7].chunk_id
+        _, rows = index.search(new_vectors, 1)
+        assert index.records(rows[0])[0]["id"] == replacement[0].chunk_id
+
+
+def test_deleting_every_row_removes_the_saved_store():
+    chunks, vectors = _chunks(10)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = Path(tmp_dir) / "faiss"
+        store = FaissVectorStore(index_dir)
+        store.add_chunks(chunks, vectors)
+        store.save()
+
+        store = FaissVectorStore(index_dir)
+        store.add_chunks(*_chunks(2, 50))
+        store.delete([c.chunk_id for c in chunks])
+        store.delete([c.chunk_id for c in _chunks(2, 50)[0]])
+        store.save()
+        assert not (index_dir / INDEX_FILE).exists()
+        assert not (index_dir / PENDING_FILE).exists()
+        assert not store._pending and not store._deleted
+
+        # The emptied store accepts new rows like a fresh one
+        store.add_chunks(*_chunks(3, 100))
+        store.save()
+        assert FaissIndex(index_dir).ntotal == 3
+
+
+def _pca(index_dir: Path):
+    """(reduced index, its PCA); the index owns the PCA, so keep both alive."""
+    reduced = faiss.read_index(str(index_dir / REDUCED_INDEX_FILE))
+    return reduced, faiss.downcast_VectorTransform(reduced.chain.at(0))
+
+
+def test_reduced_first_pass_is_rescored_at_full_dimension():
+    chunks, vectors = _chunks(400)
+    queries = vectors[:5] + 0.1
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    q_unit = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = Path(tmp_dir) / "faiss"
+        store = FaissVectorStore(index_dir, reduced_dim=4)
+        store.add_chunks(chunks, vectors)
+        store.save()
+
+        index = FaissIndex(index_dir, first_pass="reduced", first_pass_candidates=100)
+        assert index.reduced is not None
+        scores, rows = index.search(queries, 5)
+        # Candidates come from 4 dims, but scores are full 16-dim cosines
+        expected = np.take_along_axis(q_unit @ unit.T, rows, axis=1)
+        assert np.allclose(scores, expected, atol=1e-5)
+        assert (rows[:, 0] == np.arange(5)).all()
+
+        # The PCA trained at ingest is read back with the index
+        _, pca = _pca(index_dir)
+        assert pca.is_trained and (pca.d_in, pca.d_out) == (DIM, 4)
+        fresh = faiss.PCAMatrix(DIM, 4)
+        fresh.train(np.load(index_dir / "vectors.npy"))
+        assert np.allclose(
+            np.abs(pca.apply(unit[:10])), np.abs(fresh.apply(unit[:10])), atol=1e-4
+        )
+
+
+def test_reduced_dim_change_rebuilds_the_first_pass_index():
+    chunks, vectors = _chunks(400)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = Path(tmp_dir) / "faiss"
+        store = FaissVectorStore(index_dir, reduced_dim=4)
+        store.add_chunks(chunks, vectors)
+        store.save()
+        full = (index_dir / INDEX_FILE).read_bytes()
+
+        FaissVectorStore(index_dir, reduced_dim=8).save()
+        _, pca = _pca(index_dir)
+        assert pca.d_out == 8
+        assert json.loads((index_dir / INFO_FILE).read_text())["reduced_dim"] == 8
+        assert (index_dir / INDEX_FILE).read_bytes() == full
+
+        FaissVectorStore(index_dir).save()
+        assert not (index_dir / REDUCED_INDEX_FILE).exists()
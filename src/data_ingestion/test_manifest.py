@@ -0,0 +1,185 @@
+import gc
+import json
+import tempfile
+import weakref
+from pathlib import Path
+
+from data_ingestion.corpus import GuidelineCorpus, compact_corpus, pick_guideline_source
+from data_ingestion import readers
+from data_ingestion.dedup import Deduplicator
+from data_ingestion.manifest import IngestManifest
+
+ABSTRACT = (
+    "Oral rehydration solution remains the first line treatment for acute "
+    "watery diarrhoea in children and adults, and zinc supplementation for "
+    "ten to fourteen days shortens the episode in young children."
+)
+
+
+def _write(path: Path, records: list) -> None:
+    path.write_text(json.dumps(records))
+
+
+def test_incremental_plan():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        guide_dir = tmp_path / "processed"
+        guide_dir.mkdir()
+        _write(
+            guide_dir / "diabetes.json",
+            [
+                {"condition_tag": "diabetes", "abstract": "Check HbA1c"},
+                {"condition_tag": "diabetes", "abstract": "Walk daily"},
+            ],
+        )
+        _write(guide_dir / "dengue.json", [{"abstract": "Drink ORS"}])
+
+        manifest = IngestManifest(tmp_path / IngestManifest.FILENAME)
+        plan = manifest.plan(guide_dir)
+        assert len(plan.upserts) == 3 and not plan.deletes
+        manifest.apply(plan)
+        manifest.save()
+
+        # Nothing changed → nothing to do
+        manifest = IngestManifest(tmp_path / IngestManifest.FILENAME)
+        assert manifest.plan(guide_dir).is_empty
+
+        # One record edited, one file removed
+        _write(
+            guide_dir / "diabetes.json",
+            [
+                {"condition_tag": "diabetes", "abstract": "Check HbA1c"},
+                {"condition_tag": "diabetes", "abstract": "Walk 30 minutes daily"},
+            ],
+        )
+        (guide_dir / "dengue.json").unlink()
+        plan = manifest.plan(guide_dir)
+        assert [c.text for c in plan.upserts] == ["Walk 30 minutes daily"]
+        assert len(plan.deletes) == 2
+        assert plan.removed_files == ["dengue.json"]
+
+
+def test_chunk_ids_are_content_hashes():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        guide_dir = Path(tmp_dir)
+        _write(guide_dir / "a.json", [{"abstract": "Drink  ORS\n"}])
+        _write(guide_dir / "b.json", [{"abstract": "Drink ORS"}])
+
+        plan = IngestManifest(guide_dir / "m.json").plan(guide_dir)
+        ids = {entry_id for f in plan.changed_files.values() for entry_id in f["chunks"]}
+        assert len(ids) == 1
+
+
+def test_compacted_corpus_matches_directory():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        guide_dir = tmp_path / "processed"
+        guide_dir.mkdir()
+        _write(guide_dir / "dengue_bangladesh.json", [{"pmid": "1", "abstract": "Drink ORS"}])
+        _write(guide_dir / "who.json", [{"id": "w1", "body": "Rest", "title": "Care"}])
+        corpus_path = tmp_path / "corpus.arrow"
+        assert compact_corpus(guide_dir, corpus_path) == 2
+
+        manifest = IngestManifest(tmp_path / IngestManifest.FILENAME)
+        manifest.apply(manifest.plan(guide_dir))
+        # Same digests and chunks: switching to the corpus re-embeds nothing
+        assert manifest.plan(corpus_path).is_empty
+
+        corpus = GuidelineCorpus(corpus_path)
+        assert corpus.read_source("dengue_bangladesh.json")[0].condition_tag == "dengue"
+
+
+def test_stale_corpus_is_skipped_for_the_directory():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        guide_dir = tmp_path / "processed"
+        guide_dir.mkdir()
+        _write(guide_dir / "a.json", [{"abstract": "Drink ORS"}])
+        corpus_path = tmp_path / "corpus.arrow"
+        assert pick_guideline_source(guide_dir, corpus_path) == guide_dir
+
+        compact_corpus(guide_dir, corpus_path)
+        assert pick_guideline_source(guide_dir, corpus_path) == corpus_path
+
+        _write(guide_dir / "a.json", [{"abstract": "Rest"}])
+        _write(guide_dir / "b.json", [{"abstract": "Eat"}])
+        assert GuidelineCorpus(corpus_path).stale_sources(guide_dir) == ["a.json", "b.json"]
+        assert pick_guideline_source(guide_dir, corpus_path) == guide_dir
+
+        # Deployed without processed/: the corpus is all there is
+        for f in guide_dir.iterdir():
+            f.unlink()
+        assert pick_guideline_source(guide_dir, corpus_path) == corpus_path
+
+
+def test_dedup_parses_only_changed_files(monkeypatch):
+    parsed = []
+    read = readers.read_guideline_file
+    monkeypatch.setattr(
+        readers, "read_guideline_file", lambda p: parsed.append(p.name) or read(p)
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        guide_dir = tmp_path / "processed"
+        guide_dir.mkdir()
+        _write(guide_dir / "a.json", [{"condition_tag": "diarrhea", "abstract": ABSTRACT}])
+        _write(guide_dir / "b.json", [{"condition_tag": "cholera", "abstract": ABSTRACT}])
+        _write(guide_dir / "c.json", [{"abstract": "Rest"}])
+        manifest = IngestManifest(tmp_path / IngestManifest.FILENAME)
+
+        def plan():
+            parsed.clear()
+            dedup = Deduplicator(threshold=0.8, cache_dir=tmp_path / "dedup")
+            result = manifest.plan(guide_dir, dedup=dedup)
+            manifest.apply(result)
+            return result
+
+        first = plan()
+        assert [c.merged_conditions for c in first.upserts] == [["cholera"], []]
+        assert not plan().changed_files and parsed == []
+
+        # Parsed once for its dedup keys, then again to be ingested
+        _write(guide_dir / "c.json", [{"abstract": "Sleep"}])
+        assert list(plan().changed_files) == ["c.json"]
+        assert parsed == ["c.json", "c.json"]
+
+        # b.json no longer duplicates a.json: a.json loses its merged tag
+        _write(guide_dir / "b.json", [{"condition_tag": "cholera", "abstract": "Boil"}])
+        result = plan()
+        assert sorted(result.changed_files) == ["a.json", "b.json"]
+        assert sorted(parsed) == ["a.json", "b.json", "b.json"]
+        assert sorted(c.text for c in result.upserts) == ["Boil", ABSTRACT]
+        assert [c.merged_conditions for c in result.upserts if c.text == ABSTRACT] == [[]]
+
+        (guide_dir / "c.json").unlink()
+        plan()
+        assert sorted(p.name for p in (tmp_path / "dedup").iterdir()) == [
+            "a.json.npz",
+            "b.json.npz",
+        ]
+
+
+def test_dedup_keys_hold_one_file_of_records_at_a_time(monkeypatch):
+    alive = []
+    keys = Deduplicator.keys
+
+    def tracked_keys(self, docs):
+        gc.collect()
+        # Records of files keyed earlier must be gone by now
+        assert not [ref for ref in alive if ref() is not None]
+        alive.extend(weakref.ref(d) for d in docs)
+        return keys(self, docs)
+
+    monkeypatch.setattr(Deduplicator, "keys", tracked_keys)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        guide_dir = tmp_path / "processed"
+        guide_dir.mkdir()
+        for i in range(4):
+            _write(guide_dir / f"{i}.json", [{"abstract": f"{ABSTRACT} {i}"}])
+        manifest = IngestManifest(tmp_path / IngestManifest.FILENAME)
+        dedup = Deduplicator(threshold=0.8, cache_dir=tmp_path / "dedup")
+
+        plan = manifest.plan(guide_dir, dedup=dedup)
+        assert len(alive) == 4
+        assert len(plan.upserts) == 1 and plan.upserts[0].merged_sources
@@ -0,0 +1,121 @@
+import json
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from data_ingestion.onnx_backend import (
+    CONFIG_FILE,
+    FP32_FILE,
+    INT8_FILE,
+    OnnxCrossEncoder,
+    OnnxSentenceEncoder,
+    embedding_variant,
+    onnx_model_dir,
+    select_onnx_dir,
+)
+
+MODEL = "BAAI/bge-small-en-v1.5"
+
+
+def _cross_encoder(logits: np.ndarray) -> OnnxCrossEncoder:
+    """OnnxCrossEncoder whose session returns `logits`, in batch order."""
+    model = OnnxCrossEncoder.__new__(OnnxCrossEncoder)
+    batches = iter(np.array_split(logits.reshape(-1, 1), 2))
+    model._run = lambda queries, passages: (next(batches), None)
+    return model
+
+
+def test_cross_encoder_scores_on_the_torch_probability_scale():
+    logits = np.array([-2.0, 0.0, 3.0, 8.0], dtype=np.float32)
+    pairs = [("q", f"p{i}") for i in range(len(logits))]
+
+    scores = _cross_encoder(logits).predict(pairs, batch_size=2)
+
+    # What sentence-transformers' CrossEncoder.predict returns for one label
+    assert np.allclose(scores, 1 / (1 + np.exp(-logits)))
+    assert ((0 < scores) & (scores < 1)).all()
+    assert list(np.argsort(-scores)) == [3, 2, 1, 0]
+
+
+def test_embedding_variant_separates_int8_vectors():
+    assert embedding_variant(MODEL, "torch") == MODEL
+    assert embedding_variant(MODEL, "onnx") == MODEL + "+onnx-int8"
+
+
+class FakeSession:
+    """onnxruntime.InferenceSession returning hidden states of all ones."""
+
+    def __init__(self, path, opts, providers) -> None:
+        self.path, self.opts, self.providers = path, opts, providers
+
+    def get_inputs(self):
+        return [SimpleNamespace(name=n) for n in ("input_ids", "attention_mask")]
+
+    def run(self, outputs, feeds):
+        # token_type_ids is not a graph input, so it must not be fed
+        assert set(feeds) == {"input_ids", "attention_mask"}
+        batch, seq = feeds["input_ids"].shape
+        return [np.ones((batch, seq, 4), dtype=np.float32)]
+
+
+def _fake_tokenizer(texts, **kwargs):
+    lengths = [len(t.split()) for t in texts]
+    mask = np.array([[1] * n + [0] * (max(lengths) - n) for n in lengths])
+    return {"input_ids": mask * 7, "attention_mask": mask, "token_type_ids": mask * 0}
+
+
+@pytest.fixture
+def onnx_root(monkeypatch):
+    """An exported-looking model under a temp root, with onnxruntime stubbed."""
+    ort = SimpleNamespace(
+        SessionOptions=SimpleNamespace,
+        GraphOptimizationLevel=SimpleNamespace(ORT_ENABLE_ALL="all"),
+        InferenceSession=FakeSession,
+    )
+    tokenizers = SimpleNamespace(from_pretrained=lambda path: _fake_tokenizer)
+    monkeypatch.setitem(sys.modules, "onnxruntime", ort)
+    monkeypatch.setitem(
+        sys.modules, "transformers", SimpleNamespace(AutoTokenizer=tokenizers)
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_dir = onnx_model_dir(Path(tmp_dir), MODEL)
+        model_dir.mkdir(parents=True)
+        config = {"kind": "embedding", "max_length": 8, "pooling": "mean"}
+        (model_dir / CONFIG_FILE).write_text(json.dumps({**config, "normalize": True}))
+        yield Path(tmp_dir)
+
+
+def test_onnx_backend_selects_the_exported_model(onnx_root):
+    model_dir = select_onnx_dir("onnx", onnx_root, MODEL)
+    assert model_dir == onnx_model_dir(onnx_root, MODEL)
+    assert select_onnx_dir("torch", onnx_root, MODEL) is None
+    with pytest.raises(ValueError, match="MODEL_BACKEND"):
+        select_onnx_dir("tensorrt", onnx_root, MODEL)
+
+    encoder = OnnxSentenceEncoder(model_dir, num_threads=2)
+    assert encoder.session.path == str(model_dir / INT8_FILE)
+    assert encoder.session.providers == ["CPUExecutionProvider"]
+    assert encoder.session.opts.intra_op_num_threads == 2
+    fp32 = OnnxSentenceEncoder(model_dir, quantized=False)
+    assert fp32.session.path == str(model_dir / FP32_FILE)
+
+    # Mean-pooled over real tokens only, then normalised
+    vectors = encoder.encode(["short", "a longer passage"])
+    assert np.allclose(vectors, 0.5)
+
+
+def test_onnx_backend_falls_back_to_torch(onnx_root, monkeypatch, caplog):
+    with caplog.at_level(logging.WARNING):
+        assert select_onnx_dir("onnx", onnx_root, "not/exported") is None
+    assert "No ONNX export of not/exported" in caplog.text
+
+    caplog.clear()
+    monkeypatch.setitem(sys.modules, "onnxruntime", None)  # not installed
+    with caplog.at_level(logging.WARNING):
+        assert select_onnx_dir("onnx", onnx_root, MODEL) is None
+    assert "needs onnxruntime" in caplog.text
@@ -0,0 +1,70 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from data_ingestion.stages import background, batched
+
+
+def _stage_threads() -> int:
+    # background() workers are the only daemon threads these tests start
+    return sum(t.daemon for t in threading.enumerate())
+
+
+def test_stages_stream_in_order():
+    assert list(background(batched(range(7), 3), 2)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_upstream_error_reaches_the_consumer():
+    def source():
+        yield 1
+        raise ValueError("bad record")
+
+    with pytest.raises(ValueError, match="bad record"):
+        list(background(background(source(), 2), 2))
+
+
+def test_downstream_error_shuts_down_every_stage():
+    before = _stage_threads()
+    produced = []
+
+    def source():
+        for i in itertools.count():
+            produced.append(i)
+            yield i
+
+    def embed(items):
+        for item in items:
+            if item == 5:
+                raise RuntimeError("embedder died")
+            yield item
+
+    read = background(source(), 2)
+    embedded = background(embed(read), 2)
+    with pytest.raises(RuntimeError, match="embedder died"):
+        try:
+            for _ in embedded:
+                pass
+        finally:
+            embedded.close()
+            read.close()
+
+    assert _stage_threads() == before
+    # The reader stopped a bounded distance ahead instead of running on
+    settled = len(produced)
+    time.sleep(0.3)
+    assert len(produced) == settled < 20
+
+
+def test_consumer_failure_stops_an_endless_producer():
+    before = _stage_threads()
+    stage = background(itertools.count(), 3)
+    with pytest.raises(KeyError):
+        try:
+            for item in stage:
+                if item == 10:
+                    raise KeyError("store write failed")
+        finally:
+            stage.close()
+    assert _stage_threads() == before
@@ -1,58 +1,77 @@
+import logging
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import List
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings as ChromaSettings
 
 from .schemas import GuidelineChunk
 
+logger = logging.getLogger(__name__)
+
 
 class VectorStore(ABC):
+    persist_dir: Path
+
+    @abstractmethod
+    def add_chunks(self, chunks: List[GuidelineChunk], embeddings: np.ndarray) -> None:
+        """Insert or overwrite chunks, keyed by `GuidelineChunk.chunk_id`."""
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None: ...
+
     @abstractmethod
-    def add_chunks(
-        self, chunks: List[GuidelineChunk], embeddings: List[List[float]]
-    ) -> None: ...
+    def reset(self) -> None:
+        """Drop everything (used for full rebuilds)."""
 
     @abstractmethod
     def save(self) -> None: ...
 
 
 class ChromaVectorStore(VectorStore):
+    batch_size = 5000  # Use a safe batch size under the limit
+
     def __init__(self, persist_dir: Path, collection_name: str = "guidelines") -> None:
+        self.persist_dir = Path(persist_dir)
+        self.collection_name = collection_name
         self.client = chromadb.PersistentClient(
             path=str(persist_dir),
             settings=ChromaSettings(anonymized_telemetry=False),
         )
-        self.collection = self.client.get_or_create_collection(name=collection_name)
+        self.collection = self._get_collection()
+
+    def _get_collection(self):
+        # Cosine space: embeddings are compared by normalised inner product,
+        # same as the FAISS backend.
+        return self.client.get_or_create_collection(
+            name=self.collection_name, metadata={"hnsw:space": "cosine"}
+        )
 
-    def add_chunks(
-        self, chunks: List[GuidelineChunk], embeddings: List[List[float]]
-    ) -> None:
-        batch_size = 5000  # Use a safe batch size under the limit
+    def add_chunks(self, chunks: List[GuidelineChunk], embeddings: np.ndarray) -> None:
         total_chunks = len(chunks)
 
-        for i in range(0, total_chunks, batch_size):
-            end_idx = min(i + batch_size, total_chunks)
+        for i in range(0, total_chunks, self.batch_size):
+            end_idx = min(i + self.batch_size, total_chunks)
             batch_chunks = chunks[i:end_idx]
-            batch_embeddings = embeddings[i:end_idx]
-
-            ids = [f"{c.source_file}:{i + idx}" for idx, c in enumerate(batch_chunks)]
-            metadatas = []
-            for c in batch_chunks:
-                metadata = {"source": c.source_file, "condition": c.condition_tag}
-                if c.pmid is not None:
-                    metadata["pmid"] = c.pmid
-                metadatas.append(metadata)
-
-            self.collection.add(
-                ids=ids,
+
+            self.collection.upsert(
+                ids=[c.chunk_id for c in batch_chunks],
                 documents=[c.text for c in batch_chunks],
-                metadatas=metadatas,
-                embeddings=batch_embeddings,
+                metadatas=[c.metadata() for c in batch_chunks],
+                embeddings=embeddings[i:end_idx],
             )
 
-            print(f"Added batch {i // batch_size + 1}: {len(batch_chunks)} chunks")
+            logger.debug("Upserted %d chunks", len(batch_chunks))
+
+    def delete(self, ids: List[str]) -> None:
+        for i in range(0, len(ids), self.batch_size):
+            self.collection.delete(ids=ids[i : i + self.batch_size])
+
+    def reset(self) -> None:
+        self.client.delete_collection(self.collection_name)
+        self.collection = self._get_collection()
 
     def save(self) -> None:
         pass  # Chroma auto-persists
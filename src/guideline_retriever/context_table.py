@@ -0,0 +1,270 @@
+"""
+Precomputed guideline context for the conditions the extractor can emit.
+
+    python -m src.guideline_retriever.context_table [--full]
+
+Conditions come from a finite vocabulary: the categories of
+icd10_keywords.json plus the extractor's fuzzy patterns. This job runs the
+retriever's live path (embed → search → rerank → fuse) once for each of
+them, and for the condition pairs that co-occur most often across the drug
+database's indications. It stores the resulting chunk IDs and scores in
+`context_table.json` next to the index. `GuidelineRetriever` serves those
+sets from the table by key and only searches live for anything else.
+
+Refreshes are incremental. The table remembers the live chunk IDs it was
+built against and which condition tags each entry searched. An entry is
+recomputed only when one of its chunks was removed, or when a chunk was
+added under one of its tags (or anywhere, if it searched globally).
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from src.condition_extractor.schemas import Condition
+from src.data_ingestion.hashing import normalise_text
+
+from .schemas import RetrievedChunk
+
+logger = logging.getLogger(__name__)
+
+TABLE_FILE = "context_table.json"
+
+ConditionKey = Tuple[Tuple[str, str], ...]
+
+
+def condition_set_key(conditions: Sequence[Condition]) -> ConditionKey:
+    """Order-, case- and whitespace-insensitive key of a set of conditions."""
+    return tuple(
+        sorted({(normalise_text(c.name).casefold(), c.icd10 or "") for c in conditions})
+    )
+
+
+def _encode_key(key: ConditionKey) -> str:
+    return json.dumps([list(pair) for pair in key])
+
+
+def table_stamp(path: Path) -> str:
+    """Changes whenever the table file is rewritten; "none" if there is none."""
+    try:
+        st = Path(path).stat()
+    except FileNotFoundError:
+        return "none"
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+class ContextTable:
+    """
+    The persisted table: key → {"chunk_ids", "scores", "scope"}, where
+    scope is the list of condition tags the entry's search was limited to,
+    or None if it searched the whole index.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        data = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self.index_version: Optional[str] = data.get("index_version")
+        self.config: dict = data.get("config", {})
+        self.live_ids: Set[str] = set(data.get("live_ids", []))
+        self.entries: Dict[str, dict] = data.get("entries", {})
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: ConditionKey) -> Optional[dict]:
+        return self.entries.get(_encode_key(key))
+
+    def put(
+        self,
+        key: ConditionKey,
+        chunks: List[RetrievedChunk],
+        scope: Optional[Set[str]],
+    ) -> None:
+        self.entries[_encode_key(key)] = {
+            "chunk_ids": [c.chunk_id for c in chunks],
+            "scores": [c.score for c in chunks],
+            "scope": sorted(scope) if scope is not None else None,
+        }
+
+    def lookup(self, key: ConditionKey, search) -> Optional[List[RetrievedChunk]]:
+        """The entry's chunks, fetched from `search`; None if absent or incomplete."""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        chunks = search.fetch(entry["chunk_ids"])
+        if any(c is None for c in chunks):
+            return None
+        for chunk, score in zip(chunks, entry["scores"]):
+            chunk.score = score
+        return chunks
+
+    def save(self) -> None:
+        data = {
+            "index_version": self.index_version,
+            "config": self.config,
+            "live_ids": sorted(self.live_ids),
+            "entries": self.entries,
+        }
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.path)
+
+
+# ------------------------------------------------------------ vocabulary
+def known_conditions() -> List[Condition]:
+    """Every condition `ConditionExtractor` can emit, one per key."""
+    from src.condition_extractor.extractor import FUZZY_PATTERNS
+    from src.condition_extractor.patterns import FULL_ICD10_MAP
+
+    found: Dict[ConditionKey, Condition] = {}
+    for names, icd10, _ in FULL_ICD10_MAP.values():
+        for name in names:
+            cond = Condition(name=name, icd10=icd10, confidence=1.0)
+            found.setdefault(condition_set_key([cond]), cond)
+    for name, icd10, confidence in FUZZY_PATTERNS.values():
+        cond = Condition(name=name, icd10=icd10, confidence=confidence)
+        found.setdefault(condition_set_key([cond]), cond)
+    return list(found.values())
+
+
+def common_pairs(drug_path: Path, limit: int) -> List[List[Condition]]:
+    """
+    The `limit` condition pairs extracted together from the most drug
+    indications: the pairs a prescription is most likely to produce.
+    """
+    from src.condition_extractor.extractor import ConditionExtractor
+    from src.data_ingestion.readers import load_drug_entries
+
+    if limit <= 0 or not Path(drug_path).exists():
+        return []
+    extractor = ConditionExtractor()
+    counts: Counter = Counter()
+    examples: Dict[ConditionKey, List[Condition]] = {}
+    for drug in load_drug_entries(drug_path):
+        conds = {condition_set_key([c]): c for c in extractor.extract(drug)}
+        for a, b in combinations(sorted(conds), 2):
+            key = condition_set_key([conds[a], conds[b]])
+            counts[key] += 1
+            examples.setdefault(key, [conds[a], conds[b]])
+    return [examples[key] for key, _ in counts.most_common(limit)]
+
+
+# --------------------------------------------------------------- refresh
+def table_config() -> dict:
+    """Settings that shape retrieval results; a change invalidates the table."""
+    from config import settings as s
+    from src.data_ingestion.onnx_backend import embedding_variant
+
+    mapping = Path(s.ICD10_MAPPING_PATH)
+    return {
+        "embedding": embedding_variant(s.EMBEDDING_MODEL, s.MODEL_BACKEND),
+        "reranker": (
+            embedding_variant(s.RERANK_CROSS_ENCODER, s.MODEL_BACKEND)
+            if s.RERANK_CROSS_ENCODER
+            else None
+        ),
+        "rerank_stop_gap": s.RERANK_STOP_GAP,
+        "top_k": s.RETRIEVER_TOP_K,
+        "mode": s.RETRIEVAL_MODE,
+        "first_pass": s.RETRIEVER_FIRST_PASS,
+        "prefilter": s.RETRIEVER_PREFILTER,
+        "min_partition_hits": s.RETRIEVER_MIN_PARTITION_HITS,
+        "rrf_k": s.RETRIEVER_RRF_K,
+        "quota": s.RETRIEVER_CONDITION_QUOTA,
+        "mmr": [s.RETRIEVER_MMR_LAMBDA, s.RETRIEVER_MMR_POOL],
+        "shards": [s.SHARD_BY, s.SHARD_LOCAL, s.SHARD_LOCAL_BOOST],
+        "mapping": (
+            hashlib.blake2b(mapping.read_bytes(), digest_size=8).hexdigest()
+            if mapping.exists()
+            else None
+        ),
+    }
+
+
+def refresh_context_table(
+    retriever, condition_sets: List[List[Condition]], full: bool = False
+) -> ContextTable:
+    """Bring the table next to `retriever`'s index up to date with it."""
+    from src.data_ingestion.manifest import IngestManifest, index_version
+
+    from .search import chunk_tags
+
+    persist_dir = retriever.search.persist_dir
+    table = ContextTable(persist_dir / TABLE_FILE)
+    config = table_config()
+    live = IngestManifest(persist_dir / IngestManifest.FILENAME).live_ids()
+    if full or table.config != config:
+        table.entries = {}
+    removed = table.live_ids - live
+    added = sorted(live - table.live_ids)
+    added_tags = set()
+    if added:
+        added_tags = {
+            t
+            for c in retriever.search.fetch(added)
+            if c is not None
+            for t in chunk_tags(c)
+        }
+
+    wanted = {condition_set_key(conds): conds for conds in condition_sets}
+    kept = {}
+    for key in wanted:
+        entry = table.get(key)
+        if entry is None or (removed & set(entry["chunk_ids"])):
+            continue
+        scope = entry["scope"]
+        if added and (scope is None or added_tags & set(scope)):
+            continue
+        kept[_encode_key(key)] = entry
+    table.entries = kept
+
+    stale = [conds for key, conds in wanted.items() if table.get(key) is None]
+    for i, conds in enumerate(stale, 1):
+        chunks, scope = retriever.retrieve_scoped(conds)
+        table.put(condition_set_key(conds), chunks, scope)
+        if i % 25 == 0 or i == len(stale):
+            logger.info("Context table: %d/%d condition sets recomputed", i, len(stale))
+
+    table.config = config
+    table.live_ids = live
+    table.index_version = index_version(persist_dir)
+    table.save()
+    logger.info(
+        "Context table: %d entries (%d reused, %d recomputed) → %s",
+        len(table),
+        len(table) - len(stale),
+        len(stale),
+        table.path,
+    )
+    return table
+
+
+def build_context_table(full: bool = False) -> ContextTable:
+    from config.settings import CONTEXT_TABLE_PAIRS, DRUG_DB_PATH
+
+    from .retriever import GuidelineRetriever
+
+    singles = [[c] for c in known_conditions()]
+    pairs = common_pairs(DRUG_DB_PATH, CONTEXT_TABLE_PAIRS)
+    return refresh_context_table(GuidelineRetriever(), singles + pairs, full)
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--full", action="store_true", help="recompute every entry, not just stale ones"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    build_context_table(args.full)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,61 @@
+from typing import Dict, List, Optional, Tuple
+
+from .schemas import RetrievedChunk
+
+
+def _key(chunk: RetrievedChunk) -> str:
+    return chunk.chunk_id or chunk.text
+
+
+def reciprocal_rank_fusion(
+    ranked: List[List[RetrievedChunk]],
+    top_k: int,
+    rrf_k: int = 60,
+    quota: Optional[int] = None,
+    owners: Optional[List[int]] = None,
+) -> List[RetrievedChunk]:
+    """
+    Merge one ranked hit list per query into a single top-k.
+
+    A chunk scores Σ 1 / (rrf_k + rank) over the lists it appears in, so
+    chunks relevant to several conditions rise without raw scores from
+    different queries ever being compared. Each chunk counts against the
+    `quota` of the query that ranked it highest; slots left once every query
+    is at its quota (or out of hits) are filled by fused score alone.
+    Returned chunks carry the fused score; `owners`, when given, is filled
+    with the index of the query each one counts against.
+    """
+    fused: Dict[str, float] = {}
+    # key → (best rank, query index, chunk)
+    best: Dict[str, Tuple[int, int, RetrievedChunk]] = {}
+    for qi, hits in enumerate(ranked):
+        for rank, chunk in enumerate(hits, 1):
+            key = _key(chunk)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            if key not in best or rank < best[key][0]:
+                best[key] = (rank, qi, chunk)
+
+    order = sorted(fused, key=fused.get, reverse=True)
+    picked: List[str] = []
+    if quota:
+        used = [0] * len(ranked)
+        for key in order:
+            qi = best[key][1]
+            if used[qi] < quota:
+                used[qi] += 1
+                picked.append(key)
+                if len(picked) == top_k:
+                    break
+    if len(picked) < top_k:
+        taken = set(picked)
+        picked += [key for key in order if key not in taken][: top_k - len(picked)]
+        picked.sort(key=fused.get, reverse=True)
+
+    out = []
+    for key in picked:
+        chunk = best[key][2].model_copy()
+        chunk.score = fused[key]
+        out.append(chunk)
+        if owners is not None:
+            owners.append(best[key][1])
+    return out
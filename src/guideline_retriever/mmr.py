@@ -0,0 +1,65 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+def mmr_select(
+    relevance: np.ndarray,
+    embeddings: np.ndarray,
+    k: int,
+    lambda_: float = 0.7,
+    groups: Optional[Sequence[int]] = None,
+    quota: Optional[int] = None,
+) -> List[int]:
+    """
+    Indices of `k` candidates picked by maximal marginal relevance: each
+    step takes the candidate maximising
+    λ·relevance − (1 − λ)·max cosine to the candidates already picked.
+
+    With `groups` (e.g. the query each candidate was fused for) and a
+    `quota`, a group stops contributing once it has `quota` picks; slots
+    left once every group is at its quota go by MMR gain alone, as in
+    `reciprocal_rank_fusion`.
+
+    All pairwise cosines come from one matrix product; each greedy step is
+    then a single vector update of the running max-similarity. `relevance`
+    is rescaled to [0, 1] so λ means the same for any score scale; rows of
+    `embeddings` that are all zero (vector unknown) never count as similar.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    rel = np.asarray(relevance, dtype=np.float64)
+    spread = rel.max() - rel.min()
+    rel = (rel - rel.min()) / spread if spread > 0 else np.ones(n)
+
+    unit = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(unit, axis=1, keepdims=True)
+    unit = unit / np.where(norms > 0, norms, 1.0)
+    sim = unit @ unit.T
+
+    gid = counts = None
+    if groups is not None and quota:
+        _, gid = np.unique(np.asarray(groups), return_inverse=True)
+        counts = np.zeros(gid.max() + 1, dtype=np.int64)
+
+    available = np.ones(n, dtype=bool)
+    max_sim = np.full(n, -np.inf)
+    picked: List[int] = []
+    for _ in range(k):
+        candidates = available
+        if counts is not None:
+            within = available & (counts[gid] < quota)
+            if within.any():
+                candidates = within
+        # The first pick has nothing to be similar to: relevance alone
+        penalty = max_sim if picked else 0.0
+        gain = np.where(candidates, lambda_ * rel - (1 - lambda_) * penalty, -np.inf)
+        best = int(np.argmax(gain))
+        picked.append(best)
+        available[best] = False
+        np.maximum(max_sim, sim[best], out=max_sim)
+        if counts is not None:
+            counts[gid[best]] += 1
+    return picked
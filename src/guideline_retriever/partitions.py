@@ -0,0 +1,68 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from src.condition_extractor.schemas import Condition
+
+
+def _icd10_category(code: Optional[str]) -> str:
+    """Three-character ICD-10 category, e.g. E11.9 → E11."""
+    return (code or "").strip().upper()[:3]
+
+
+class PartitionMap:
+    """
+    Maps a `Condition` to the condition tags (processed-file topics) worth
+    searching for it, via data/mappings/icd10_keywords.json.
+
+    A condition matches a mapping entry by ICD-10 category or by name (one of
+    the entry's condition names or keyword patterns). An entry's tags are its
+    explicit "condition_tags" when present, otherwise whichever tags in the
+    store equal its key, a condition name or a pattern. Conditions that match
+    nothing return None: search everything.
+    """
+
+    def __init__(self, mapping_path: Path, known_tags: Iterable[str]) -> None:
+        self.known_tags = set(known_tags)
+        mapping_path = Path(mapping_path)
+        entries = json.loads(mapping_path.read_text()) if mapping_path.exists() else {}
+        self.by_icd10: Dict[str, List[str]] = {}
+        self.by_name: Dict[str, List[str]] = {}
+        self.patterns: List[tuple] = []
+        for key, entry in entries.items():
+            tags = self._entry_tags(key, entry)
+            if not tags:
+                continue
+            category = _icd10_category(entry.get("icd10"))
+            if category:
+                self.by_icd10.setdefault(category, []).extend(tags)
+            for name in entry.get("conditions", []):
+                self.by_name.setdefault(name.lower(), []).extend(tags)
+            for pattern in entry.get("patterns", []):
+                self.patterns.append(
+                    (re.compile(rf"\b{re.escape(pattern.lower())}\b"), tags)
+                )
+
+    def _entry_tags(self, key: str, entry: dict) -> List[str]:
+        explicit = entry.get("condition_tags")
+        if explicit is not None:
+            return [t for t in explicit if t in self.known_tags]
+        names = {key, *(n.lower() for n in entry.get("conditions", []))}
+        names |= {p.lower() for p in entry.get("patterns", [])}
+        return sorted(
+            t for t in self.known_tags if t in names or t.replace("_", " ") in names
+        )
+
+    def tags_for(self, condition: Condition) -> Optional[List[str]]:
+        category = _icd10_category(condition.icd10)
+        tags = set(self.by_icd10.get(category, [])) if category else set()
+        name = condition.name.lower()
+        tags.update(self.by_name.get(name, []))
+        if name in self.known_tags:
+            tags.add(name)
+        if not tags:
+            for pattern, pattern_tags in self.patterns:
+                if pattern.search(name):
+                    tags.update(pattern_tags)
+        return sorted(tags) or None
@@ -0,0 +1,188 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.data_ingestion.hashing import text_hash
+
+from .cache import LruTtlCache
+from .schemas import RetrievedChunk
+
+_WORD_RE = re.compile(r"\S+")
+_PAIR_BYTES = 160  # rough per-entry footprint of a cached (key, score)
+
+
+class Reranker:
+    """
+    Cross-encoder reranking stage around any model with a sentence-transformers
+    style `predict(pairs, batch_size=...)`.
+
+    * Passages are cut to the tokens that fit the model's window next to the
+      query, so nothing is tokenised, padded and then thrown away.
+    * Pairs are sorted by token length before batching, so each batch pads
+      to its own longest pair rather than to the longest abstract.
+    * Scores are cached by (query hash, chunk id); chunk ids are content
+      hashes, so a cached score cannot go stale when the index changes.
+    * Candidates are scored best dense score first: the top-k, then rounds
+      of `step`. A query stops once the next candidate's dense score trails
+      its dense top-k by more than `stop_gap` of the query's dense score
+      range and the last round left its rerank top-k unchanged; the
+      candidates not scored by then are dropped.
+    """
+
+    def __init__(
+        self,
+        model,
+        top_k: int,
+        batch_size: int = 32,
+        step: Optional[int] = None,
+        stop_gap: float = 0.0,
+        cache_entries: int = 0,
+    ) -> None:
+        self.model = model
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.step = step or max(1, top_k // 2)
+        self.stop_gap = stop_gap
+        self.cache = (
+            LruTtlCache(
+                cache_entries * _PAIR_BYTES, float("inf"), lambda _: _PAIR_BYTES
+            )
+            if cache_entries > 0
+            else None
+        )
+        self.tokenizer = getattr(model, "tokenizer", None)
+        window = getattr(model, "max_length", None)
+        if window is None and self.tokenizer is not None:
+            window = min(self.tokenizer.model_max_length, 512)
+        self.window = window or 512
+        self.n_special = (
+            self.tokenizer.num_special_tokens_to_add(pair=True) if self.tokenizer else 3
+        )
+
+    # ------------------------------------------------------------ tokenising
+    def _spans(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        """Character span of each token, capped at the model window."""
+        if self.tokenizer is None:
+            spans = ([m.span() for m in _WORD_RE.finditer(t)] for t in texts)
+            return [s[: self.window] for s in spans]
+        enc = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=self.window,
+            return_offsets_mapping=True,
+        )
+        return [list(map(tuple, offsets)) for offsets in enc["offset_mapping"]]
+
+    def _truncate(
+        self, queries: List[str], passages: List[str]
+    ) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+        """(query, passage cut to fit) pairs and their token lengths."""
+        distinct = list(dict.fromkeys(queries))
+        q_len = {q: len(s) for q, s in zip(distinct, self._spans(distinct))}
+        unique = list(dict.fromkeys(passages))
+        p_spans = dict(zip(unique, self._spans(unique)))
+        pairs, lengths = [], np.empty(len(passages), dtype=np.int64)
+        for i, (q, p) in enumerate(zip(queries, passages)):
+            spans = p_spans[p]
+            n = max(0, min(len(spans), self.window - q_len[q] - self.n_special))
+            pairs.append((q, p[: spans[n - 1][1]] if n else ""))
+            lengths[i] = q_len[q] + n
+        return pairs, lengths
+
+    def _predict(self, queries: List[str], passages: List[str]) -> np.ndarray:
+        if not queries:
+            return np.zeros(0, dtype=np.float32)
+        pairs, lengths = self._truncate(queries, passages)
+        order = np.argsort(lengths, kind="stable")
+        scores = np.asarray(
+            self.model.predict([pairs[i] for i in order], batch_size=self.batch_size),
+            dtype=np.float32,
+        ).reshape(len(pairs), -1)[:, 0]
+        out = np.empty_like(scores)
+        out[order] = scores
+        return out
+
+    # --------------------------------------------------------------- scoring
+    def score(
+        self, queries: Sequence[str], chunks: Sequence[RetrievedChunk]
+    ) -> np.ndarray:
+        """Rerank score per (query, chunk) pair, from the cache where possible."""
+        keys = [
+            (text_hash(q), c.chunk_id or text_hash(c.text))
+            for q, c in zip(queries, chunks)
+        ]
+        scores = np.empty(len(keys), dtype=np.float32)
+        todo = []
+        for i, key in enumerate(keys):
+            hit = self.cache.get(key) if self.cache is not None else None
+            if hit is None:
+                todo.append(i)
+            else:
+                scores[i] = hit
+        fresh = self._predict(
+            [queries[i] for i in todo], [chunks[i].text for i in todo]
+        )
+        for i, s in zip(todo, fresh):
+            scores[i] = s
+            if self.cache is not None:
+                self.cache.put(keys[i], float(s))
+        return scores
+
+    def _settled(self, dense: np.ndarray, scored: int, before, after) -> bool:
+        if scored >= len(dense):
+            return True
+        if self.stop_gap <= 0 or (before is not None and before != after):
+            return False
+        k = min(self.top_k, len(dense)) - 1
+        spread = float(dense[0] - dense[-1]) or 1.0
+        return (dense[k] - dense[scored]) / spread > self.stop_gap
+
+    def rerank(
+        self, queries: List[str], per_query: List[List[RetrievedChunk]]
+    ) -> List[List[RetrievedChunk]]:
+        """
+        Each query's hits with `score` replaced by the rerank score, best
+        first; every query keeps at least `top_k` hits when it had them.
+        """
+        ranked = [
+            sorted(hits, key=lambda c: c.score, reverse=True) for hits in per_query
+        ]
+        dense = [np.array([c.score for c in hits], dtype=np.float64) for hits in ranked]
+        rerank = [np.full(len(hits), -np.inf) for hits in ranked]
+        scored = [0] * len(ranked)
+        top = [None] * len(ranked)
+        active = [i for i, hits in enumerate(ranked) if hits]
+        while active:
+            # first round fills the top-k, later rounds extend it by `step`
+            take = {}
+            for i in active:
+                stop = max(self.top_k, scored[i] + self.step)
+                take[i] = range(scored[i], min(len(ranked[i]), stop))
+            batch = [(i, j) for i in active for j in take[i]]
+            scores = self.score(
+                [queries[i] for i, _ in batch], [ranked[i][j] for i, j in batch]
+            )
+            for (i, j), s in zip(batch, scores):
+                rerank[i][j] = s
+            still = []
+            for i in active:
+                scored[i] = take[i].stop
+                n = min(self.top_k, scored[i])
+                order = np.argsort(-rerank[i][: scored[i]], kind="stable")
+                current = frozenset(order[:n])
+                if not self._settled(dense[i], scored[i], top[i], current):
+                    still.append(i)
+                top[i] = current
+            active = still
+
+        out = []
+        for hits, s, n in zip(ranked, rerank, scored):
+            kept = []
+            for j in np.argsort(-s[:n], kind="stable"):
+                chunk = hits[j]
+                chunk.score = float(s[j])  # higher score → better
+                kept.append(chunk)
+            out.append(kept)
+        return out
@@ -1,52 +1,348 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import List
+import logging
+import math
+import threading
+from typing import List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
 from src.condition_extractor.schemas import Condition
+from src.data_ingestion.embedders import Embedder
+from src.data_ingestion.embedding_cache import EmbeddingCache
+from src.data_ingestion.hashing import normalise_text
+from src.data_ingestion.manifest import index_version
+from src.data_ingestion.onnx_backend import (
+    OnnxCrossEncoder,
+    embedding_variant,
+    select_onnx_dir,
+)
 from config.settings import (
-    PERSIST_DIRECTORY,
+    VECTOR_STORE_BACKEND,
+    CONTEXT_TABLE,
     EMBEDDING_MODEL,
+    EMBED_CACHE_DIR,
+    EMBED_CACHE_MAX_MB,
+    ICD10_MAPPING_PATH,
+    MODEL_BACKEND,
+    ONNX_MODEL_DIR,
+    QUERY_CACHE_MB,
+    RESULT_CACHE_MB,
+    RETRIEVER_CACHE_TTL,
+    RETRIEVAL_MODE,
     RETRIEVER_TOP_K,
+    RETRIEVER_RRF_K,
+    RETRIEVER_CONDITION_QUOTA,
+    RETRIEVER_MIN_PARTITION_HITS,
+    RETRIEVER_MMR_LAMBDA,
+    RETRIEVER_MMR_POOL,
+    RETRIEVER_PREFILTER,
+    RERANK_BATCH_SIZE,
+    RERANK_CACHE_ENTRIES,
     RERANK_CROSS_ENCODER,
+    RERANK_STOP_GAP,
 )
+from .cache import LruTtlCache
+from .context_table import (
+    TABLE_FILE,
+    ContextTable,
+    condition_set_key,
+    table_config,
+    table_stamp,
+)
+from .fusion import reciprocal_rank_fusion
+from .mmr import mmr_select
+from .partitions import PartitionMap
+from .rerank import Reranker
 from .schemas import RetrievedChunk
+from .search import SearchBackend, build_search_backend
 from sentence_transformers import CrossEncoder
 
+logger = logging.getLogger(__name__)
+
+
+def _chunks_nbytes(chunks: List[RetrievedChunk]) -> int:
+    return sum(len(c.model_dump_json()) for c in chunks)
+
+
+class IndexState(NamedTuple):
+    """One version of the index and everything derived from it."""
+
+    search: SearchBackend
+    index_version: str
+    partitions: Optional[PartitionMap]
+    context_table: Optional[ContextTable]
+    store_version: tuple
+
 
 class GuidelineRetriever:
-    def __init__(self) -> None:
-        self.client = chromadb.PersistentClient(path=str(PERSIST_DIRECTORY))
-        self.collection = self.client.get_collection("guidelines")
-        self.embedder = SentenceTransformer(EMBEDDING_MODEL)
-        self.reranker = (
-            CrossEncoder(RERANK_CROSS_ENCODER) if RERANK_CROSS_ENCODER else None
-        )
-
-    def retrieve(self, conditions: List[Condition]) -> List[RetrievedChunk]:
-        query = " ".join(c.name for c in conditions)
-        query_vec = self.embedder.encode([query]).tolist()
-
-        hits = self.collection.query(
-            query_embeddings=query_vec,
-            n_results=RETRIEVER_TOP_K * 2,  # over-fetch for reranking
-        )
-
-        # Build candidates
-        candidates = [
-            RetrievedChunk(
-                text=hits["documents"][0][i],
-                source_file=hits["metadatas"][0][i]["source"],
-                page=hits["metadatas"][0][i].get("page"),
-                score=hits["distances"][0][i],  # lower is better (cosine distance)
+    def __init__(
+        self,
+        backend: str = VECTOR_STORE_BACKEND,
+        mode: str = RETRIEVAL_MODE,
+        rerank: bool = True,
+        cache: bool = True,
+        prefilter: bool = RETRIEVER_PREFILTER,
+    ) -> None:
+        """
+        Defaults come from config/settings.py; `rerank=False` skips the
+        cross-encoder, `prefilter=False` searches every condition's chunks
+        and `cache=False` turns off every cache (query, result, rerank-pair
+        and embedding caches, and the context table).
+        """
+        self.backend = backend
+        self.mode = mode
+        self.use_cache = cache
+        self.prefilter = prefilter
+        # The context table holds results for the configured options only
+        self.as_configured = (
+            mode == RETRIEVAL_MODE
+            and prefilter == RETRIEVER_PREFILTER
+            and (rerank or not RERANK_CROSS_ENCODER)
+        )
+        # Replaced whole, under the lock, when ingestion changes the index;
+        # each request reads it once so it never mixes two versions.
+        self._state = self._load_index()
+        self._reload_lock = threading.Lock()
+        # L1: normalised query text → embedding; L2: condition set → final chunks
+        self.query_cache = (
+            LruTtlCache(
+                QUERY_CACHE_MB << 20, RETRIEVER_CACHE_TTL, lambda v: v.nbytes + 64
+            )
+            if cache and QUERY_CACHE_MB > 0
+            else None
+        )
+        self.result_cache = (
+            LruTtlCache(RESULT_CACHE_MB << 20, RETRIEVER_CACHE_TTL, _chunks_nbytes)
+            if cache and RESULT_CACHE_MB > 0
+            else None
+        )
+        embed_onnx = select_onnx_dir(MODEL_BACKEND, ONNX_MODEL_DIR, EMBEDDING_MODEL)
+        # Read-only: ingestion owns the cache, queries just reuse its vectors.
+        embed_cache = (
+            EmbeddingCache(
+                EMBED_CACHE_DIR,
+                embedding_variant(EMBEDDING_MODEL, "onnx" if embed_onnx else "torch"),
+                max_bytes=EMBED_CACHE_MAX_MB << 20,
+                read_only=True,
+            )
+            if cache and EMBED_CACHE_MAX_MB > 0
+            else None
+        )
+        self.embedder = Embedder(
+            EMBEDDING_MODEL, cache=embed_cache, onnx_dir=embed_onnx
+        )
+        if not (rerank and RERANK_CROSS_ENCODER):
+            self.reranker = None
+        else:
+            rerank_onnx = select_onnx_dir(
+                MODEL_BACKEND, ONNX_MODEL_DIR, RERANK_CROSS_ENCODER
+            )
+            model = (
+                OnnxCrossEncoder(rerank_onnx)
+                if rerank_onnx is not None
+                else CrossEncoder(RERANK_CROSS_ENCODER)
             )
-            for i in range(len(hits["documents"][0]))
-        ]
+            self.reranker = Reranker(
+                model,
+                RETRIEVER_TOP_K,
+                batch_size=RERANK_BATCH_SIZE,
+                stop_gap=RERANK_STOP_GAP,
+                cache_entries=RERANK_CACHE_ENTRIES if cache else 0,
+            )
+
+    @property
+    def search(self) -> SearchBackend:
+        return self._state.search
 
-        # Optional cross-encoder rerank
+    @property
+    def index_version(self) -> str:
+        return self._state.index_version
+
+    @property
+    def partitions(self) -> Optional[PartitionMap]:
+        return self._state.partitions
+
+    @property
+    def context_table(self) -> Optional[ContextTable]:
+        return self._state.context_table
+
+    @staticmethod
+    def _store_version(persist_dir) -> tuple:
+        return index_version(persist_dir), table_stamp(persist_dir / TABLE_FILE)
+
+    def _load_index(self) -> IndexState:
+        search = build_search_backend(self.backend, self.mode)
+        version = index_version(search.persist_dir)
+        partitions = (
+            PartitionMap(ICD10_MAPPING_PATH, search.condition_tags())
+            if self.prefilter
+            else None
+        )
+        context_table = None
+        if CONTEXT_TABLE and self.use_cache and self.as_configured:
+            table = ContextTable(search.persist_dir / TABLE_FILE)
+            current = table.index_version == version
+            if current and table.config == table_config():
+                context_table = table
+            elif len(table):
+                logger.warning("Context table is stale; re-run the context table job.")
+        return IndexState(
+            search,
+            version,
+            partitions,
+            context_table,
+            self._store_version(search.persist_dir),
+        )
+
+    def _current_state(self) -> IndexState:
+        """The index state to serve from, reopened once ingestion has changed it."""
+        state = self._state
+        if self._store_version(state.search.persist_dir) == state.store_version:
+            return state
+        with self._reload_lock:
+            state = self._state
+            if self._store_version(state.search.persist_dir) != state.store_version:
+                state = self._state = self._load_index()
+                for cache in (self.query_cache, self.result_cache):
+                    if cache is not None:
+                        cache.clear()
+        return state
+
+    def _encode(self, queries: List[str]) -> np.ndarray:
+        if self.query_cache is None:
+            return self.embedder.encode(queries)
+        keys = [normalise_text(q).casefold() for q in queries]
+        cached = [self.query_cache.get(k) for k in keys]
+        missing = [i for i, v in enumerate(cached) if v is None]
+        if missing:
+            fresh = self.embedder.encode([queries[i] for i in missing])
+            for i, vec in zip(missing, fresh):
+                cached[i] = vec
+                self.query_cache.put(keys[i], vec)
+        return np.stack(cached)
+
+    def cache_stats(self) -> dict:
+        state = self._state
+        return {
+            "index_version": state.index_version,
+            "context_table_entries": (
+                len(state.context_table) if state.context_table is not None else 0
+            ),
+            "query_embeddings": self.query_cache.stats() if self.query_cache else None,
+            "results": self.result_cache.stats() if self.result_cache else None,
+            "rerank_pairs": (
+                self.reranker.cache.stats()
+                if self.reranker and self.reranker.cache
+                else None
+            ),
+        }
+
+    def retrieve(
+        self, conditions: List[Condition]
+    ) -> Tuple[List[RetrievedChunk], str]:
+        """The chunks for `conditions` and the index version they came from."""
+        state = self._current_state()
+        # Keyed by version too, so a request that straddles a reload can't
+        # cache old-index chunks for the new one
+        key = (state.index_version, condition_set_key(conditions))
+        cached: Optional[List[RetrievedChunk]] = (
+            self.result_cache.get(key) if self.result_cache is not None else None
+        )
+        if cached is not None:
+            return [c.model_copy() for c in cached], state.index_version
+
+        chunks = None
+        if state.context_table is not None:
+            chunks = state.context_table.lookup(key[1], state.search)
+        if chunks is None:
+            chunks, _ = self.retrieve_scoped(conditions, state)
+        if self.result_cache is not None:
+            self.result_cache.put(key, [c.model_copy() for c in chunks])
+        return chunks, state.index_version
+
+    def retrieve_scoped(
+        self, conditions: List[Condition], state: Optional[IndexState] = None
+    ) -> Tuple[List[RetrievedChunk], Optional[Set[str]]]:
+        """
+        Live retrieval, bypassing caches and the context table. Also returns
+        the condition tags the search was confined to, or None if any part
+        of it covered the whole index.
+        """
+        state = state or self._state
+        # One query per condition, so each gets its own embedding instead of
+        # a blend of all of them.
+        by_name = {c.name: c for c in conditions}
+        queries = list(by_name)
+        if not queries:
+            return [], set()
+        query_vecs = self._encode(queries)  # at most one forward pass
+
+        # over-fetch for reranking (and MMR); one store round trip for all
+        # queries, bringing the stored vectors along when MMR needs them
+        use_mmr = RETRIEVER_MMR_LAMBDA < 1
+        pool_factor = max(2, RETRIEVER_MMR_POOL) if use_mmr else 2
+        fetch_k = RETRIEVER_TOP_K * pool_factor
+        vectors = {} if use_mmr else None
+        tags = None
+        if state.partitions is not None:
+            tags = [state.partitions.tags_for(by_name[q]) for q in queries]
+        per_query = state.search.search(query_vecs, fetch_k, queries, tags, vectors)
+
+        # Partitions too thin to fill the answer are searched again globally
+        scope = None
+        if tags is not None:
+            min_hits = RETRIEVER_MIN_PARTITION_HITS or RETRIEVER_TOP_K
+            short = [
+                i for i, hits in enumerate(per_query) if tags[i] and len(hits) < min_hits
+            ]
+            if all(tags) and not short:
+                scope = {t for query_tags in tags for t in query_tags}
+            if short:
+                retry = state.search.search(
+                    query_vecs[short],
+                    fetch_k,
+                    [queries[i] for i in short],
+                    vectors=vectors,
+                )
+                for i, hits in zip(short, retry):
+                    per_query[i] = hits
+
+        # Optional cross-encoder rerank, all conditions batched together; the
+        # backend's score boost (local shards) is added back to rerank scores
         if self.reranker:
-            pairs = [(query, c.text) for c in candidates]
-            rerank_scores = self.reranker.predict(pairs)
-            for c, s in zip(candidates, rerank_scores):
-                c.score = -s  # higher score → better
-            candidates.sort(key=lambda x: x.score, reverse=True)
+            per_query = self.reranker.rerank(queries, per_query)
+            for hits in per_query:
+                for chunk in hits:
+                    chunk.score += state.search.boost(chunk)
+                hits.sort(key=lambda c: c.score, reverse=True)
+
+        quota = RETRIEVER_CONDITION_QUOTA or math.ceil(RETRIEVER_TOP_K / len(queries))
+        if not use_mmr:
+            fused = reciprocal_rank_fusion(
+                per_query, RETRIEVER_TOP_K, rrf_k=RETRIEVER_RRF_K, quota=quota
+            )
+            return fused, scope
 
-        return candidates[:RETRIEVER_TOP_K]
+        # Fuse a wider pool, then pick a top-k that skips near-paraphrases
+        # while keeping each condition's quota
+        owners: List[int] = []
+        pool = reciprocal_rank_fusion(
+            per_query,
+            RETRIEVER_TOP_K * RETRIEVER_MMR_POOL,
+            rrf_k=RETRIEVER_RRF_K,
+            quota=quota * RETRIEVER_MMR_POOL,
+            owners=owners,
+        )
+        dim = len(next(iter(vectors.values()))) if vectors else 0
+        pool_vecs = np.zeros((len(pool), dim), dtype=np.float32)
+        for i, chunk in enumerate(pool):
+            if chunk.chunk_id in vectors:
+                pool_vecs[i] = vectors[chunk.chunk_id]
+        picked = mmr_select(
+            np.array([c.score for c in pool]),
+            pool_vecs,
+            RETRIEVER_TOP_K,
+            RETRIEVER_MMR_LAMBDA,
+            groups=owners,
+            quota=quota,
+        )
+        return [pool[i] for i in picked], scope
@@ -5,4 +5,9 @@ class RetrievedChunk(BaseModel):
     text: str
     source_file: str
     page: int | None = None
-    score: float
+    score: float  # higher is better
+    chunk_id: str | None = None
+    condition: str | None = None
+    conditions: str | None = None  # comma-joined, when duplicates were merged
+    pmid: str | None = None
+    source_type: str | None = None
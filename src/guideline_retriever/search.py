@@ -0,0 +1,448 @@
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from config.settings import (
+    FAISS_EF_SEARCH,
+    FAISS_INDEX_DIR,
+    FAISS_NPROBE,
+    FAISS_RESCORE_FACTOR,
+    PERSIST_DIRECTORY,
+    RETRIEVAL_MODE,
+    RETRIEVER_FIRST_PASS,
+    RETRIEVER_FIRST_PASS_CANDIDATES,
+    SHARD_BY,
+    SHARD_LOCAL,
+    SHARD_LOCAL_BOOST,
+)
+from .fusion import reciprocal_rank_fusion
+from .schemas import RetrievedChunk
+
+logger = logging.getLogger(__name__)
+
+
+def to_chunk(chunk_id: str, text: str, meta: dict, score: float) -> RetrievedChunk:
+    return RetrievedChunk(
+        text=text,
+        source_file=meta["source"],
+        page=meta.get("page"),
+        score=score,
+        chunk_id=chunk_id,
+        condition=meta.get("condition"),
+        conditions=meta.get("conditions"),
+        pmid=meta.get("pmid"),
+        source_type=meta.get("source_type"),
+    )
+
+
+# Per-query condition-tag filter; None searches the whole store.
+TagFilter = Optional[Sequence[str]]
+
+
+def chunk_tags(chunk: RetrievedChunk) -> Set[str]:
+    """The chunk's condition tag plus those of duplicates merged into it."""
+    tags = set((chunk.conditions or "").split(","))
+    tags.add(chunk.condition or "")
+    tags.discard("")
+    return tags
+
+
+class SearchBackend(ABC):
+    persist_dir: Path
+
+    @abstractmethod
+    def search(
+        self,
+        query_vecs: np.ndarray,
+        k: int,
+        queries: Optional[List[str]] = None,
+        tags: Optional[List[TagFilter]] = None,
+        vectors: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[List[RetrievedChunk]]:
+        """
+        Top-k chunks per query vector, best first; `score` is cosine similarity.
+        `queries` are the texts behind the vectors, for backends that use them;
+        `tags[i]`, when set, restricts query i to chunks with those condition tags.
+        `vectors`, when given, is filled with the stored vector of every
+        returned chunk by chunk ID, in the same round trip as the search.
+        """
+
+    @abstractmethod
+    def fetch(
+        self, ids: List[str], vectors: Optional[Dict[str, np.ndarray]] = None
+    ) -> List[Optional[RetrievedChunk]]:
+        """
+        Chunks by chunk ID (None where unknown), with a score of 0; `vectors`
+        as in `search`.
+        """
+
+    @abstractmethod
+    def condition_tags(self) -> Set[str]:
+        """Every condition tag present in the store."""
+
+    def boost(self, chunk: RetrievedChunk) -> float:
+        """
+        Bonus `search` adds to this chunk's score. Rerankers replace scores,
+        so the retriever adds it again to reranked ones; both cross-encoder
+        backends score on a 0–1 scale, like the cosines it was added to.
+        """
+        return 0.0
+
+
+class ChromaSearch(SearchBackend):
+    def __init__(self, persist_dir: Path, collection_name: str = "guidelines") -> None:
+        import chromadb
+
+        self.persist_dir = Path(persist_dir)
+        self.client = chromadb.PersistentClient(path=str(persist_dir))
+        self.collection = self.client.get_collection(collection_name)
+        self.space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+
+    def _similarity(self, distance: float) -> float:
+        if self.space == "l2":
+            # Chroma reports squared L2; for unit vectors that is 2 - 2·cos.
+            return 1.0 - distance / 2.0
+        return 1.0 - distance  # "cosine" and "ip" both report 1 - similarity
+
+    def search(
+        self,
+        query_vecs: np.ndarray,
+        k: int,
+        queries: Optional[List[str]] = None,
+        tags: Optional[List[TagFilter]] = None,
+        vectors: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[List[RetrievedChunk]]:
+        # One `where` per query call, so queries sharing a filter share a call.
+        # Chroma can only match the primary "condition" field.
+        groups: Dict[tuple, List[int]] = {}
+        for i in range(len(query_vecs)):
+            key = tuple(sorted(tags[i])) if tags and tags[i] else ()
+            groups.setdefault(key, []).append(i)
+
+        include = ["documents", "metadatas", "distances"]
+        if vectors is not None:
+            include.append("embeddings")
+        results: List[List[RetrievedChunk]] = [[] for _ in range(len(query_vecs))]
+        for key, members in groups.items():
+            where = {"condition": {"$in": list(key)}} if key else None
+            hits = self.collection.query(
+                query_embeddings=query_vecs[members],
+                n_results=k,
+                where=where,
+                include=include,
+            )
+            for i, ids, docs, metas, dists in zip(
+                members,
+                hits["ids"],
+                hits["documents"],
+                hits["metadatas"],
+                hits["distances"],
+            ):
+                results[i] = [
+                    to_chunk(cid, doc, meta, self._similarity(dist))
+                    for cid, doc, meta, dist in zip(ids, docs, metas, dists)
+                ]
+            if vectors is not None:
+                for ids, embs in zip(hits["ids"], hits["embeddings"]):
+                    vectors.update(zip(ids, np.asarray(embs, dtype=np.float32)))
+        return results
+
+    def fetch(
+        self, ids: List[str], vectors: Optional[Dict[str, np.ndarray]] = None
+    ) -> List[Optional[RetrievedChunk]]:
+        include = ["documents", "metadatas"]
+        if vectors is not None:
+            include.append("embeddings")
+        got = self.collection.get(ids=ids, include=include)
+        if vectors is not None:
+            vectors.update(zip(got["ids"], np.asarray(got["embeddings"], np.float32)))
+        by_id = {
+            cid: to_chunk(cid, doc, meta, 0.0)
+            for cid, doc, meta in zip(got["ids"], got["documents"], got["metadatas"])
+        }
+        return [by_id.get(cid) for cid in ids]
+
+    def condition_tags(self) -> Set[str]:
+        metas = self.collection.get(include=["metadatas"])["metadatas"]
+        return {t for meta in metas for t in chunk_tags(to_chunk("", "", meta, 0.0))}
+
+
+class FaissSearch(SearchBackend):
+    """In-process search over a `FaissVectorStore` directory; no SQLite involved."""
+
+    def __init__(
+        self,
+        index_dir: Path,
+        ef_search: int = 64,
+        nprobe: int = 8,
+        rescore_factor: int = 4,
+        first_pass: str = "full",
+        first_pass_candidates: int = 200,
+    ) -> None:
+        from src.data_ingestion.faiss_store import FaissIndex
+
+        self.persist_dir = Path(index_dir)
+        self.index = FaissIndex(
+            index_dir,
+            ef_search=ef_search,
+            nprobe=nprobe,
+            rescore_factor=rescore_factor,
+            first_pass=first_pass,
+            first_pass_candidates=first_pass_candidates,
+        )
+
+    def _chunks(
+        self,
+        q_scores: np.ndarray,
+        q_rows: np.ndarray,
+        vectors: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[RetrievedChunk]:
+        valid = q_rows >= 0
+        records = self.index.records(q_rows[valid])
+        if vectors is not None:
+            vectors.update(
+                zip((rec["id"] for rec in records), self.index.vectors[q_rows[valid]])
+            )
+        return [
+            to_chunk(rec["id"], rec["text"], rec, float(s))
+            for rec, s in zip(records, q_scores[valid])
+        ]
+
+    def search(
+        self,
+        query_vecs: np.ndarray,
+        k: int,
+        queries: Optional[List[str]] = None,
+        tags: Optional[List[TagFilter]] = None,
+        vectors: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[List[RetrievedChunk]]:
+        tags = tags or [None] * len(query_vecs)
+        results: List[List[RetrievedChunk]] = [[] for _ in range(len(query_vecs))]
+        unfiltered = [i for i, t in enumerate(tags) if not t]
+        if unfiltered:
+            scores, rows = self.index.search(query_vecs[unfiltered], k)
+            for i, q_scores, q_rows in zip(unfiltered, scores, rows):
+                results[i] = self._chunks(q_scores, q_rows, vectors)
+        for i, t in enumerate(tags):
+            if t:
+                # Exact scan of just the partition's rows
+                rows = self.index.partition_rows(t)
+                scores, top = self.index.search_rows(query_vecs[i : i + 1], rows, k)
+                results[i] = self._chunks(scores[0], top[0], vectors)
+        return results
+
+    def fetch(
+        self, ids: List[str], vectors: Optional[Dict[str, np.ndarray]] = None
+    ) -> List[Optional[RetrievedChunk]]:
+        rows = self.index.rows_for(ids)
+        found = [r for r in rows if r is not None]
+        if vectors is not None:
+            present = [cid for cid, r in zip(ids, rows) if r is not None]
+            vectors.update(zip(present, self.index.vectors[found]))
+        records = iter(self.index.records(np.array(found, dtype=np.int64)))
+        out = []
+        for row in rows:
+            rec = next(records) if row is not None else None
+            out.append(to_chunk(rec["id"], rec["text"], rec, 0.0) if rec else None)
+        return out
+
+    def condition_tags(self) -> Set[str]:
+        return self.index.condition_tags()
+
+
+class ShardedSearch(SearchBackend):
+    """
+    One backend per shard of a `ShardedVectorStore`, all searched at once on
+    a thread pool (FAISS and Chroma's HNSW both release the GIL). Per query,
+    each shard's top-k is merged by score, with `local_boost` added to hits
+    from the `local` shards so local evidence is not crowded out by the
+    larger global pool. `by` is the SHARD_BY the shards were split on, so
+    `boost` can tell which shard a chunk came from.
+    """
+
+    def __init__(
+        self,
+        persist_dir: Path,
+        shards: Dict[str, SearchBackend],
+        by: str,
+        local: Sequence[str] = (),
+        local_boost: float = 0.0,
+    ) -> None:
+        self.persist_dir = Path(persist_dir)
+        self.shards = shards
+        self.by = by
+        self.boosts = {
+            name: (local_boost if name in local else 0.0) for name in shards
+        }
+        self.pool = ThreadPoolExecutor(max_workers=max(1, len(shards)))
+
+    def search(
+        self,
+        query_vecs: np.ndarray,
+        k: int,
+        queries: Optional[List[str]] = None,
+        tags: Optional[List[TagFilter]] = None,
+        vectors: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[List[RetrievedChunk]]:
+        jobs = {
+            # Shards hold disjoint chunk IDs, so they can share `vectors`
+            name: self.pool.submit(shard.search, query_vecs, k, queries, tags, vectors)
+            for name, shard in self.shards.items()
+        }
+        merged: List[List[RetrievedChunk]] = [[] for _ in range(len(query_vecs))]
+        for name, job in jobs.items():
+            boost = self.boosts[name]
+            for hits, shard_hits in zip(merged, job.result()):
+                for chunk in shard_hits:
+                    chunk.score += boost
+                hits.extend(shard_hits)
+        for hits in merged:
+            hits.sort(key=lambda c: c.score, reverse=True)
+            del hits[k:]
+        return merged
+
+    def fetch(
+        self, ids: List[str], vectors: Optional[Dict[str, np.ndarray]] = None
+    ) -> List[Optional[RetrievedChunk]]:
+        found: List[Optional[RetrievedChunk]] = [None] * len(ids)
+        for shard in self.shards.values():
+            missing = [i for i, c in enumerate(found) if c is None]
+            if not missing:
+                break
+            got = shard.fetch([ids[i] for i in missing], vectors)
+            for i, chunk in zip(missing, got):
+                found[i] = chunk
+        return found
+
+    def condition_tags(self) -> Set[str]:
+        return {t for shard in self.shards.values() for t in shard.condition_tags()}
+
+    def boost(self, chunk: RetrievedChunk) -> float:
+        from src.data_ingestion.shards import shard_name
+
+        name = shard_name(self.by, chunk.source_type, chunk.condition)
+        return self.boosts.get(name, 0.0)
+
+
+class HybridSearch(SearchBackend):
+    """
+    Dense search plus BM25 over the sparse index written at ingest, run in
+    parallel (FAISS and the numpy scorer both release the GIL) and merged
+    per query with reciprocal-rank fusion.
+    """
+
+    def __init__(self, dense: SearchBackend, index_dir: Path) -> None:
+        from src.data_ingestion.bm25 import Bm25Index
+
+        self.dense = dense
+        self.persist_dir = dense.persist_dir
+        self.sparse = Bm25Index(index_dir)
+        self.pool = ThreadPoolExecutor(max_workers=2)
+
+    def search(
+        self,
+        query_vecs: np.ndarray,
+        k: int,
+        queries: Optional[List[str]] = None,
+        tags: Optional[List[TagFilter]] = None,
+        vectors: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[List[RetrievedChunk]]:
+        if not queries:
+            return self.dense.search(query_vecs, k, tags=tags, vectors=vectors)
+        dense_job = self.pool.submit(
+            self.dense.search, query_vecs, k, None, tags, vectors
+        )
+        # Filtered queries over-fetch, since BM25 hits are filtered afterwards
+        sparse_k = k * 4 if tags and any(tags) else k
+        sparse_hits = self.sparse.search(queries, sparse_k)
+        dense_hits = dense_job.result()
+
+        # Resolve sparse-only hits (and their vectors) in one fetch for all queries.
+        known = {c.chunk_id: c for hits in dense_hits for c in hits}
+        missing = list(
+            {cid for hits in sparse_hits for cid, _ in hits if cid not in known}
+        )
+        if missing:
+            fetched = self.dense.fetch(missing, vectors)
+            known.update((cid, c) for cid, c in zip(missing, fetched) if c)
+
+        results = []
+        for i, (dense_q, sparse_q) in enumerate(zip(dense_hits, sparse_hits)):
+            allowed = set(tags[i]) if tags and tags[i] else None
+            sparse_chunks = []
+            for cid, score in sparse_q:
+                chunk = known.get(cid)
+                if chunk is None or (allowed and not chunk_tags(chunk) & allowed):
+                    continue
+                sparse_chunks.append(chunk.copy(update={"score": score}))
+            results.append(reciprocal_rank_fusion([dense_q, sparse_chunks[:k]], k))
+        return results
+
+    def fetch(
+        self, ids: List[str], vectors: Optional[Dict[str, np.ndarray]] = None
+    ) -> List[Optional[RetrievedChunk]]:
+        return self.dense.fetch(ids, vectors)
+
+    def condition_tags(self) -> Set[str]:
+        return self.dense.condition_tags()
+
+    def boost(self, chunk: RetrievedChunk) -> float:
+        return self.dense.boost(chunk)
+
+
+def build_search_backend(backend: str, mode: str = RETRIEVAL_MODE) -> SearchBackend:
+    """Read path matching VECTOR_STORE_BACKEND, optionally fused with BM25."""
+    dense = _build_dense_backend(backend)
+    if mode == "dense":
+        return dense
+    if mode != "hybrid":
+        raise ValueError(f"Unknown RETRIEVAL_MODE: {mode}")
+    from src.data_ingestion.bm25 import DIRNAME, Bm25Index
+
+    sparse_dir = dense.persist_dir / DIRNAME
+    if not Bm25Index.exists(sparse_dir):
+        logger.warning(
+            "No BM25 index at %s; re-run ingestion. Using dense only.", sparse_dir
+        )
+        return dense
+    return HybridSearch(dense, sparse_dir)
+
+
+def _build_dense_backend(backend: str) -> SearchBackend:
+    root = FAISS_INDEX_DIR if backend == "faiss" else PERSIST_DIRECTORY
+    if SHARD_BY:
+        from src.data_ingestion.shards import SHARDS_DIRNAME, read_shard_names
+
+        names = read_shard_names(root)
+        if names:
+            shards = {
+                name: _build_shard_backend(backend, root / SHARDS_DIRNAME / name, name)
+                for name in names
+            }
+            return ShardedSearch(root, shards, SHARD_BY, SHARD_LOCAL, SHARD_LOCAL_BOOST)
+        logger.warning(
+            "No shards at %s; re-run ingestion. Searching the unsharded store.", root
+        )
+    return _build_shard_backend(backend, root)
+
+
+def _build_shard_backend(
+    backend: str, index_dir: Path, shard: Optional[str] = None
+) -> SearchBackend:
+    if backend == "faiss":
+        return FaissSearch(
+            index_dir,
+            ef_search=FAISS_EF_SEARCH,
+            nprobe=FAISS_NPROBE,
+            rescore_factor=FAISS_RESCORE_FACTOR,
+            first_pass=RETRIEVER_FIRST_PASS,
+            first_pass_candidates=RETRIEVER_FIRST_PASS_CANDIDATES,
+        )
+    if backend == "chroma":
+        collection = "guidelines" if shard is None else f"guidelines_{shard}"
+        return ChromaSearch(PERSIST_DIRECTORY, collection)
+    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {backend}")
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+from guideline_retriever import cache as cache_module
+from guideline_retriever.cache import LruTtlCache
+
+
+def _clock(monkeypatch) -> list:
+    now = [100.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = _clock(monkeypatch)
+    cache = LruTtlCache(max_bytes=100, ttl_seconds=10, sizeof=len)
+    cache.put("a", "x")
+
+    now[0] += 9.9
+    assert cache.get("a") == "x"
+    now[0] += 0.2
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["entries"] == 0 and stats["bytes"] == 0
+
+
+def test_byte_cap_evicts_least_recently_used():
+    cache = LruTtlCache(max_bytes=10, ttl_seconds=60, sizeof=len)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"  # b is now the oldest
+
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+
+    # Replacing an entry frees its old size first
+    cache.put("a", "aa")
+    assert cache.stats()["bytes"] == 6
+
+    # Larger than the whole cache: not stored, nothing evicted
+    cache.put("big", "x" * 11)
+    assert cache.get("big") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_hit_ratio():
+    cache = LruTtlCache(max_bytes=100, ttl_seconds=60, sizeof=len)
+    assert cache.stats()["hit_ratio"] == 0.0
+
+    cache.put("a", "x")
+    for key in ["a", "a", "a", "b"]:
+        cache.get(key)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+    assert stats["hit_ratio"] == 0.75
+
+    cache.clear()
+    assert cache.get("a") is None and cache.stats()["entries"] == 0
@@ -0,0 +1,112 @@
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from guideline_retriever import context_table as context_table_module
+from guideline_retriever.context_table import TABLE_FILE, ContextTable
+from guideline_retriever.schemas import RetrievedChunk
+from src.condition_extractor.schemas import Condition
+from src.data_ingestion.manifest import IngestManifest
+
+# chunk ID → condition tag
+TAGS = {"d1": "dengue", "d2": "dengue", "c1": "cholera", "c2": "cholera"}
+# condition → (chunk IDs its live search returns, tags it was confined to)
+RESULTS = {
+    "dengue": (["d1", "d2"], {"dengue"}),
+    "cholera": (["c1"], {"cholera"}),
+    "fever": (["d1"], None),
+}
+
+
+def _chunk(cid: str) -> RetrievedChunk:
+    return RetrievedChunk(
+        text=cid, source_file="f.json", score=0.5, chunk_id=cid, condition=TAGS[cid]
+    )
+
+
+class FakeRetriever:
+    """Live retrieval from RESULTS over whichever chunk IDs are `live`."""
+
+    def __init__(self, persist_dir: Path) -> None:
+        self.fetched = []
+        self.recomputed = []
+        self.search = SimpleNamespace(persist_dir=persist_dir, fetch=self._fetch)
+        self.live = set()
+
+    def _fetch(self, ids):
+        self.fetched.append(list(ids))
+        return [_chunk(cid) if cid in self.live else None for cid in ids]
+
+    def set_live(self, ids) -> None:
+        self.live = set(ids)
+        manifest = IngestManifest(self.search.persist_dir / IngestManifest.FILENAME)
+        manifest.files = {"f.json": {"digest": "x", "chunks": dict.fromkeys(ids, "fp")}}
+        manifest.save()
+
+    def retrieve_scoped(self, conditions):
+        (condition,) = conditions
+        self.recomputed.append(condition.name)
+        ids, scope = RESULTS[condition.name]
+        return [_chunk(cid) for cid in ids if cid in self.live], scope
+
+    def refresh(self):
+        self.recomputed.clear()
+        self.fetched.clear()
+        sets = [[Condition(name=n, icd10=None, confidence=1.0)] for n in RESULTS]
+        return context_table_module.refresh_context_table(self, sets)
+
+
+def _retriever(tmp_dir: str) -> FakeRetriever:
+    retriever = FakeRetriever(Path(tmp_dir))
+    retriever.set_live(["d1", "d2", "c1"])
+    retriever.refresh()
+    assert sorted(retriever.recomputed) == ["cholera", "dengue", "fever"]
+    return retriever
+
+
+def test_unchanged_index_reuses_every_entry_without_fetching():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        retriever = _retriever(tmp_dir)
+
+        table = retriever.refresh()
+
+        assert retriever.recomputed == [] and retriever.fetched == []
+        assert len(table) == 3
+        reloaded = ContextTable(Path(tmp_dir) / TABLE_FILE)
+        assert reloaded.get((("dengue", ""),))["chunk_ids"] == ["d1", "d2"]
+
+
+def test_removed_chunk_recomputes_only_entries_that_held_it():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        retriever = _retriever(tmp_dir)
+
+        retriever.set_live(["d1", "c1"])
+        retriever.refresh()
+
+        assert retriever.recomputed == ["dengue"]
+
+
+def test_chunk_added_under_a_scoped_tag_recomputes_that_scope_and_global():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        retriever = _retriever(tmp_dir)
+
+        retriever.set_live(["d1", "d2", "c1", "c2"])
+        retriever.refresh()
+
+        # Only the new chunk is fetched to learn its tags
+        assert retriever.fetched == [["c2"]]
+        # "fever" searched the whole index, so any new chunk may belong in it
+        assert sorted(retriever.recomputed) == ["cholera", "fever"]
+
+
+def test_config_change_recomputes_everything(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        retriever = _retriever(tmp_dir)
+        config = context_table_module.table_config()
+
+        monkeypatch.setattr(
+            context_table_module, "table_config", lambda: {**config, "top_k": -1}
+        )
+        retriever.refresh()
+
+        assert sorted(retriever.recomputed) == ["cholera", "dengue", "fever"]
@@ -0,0 +1,41 @@
+from guideline_retriever.fusion import reciprocal_rank_fusion
+from guideline_retriever.schemas import RetrievedChunk
+
+
+def _hits(*ids: str) -> list:
+    return [
+        RetrievedChunk(text=i, source_file="x.json", score=0.0, chunk_id=i) for i in ids
+    ]
+
+
+def test_chunks_ranked_by_several_queries_rise():
+    fused = reciprocal_rank_fusion([_hits("a", "b", "c"), _hits("c", "d")], top_k=4)
+
+    assert [c.chunk_id for c in fused] == ["c", "a", "b", "d"]
+    assert fused[0].score == 1 / 63 + 1 / 61
+    assert fused[1].score == 1 / 61
+
+
+def test_quota_keeps_every_query_represented():
+    ranked = [_hits("a1", "a2"), _hits("a1", "a2"), _hits("c")]
+
+    assert [c.chunk_id for c in reciprocal_rank_fusion(ranked, 2)] == ["a1", "a2"]
+    # a1 and a2 both count against the first query, where they ranked best
+    owners = []
+    fused = reciprocal_rank_fusion(ranked, 2, quota=1, owners=owners)
+    assert [c.chunk_id for c in fused] == ["a1", "c"]
+    assert owners == [0, 2]
+
+
+def test_slots_left_after_quotas_go_by_fused_score():
+    fused = reciprocal_rank_fusion([_hits("a1", "a2", "a3"), _hits("b1")], 3, quota=1)
+
+    assert [c.chunk_id for c in fused] == ["a1", "b1", "a2"]
+
+
+def test_inputs_are_not_mutated():
+    hits = _hits("a")
+
+    fused = reciprocal_rank_fusion([hits], top_k=1)
+
+    assert hits[0].score == 0.0 and fused[0].score == 1 / 61
@@ -0,0 +1,93 @@
+import logging
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from data_ingestion.bm25 import Bm25Builder
+from data_ingestion.schemas import GuidelineChunk
+from guideline_retriever.schemas import RetrievedChunk
+from guideline_retriever.search import HybridSearch, build_search_backend
+
+DOCS = [
+    GuidelineChunk(
+        condition_tag="diarrhea",
+        text="Give ORS after every stool",
+        source_file="d.json",
+    ),
+    GuidelineChunk(
+        condition_tag="diarrhea", text="Zinc for ten days", source_file="d.json"
+    ),
+    GuidelineChunk(
+        condition_tag="cholera", text="ORS and antibiotics", source_file="c.json"
+    ),
+]
+
+
+def _retrieved(doc: GuidelineChunk, score: float = 0.0) -> RetrievedChunk:
+    return RetrievedChunk(
+        text=doc.text,
+        source_file=doc.source_file,
+        score=score,
+        chunk_id=doc.chunk_id,
+        condition=doc.condition_tag,
+    )
+
+
+class FakeDense:
+    """Dense backend that always ranks the zinc chunk alone."""
+
+    def __init__(self, persist_dir: Path) -> None:
+        self.persist_dir = persist_dir
+        self.fetched = []
+
+    def search(self, query_vecs, k, queries=None, tags=None, vectors=None):
+        return [[_retrieved(DOCS[1], 0.9)] for _ in range(len(query_vecs))]
+
+    def fetch(self, ids, vectors=None):
+        self.fetched.append(list(ids))
+        by_id = {d.chunk_id: d for d in DOCS}
+        return [_retrieved(by_id[i]) if i in by_id else None for i in ids]
+
+
+def _hybrid(tmp_path: Path) -> HybridSearch:
+    builder = Bm25Builder(tmp_path / "bm25")
+    builder.add_chunks(DOCS)
+    builder.save()
+    return HybridSearch(FakeDense(tmp_path), tmp_path / "bm25")
+
+
+def test_sparse_hits_are_fetched_once_and_fused_with_dense():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        search = _hybrid(Path(tmp_dir))
+
+        (hits,) = search.search(np.zeros((1, 4)), 3, ["ors"])
+
+        ids = [c.chunk_id for c in hits]
+        assert set(ids) == {d.chunk_id for d in DOCS}
+        # The zinc chunk only came from the dense side; both ORS chunks from BM25
+        assert len(search.dense.fetched) == 1
+        assert set(search.dense.fetched[0]) == {DOCS[0].chunk_id, DOCS[2].chunk_id}
+
+
+def test_sparse_hits_respect_the_tag_filter():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        search = _hybrid(Path(tmp_dir))
+
+        (hits,) = search.search(np.zeros((1, 4)), 3, ["ors"], [["diarrhea"]])
+
+        assert DOCS[2].chunk_id not in {c.chunk_id for c in hits}
+        assert DOCS[0].chunk_id in {c.chunk_id for c in hits}
+
+
+def test_missing_bm25_index_falls_back_to_dense_with_a_warning(monkeypatch, caplog):
+    from guideline_retriever import search as search_module
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dense = FakeDense(Path(tmp_dir))
+        monkeypatch.setattr(search_module, "_build_dense_backend", lambda _: dense)
+        with caplog.at_level(logging.WARNING, logger=search_module.__name__):
+            backend = build_search_backend("faiss", "hybrid")
+
+    assert backend is dense
+    assert "No BM25 index" in caplog.text
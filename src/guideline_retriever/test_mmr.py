@@ -0,0 +1,42 @@
+import numpy as np
+
+from guideline_retriever.mmr import mmr_select
+
+# Two near-paraphrases (0, 1) and a distinct candidate (2)
+VECS = np.array([[1.0, 0.0], [0.99, 0.14], [0.0, 1.0]], dtype=np.float32)
+
+
+def test_near_paraphrase_gives_way_to_a_distinct_candidate():
+    relevance = np.array([1.0, 0.9, 0.5])
+
+    assert mmr_select(relevance, VECS, 2, lambda_=0.5) == [0, 2]
+    # λ = 1 is plain relevance order
+    assert mmr_select(relevance, VECS, 2, lambda_=1.0) == [0, 1]
+
+
+def test_relevance_scale_does_not_change_the_pick():
+    relevance = np.array([1.0, 0.9, 0.5])
+
+    assert mmr_select(relevance * 40 - 7, VECS, 3) == mmr_select(relevance, VECS, 3)
+
+
+def test_unknown_vectors_are_never_similar():
+    vecs = np.array([[1.0, 0.0], [0.0, 0.0], [0.0, 0.0]], dtype=np.float32)
+
+    assert mmr_select(np.array([1.0, 0.9, 0.8]), vecs, 3) == [0, 1, 2]
+
+
+def test_quota_caps_each_group_then_fills_by_gain():
+    vecs = np.eye(4, dtype=np.float32)
+    relevance = np.array([1.0, 0.9, 0.8, 0.1])
+    groups = [0, 0, 0, 1]
+
+    assert mmr_select(relevance, vecs, 2) == [0, 1]
+    assert mmr_select(relevance, vecs, 2, groups=groups, quota=1) == [0, 3]
+    # Every group at its quota: the rest go by gain
+    assert mmr_select(relevance, vecs, 4, groups=groups, quota=1) == [0, 3, 1, 2]
+
+
+def test_k_larger_than_the_pool():
+    assert mmr_select(np.array([0.2]), VECS[:1], 5) == [0]
+    assert mmr_select(np.array([]), np.zeros((0, 2)), 3) == []
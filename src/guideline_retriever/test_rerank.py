@@ -0,0 +1,73 @@
+from guideline_retriever.rerank import Reranker
+from guideline_retriever.schemas import RetrievedChunk
+
+
+class StubScorer:
+    """Scores a pair by a fixed per-passage value; records every predict call."""
+
+    def __init__(self, scores: dict, max_length=None) -> None:
+        self.scores = scores
+        self.max_length = max_length
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32):
+        self.calls.append(list(pairs))
+        return [self.scores.get(p, 0.0) for _, p in pairs]
+
+
+def _chunk(text: str, dense: float) -> RetrievedChunk:
+    return RetrievedChunk(text=text, source_file="x.json", score=dense, chunk_id=text)
+
+
+def test_pair_scores_are_cached_per_query():
+    model = StubScorer({"a": 1.0, "b": 2.0})
+    reranker = Reranker(model, top_k=2, cache_entries=16)
+    chunks = [_chunk("a", 0.0), _chunk("b", 0.0)]
+
+    assert list(reranker.score(["q", "q"], chunks)) == [1.0, 2.0]
+    assert list(reranker.score(["q", "q"], chunks)) == [1.0, 2.0]
+    assert len(model.calls) == 1
+
+    reranker.score(["other", "q"], chunks)
+    assert model.calls[-1] == [("other", "a")]
+
+
+def test_pairs_are_batched_shortest_first_and_scored_in_input_order():
+    texts = ["four words long here", "one", "two words"]
+    model = StubScorer({t: float(i) for i, t in enumerate(texts)})
+    reranker = Reranker(model, top_k=3)
+
+    scores = reranker.score(["q"] * 3, [_chunk(t, 0.0) for t in texts])
+
+    batched = [p for _, p in model.calls[0]]
+    assert batched == ["one", "two words", "four words long here"]
+    assert list(scores) == [0.0, 1.0, 2.0]
+
+
+def test_passages_are_cut_to_the_model_window():
+    model = StubScorer({}, max_length=6)
+    reranker = Reranker(model, top_k=1)
+
+    reranker.score(["a query"], [_chunk("one two three four five", 0.0)])
+
+    # 6 tokens - 2 query tokens - 3 special tokens leaves 1 passage token
+    assert model.calls[0] == [("a query", "one")]
+
+
+def test_stops_once_the_dense_gap_is_wide_and_the_top_k_is_stable():
+    dense = [1.0, 0.9, 0.85, 0.1, 0.0]
+    texts = ["p0", "p1", "p2", "p3", "p4"]
+    model = StubScorer({"p0": 1.0, "p1": 5.0, "p2": 0.5, "p3": 9.0, "p4": 9.0})
+
+    def _hits():
+        return [[_chunk(t, d) for t, d in zip(texts, dense)]]
+
+    (hits,) = Reranker(model, top_k=2, step=1, stop_gap=0.5).rerank(["q"], _hits())
+    # p2 left the top-2 unchanged and p3 trails the dense top-2 by 0.8 of the
+    # range, so p3 and p4 are never scored
+    assert [c.chunk_id for c in hits] == ["p1", "p0", "p2"]
+    assert [c.score for c in hits] == [5.0, 1.0, 0.5]
+    assert sum(len(call) for call in model.calls) == 3
+
+    (hits,) = Reranker(model, top_k=2, step=1).rerank(["q"], _hits())
+    assert [c.chunk_id for c in hits][:2] == ["p3", "p4"]
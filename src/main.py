@@ -1,12 +1,17 @@
+import json
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from src.drug_matching.matcher import DrugMatcher
 from src.condition_extractor.extractor import ConditionExtractor
 from src.condition_extractor.schemas import Condition as ConditionSchema
 from src.guideline_retriever.retriever import GuidelineRetriever
-from src.rag_generator.generator import RAGGenerator
+from src.rag_generator.generator import RAGGenerator, parse_reply
 from src.guideline_formatter.formatter import to_markdown
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="RAG-Med Assistant")
 
 app.add_middleware(
@@ -30,13 +35,76 @@ async def diagnose(medicines: list[str]):
     print(f"Received medicines: {medicines}")
     drugs = [matcher.match(m) for m in medicines]
     flat = [d for sub in drugs for d in sub]
-    return {"matched_drugs": [d.dict() for d in flat]}
+    return {"matched_drugs": [d.model_dump() for d in flat]}
 
 
 @app.post("/guidelines")
-async def guidelines(conditions: list[ConditionSchema]):
-    """Step 2+3+4: conditions → chunks → LLM → formatted"""
+def guidelines(conditions: list[ConditionSchema]):
+    """
+    Step 2+3+4: conditions → chunks → LLM → formatted. Sync, so FastAPI runs
+    it on its threadpool and concurrent requests can share a generate batch.
+    """
     print(f"Received conditions: {conditions}")
-    chunks = retriever.retrieve(conditions)
-    guideline = generator.generate(conditions, chunks)
-    return {"guideline": guideline.dict(), "markdown": to_markdown(guideline)}
+    chunks, index_version = retriever.retrieve(conditions)
+    guideline = generator.generate(conditions, chunks, index_version)
+    return {"guideline": guideline.model_dump(), "markdown": to_markdown(guideline)}
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/guidelines/stream")
+def guidelines_stream(conditions: list[ConditionSchema]):
+    """
+    /guidelines as Server-Sent Events: a `token` event per decoded text
+    piece as the model produces it, then one `guideline` event with the
+    parsed guideline and its markdown (the /guidelines response body). A
+    cached answer is sent as the `guideline` event alone. If generation
+    fails part-way, an `error` event carries the message and the guideline
+    parsed from the reply so far instead, and nothing is cached.
+    """
+    print(f"Received conditions (stream): {conditions}")
+    chunks, index_version = retriever.retrieve(conditions)
+
+    def events():
+        guideline = generator.cached(conditions, chunks, index_version)
+        if guideline is None:
+            pieces = []
+            try:
+                for piece in generator.stream(conditions, chunks):
+                    pieces.append(piece)
+                    yield _sse("token", piece)
+            except Exception as exc:
+                logger.exception("Streaming generation failed")
+                partial = parse_reply("".join(pieces), chunks)
+                yield _sse(
+                    "error",
+                    {
+                        "detail": str(exc),
+                        "guideline": partial.model_dump(),
+                        "markdown": to_markdown(partial),
+                    },
+                )
+                return
+            guideline = parse_reply("".join(pieces), chunks)
+            generator.remember(conditions, chunks, index_version, guideline)
+        yield _sse(
+            "guideline",
+            {"guideline": guideline.model_dump(), "markdown": to_markdown(guideline)},
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Cache hit ratios and sizes, and generation latency, for monitoring."""
+    return {
+        "retriever_cache": retriever.cache_stats(),
+        "generator": generator.latency_stats(),
+    }
@@ -1,28 +1,32 @@
 import PyPDF2
 
-def extract_text_from_pdf(pdf_path):
-    text = ""
+
+def extract_pages(pdf_path):
+    """Return the text of each page, in order ("" for pages without a text layer)."""
+    pages = []
     try:
         with open(pdf_path, 'rb') as f:
             reader = PyPDF2.PdfReader(f)
             for page in reader.pages:
-                text += page.extract_text() or ""
+                pages.append(page.extract_text() or "")
     except Exception as e:
         print(f"Error extracting text from {pdf_path}: {e}")
-    return text
+    return pages
 
-def chunk_text(text, chunk_size=1000, overlap=100):
+def extract_text_from_pdf(pdf_path):
+    return "".join(extract_pages(pdf_path))
+
+def process_pdf_to_chunks(pdf_path, chunker):
+    """
+    Split a PDF into token windows with a `TokenChunker`, all pages in one batch.
+    Each chunk is {"text", "page" (1-based), "char_start", "char_end"}, with
+    offsets relative to the page text.
+    """
+    pages = extract_pages(pdf_path)
     chunks = []
-    if not text:
-        return chunks
-    
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
+    for page_no, (text, spans) in enumerate(zip(pages, chunker.spans(pages)), start=1):
+        for start, end in spans:
+            chunks.append(
+                {"text": text[start:end], "page": page_no, "char_start": start, "char_end": end}
+            )
     return chunks
-
-def process_pdf_to_chunks(pdf_path, chunk_size=1000, overlap=100):
-    full_text = extract_text_from_pdf(pdf_path)
-    return chunk_text(full_text, chunk_size, overlap)
\ No newline at end of file
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional
+
+from src.condition_extractor.schemas import Condition
+from src.guideline_retriever.context_table import condition_set_key
+from src.guideline_retriever.schemas import RetrievedChunk
+
+# Bumped when the table layout changes; older files are emptied on open
+_SCHEMA_VERSION = 2
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT NOT NULL,
+    version TEXT NOT NULL,
+    index_version TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (key, version, index_version)
+);
+CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+"""
+
+
+def answer_key(conditions: List[Condition], chunks: List[RetrievedChunk]) -> str:
+    """
+    Normalised, sorted condition set + the retrieved chunks (IDs are content
+    hashes; order and sources shape the prompt and references too).
+    """
+    payload = [
+        [list(pair) for pair in condition_set_key(conditions)],
+        [[c.chunk_id, c.source_file] for c in chunks],
+    ]
+    return hashlib.blake2b(json.dumps(payload).encode(), digest_size=16).hexdigest()
+
+
+class AnswerCache:
+    """
+    Generated guidelines persisted in one SQLite file, shared by every
+    worker process that opens it (WAL mode, so readers never block on the
+    writer).
+
+    Rows are keyed by the answer key, the model/prompt `version` they were
+    generated with and the index version they were retrieved from, and reads
+    only match their own. Workers on different versions (mid-deploy, or
+    either side of a re-index) share the file without deleting each other's
+    rows; answers for versions no longer read simply age out. Entries expire
+    `ttl_seconds` after they were written, and once the values exceed
+    `max_bytes` the least recently read are evicted.
+    """
+
+    def __init__(
+        self, path: Path, max_bytes: int, ttl_seconds: float, version: str
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._db = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            # One transaction, so workers starting together migrate once
+            self._db.execute("BEGIN IMMEDIATE")
+            (schema,) = self._db.execute("PRAGMA user_version").fetchone()
+            if schema != _SCHEMA_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS answers")
+                self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    self._db.execute(statement)
+            self._db.execute("COMMIT")
+
+    def get(self, key: str, index_version: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM answers WHERE key = ? AND version = ? "
+                "AND index_version = ? AND created > ?",
+                (key, self.version, index_version, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute(
+                "UPDATE answers SET last_used = ? WHERE key = ? AND version = ? "
+                "AND index_version = ?",
+                (now, key, self.version, index_version),
+            )
+        return json.loads(row[0])
+
+    def put(self, key: str, index_version: str, value: dict) -> None:
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "DELETE FROM answers WHERE created <= ?", (now - self.ttl,)
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, self.version, index_version, data, len(data), now, now),
+                )
+                self._evict()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM answers"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        # Walk from least recently read until enough bytes are freed
+        excess, victims = total - self.max_bytes, []
+        for rowid, size in self._db.execute(
+            "SELECT rowid, size FROM answers ORDER BY last_used"
+        ):
+            victims.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM answers WHERE rowid = ?", victims)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers"
+            ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,274 @@
+"""
+Text-generation backends behind `RAGGenerator`, picked by LLM_BACKEND.
+
+* "transformers": the Hugging Face model from `load_model_and_tokenizer`
+  (4-bit bitsandbytes on GPU); batched `generate`, streaming through a
+  `TextIteratorStreamer` fed from a worker thread.
+* "llama_cpp": a GGUF model (int4/int8, e.g. Q4_K_M or Q8_0) run in-process
+  by llama.cpp on CPU, using LLM_THREADS threads (0 → every core). Needs the
+  `llamacpp` extra.
+
+Both take finished prompt strings and return the decoded reply only, so the
+prompt building and reply parsing in `generator.py` are shared.
+
+Every prompt starts with the same instruction preamble. `warm_prefix` lets a
+backend prefill it once: the transformers backend keeps the preamble's
+key/value cache and starts each request, or each row of a batch, from a copy
+of it; llama.cpp already skips re-evaluating the longest prefix a prompt
+shares with the previous one, so it needs nothing extra.
+"""
+
+import copy
+import os
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from queue import Queue
+from threading import Event, Lock, Thread
+from typing import Iterator, List, Optional
+
+LLM_BACKENDS = ("transformers", "llama_cpp")
+
+
+class GenerationBackend(ABC):
+    @abstractmethod
+    def generate(self, prompts: List[str]) -> List[str]:
+        """Reply to every prompt, in order."""
+
+    @abstractmethod
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Reply to one prompt as decoded text pieces, as they are produced."""
+
+    def warm_prefix(self, prefix: str) -> None:
+        """Precompute whatever can be reused across prompts starting with `prefix`."""
+
+    def stats(self) -> dict:
+        return {}
+
+
+class TransformersBackend(GenerationBackend):
+    def __init__(self, max_tokens: int, temperature: float) -> None:
+        from .model_loader import load_model_and_tokenizer
+
+        self.model, self.tokenizer = load_model_and_tokenizer()
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.prefix: Optional[str] = None
+        self.prefix_ids = None
+        self.prefix_cache = None
+        self.prefix_prefill = 0.0  # seconds, measured once in warm_prefix
+        self.prefix_reuses = 0
+
+    def warm_prefix(self, prefix: str) -> None:
+        import torch
+
+        ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to(
+            self.model.device
+        )
+        start = time.perf_counter()
+        with torch.no_grad():
+            out = self.model(input_ids=ids, use_cache=True)
+        self.prefix_prefill = time.perf_counter() - start
+        self.prefix, self.prefix_ids = prefix, ids
+        self.prefix_cache = out.past_key_values
+
+    def _inputs(self, prompts: List[str]) -> dict:
+        """
+        Model inputs for a batch. If every prompt starts with the warmed
+        prefix, each row is prefix + left-padded rest, so the prefix keeps
+        the positions its cache was computed at, and the prefix cache comes
+        along copied once per row: `generate` only prefills the rests. The
+        pads between prefix and rest are masked out of attention and the
+        position IDs, which follow the attention mask.
+        """
+        import torch
+
+        prefixed = self.prefix_cache is not None and all(
+            p.startswith(self.prefix) for p in prompts
+        )
+        if not prefixed:
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+            return dict(inputs.to(self.model.device))
+        rest = self.tokenizer(
+            [p[len(self.prefix) :] for p in prompts],
+            return_tensors="pt",
+            padding=True,
+            add_special_tokens=False,
+        ).to(self.model.device)
+        prefix_ids = self.prefix_ids.expand(len(prompts), -1)
+        self.prefix_reuses += len(prompts)
+        return {
+            "input_ids": torch.cat([prefix_ids, rest.input_ids], dim=-1),
+            "attention_mask": torch.cat(
+                [torch.ones_like(prefix_ids), rest.attention_mask], dim=-1
+            ),
+            # generate() extends the cache in place; the original stays clean
+            "past_key_values": _repeat_cache(self.prefix_cache, len(prompts)),
+        }
+
+    def stats(self) -> dict:
+        if self.prefix_cache is None:
+            return {"prefix_cache": None}
+        prefill_ms = 1000 * self.prefix_prefill
+        return {
+            "prefix_cache": {
+                "prefix_tokens": int(self.prefix_ids.shape[-1]),
+                "prefix_prefill_ms": round(prefill_ms, 1),
+                "reuses": self.prefix_reuses,
+                # Not measured per request: the one-off prefix prefill time
+                # times the rows that skipped it
+                "prefill_saved_ms_estimate": round(prefill_ms * self.prefix_reuses, 1),
+            }
+        }
+
+    def _gen_config(self):
+        from transformers import GenerationConfig
+
+        return GenerationConfig(
+            max_new_tokens=self.max_tokens,
+            temperature=self.temperature,
+            do_sample=True,
+            pad_token_id=self.tokenizer.eos_token_id,
+        )
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        import torch
+
+        inputs = self._inputs(prompts)
+        with torch.no_grad():
+            output_ids = self.model.generate(
+                **inputs, generation_config=self._gen_config()
+            )
+        return self.tokenizer.batch_decode(
+            output_ids[:, inputs["input_ids"].shape[-1] :],
+            skip_special_tokens=True,
+        )
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        import torch
+        from transformers import TextIteratorStreamer
+
+        inputs = self._inputs([prompt])
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True
+        )
+
+        def _run() -> None:
+            with torch.no_grad():
+                self.model.generate(
+                    **inputs, generation_config=self._gen_config(), streamer=streamer
+                )
+
+        worker = Thread(target=_run, daemon=True)
+        worker.start()
+        yield from streamer
+        worker.join()
+
+
+def _repeat_cache(cache, n: int):
+    """A copy of a key/value cache with each batch row repeated `n` times."""
+    if hasattr(cache, "batch_repeat_interleave"):  # transformers Cache objects
+        cache = copy.deepcopy(cache)
+        cache.batch_repeat_interleave(n)
+        return cache
+    # Legacy format: a (key, value) tensor pair per layer
+    return tuple(tuple(t.repeat_interleave(n, dim=0) for t in layer) for layer in cache)
+
+
+class LlamaCppBackend(GenerationBackend):
+    """
+    llama.cpp decodes one sequence at a time per context and a context is
+    not thread-safe, so calls are serialised; a batch is replied to prompt
+    by prompt. A stream is produced by a worker thread holding the lock, so
+    a reader that stops early (a dropped SSE client) can't keep it held.
+    """
+
+    def __init__(
+        self,
+        model_path: Path,
+        max_tokens: int,
+        temperature: float,
+        n_ctx: int = 4096,
+        n_threads: int = 0,
+    ) -> None:
+        try:
+            from llama_cpp import Llama
+        except ImportError as exc:
+            raise ImportError(
+                "LLM_BACKEND=llama_cpp needs llama-cpp-python: "
+                "pip install '.[llamacpp]'"
+            ) from exc
+
+        if not Path(model_path).exists():
+            raise FileNotFoundError(
+                f"No GGUF model at {model_path}; set LLM_GGUF_PATH to an int4/int8 "
+                "GGUF file (e.g. one converted and quantised with llama.cpp)."
+            )
+        threads = n_threads or os.cpu_count() or 1
+        self.llm = Llama(
+            model_path=str(model_path),
+            n_ctx=n_ctx,
+            n_threads=threads,
+            n_threads_batch=threads,
+            n_gpu_layers=0,
+            verbose=False,
+        )
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self._lock = Lock()
+
+    def _completion(self, prompt: str, stream: bool):
+        return self.llm.create_completion(
+            prompt,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            stream=stream,
+        )
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        with self._lock:
+            return [self._completion(p, False)["choices"][0]["text"] for p in prompts]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        # text pieces, then None at the end or the exception that ended it
+        pieces: Queue = Queue()
+        stop = Event()
+
+        def _run() -> None:
+            try:
+                with self._lock:
+                    for part in self._completion(prompt, True):
+                        if stop.is_set():
+                            break
+                        pieces.put(part["choices"][0]["text"])
+                pieces.put(None)
+            except Exception as exc:
+                pieces.put(exc)
+
+        Thread(target=_run, daemon=True).start()
+        try:
+            while (piece := pieces.get()) is not None:
+                if isinstance(piece, Exception):
+                    raise piece
+                yield piece
+        finally:
+            # Closed or abandoned early: stop decoding after the current piece
+            stop.set()
+
+
+def load_backend(name: str) -> GenerationBackend:
+    from config.settings import (
+        LLM_CONTEXT,
+        LLM_GGUF_PATH,
+        LLM_THREADS,
+        MAX_TOKENS,
+        REPLY_TEMPERATURE,
+    )
+
+    if name == "transformers":
+        return TransformersBackend(MAX_TOKENS, REPLY_TEMPERATURE)
+    if name == "llama_cpp":
+        return LlamaCppBackend(
+            LLM_GGUF_PATH, MAX_TOKENS, REPLY_TEMPERATURE, LLM_CONTEXT, LLM_THREADS
+        )
+    raise ValueError(f"Unknown LLM_BACKEND: {name} (expected one of {LLM_BACKENDS})")
@@ -1,12 +1,33 @@
-from typing import List
-from transformers import GenerationConfig
-from src.rag_generator.model_loader import load_model_and_tokenizer
-from config.settings import MAX_TOKENS, REPLY_TEMPERATURE
-from src.rag_generator.schemas import PatientGuideline
-from src.guideline_retriever.schemas import RetrievedChunk
-from src.condition_extractor.schemas import Condition
+import hashlib
+import json
 import re
-import torch
+import time
+from collections import deque
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import (
+    ANSWER_CACHE_MB,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_TTL,
+    GEN_BATCH_WAIT_MS,
+    GEN_MAX_BATCH,
+    GEN_MAX_QUEUE,
+    LLM_BACKEND,
+    LLM_GGUF_PATH,
+    LLM_MODEL_NAME,
+    LLM_PREFIX_CACHE,
+    MAX_TOKENS,
+    REPLY_TEMPERATURE,
+)
+from src.condition_extractor.schemas import Condition
+from src.guideline_retriever.schemas import RetrievedChunk
+from src.rag_generator.answer_cache import AnswerCache, answer_key
+from src.rag_generator.backends import load_backend
+from src.rag_generator.scheduler import GenerationScheduler
+from src.rag_generator.schemas import PatientGuideline
 
 SYSTEM_PROMPT = """You are a friendly Bangladeshi doctor.
 Explain the condition in ≤ 200 words, using bullet points for Do's and Don'ts.
@@ -17,42 +38,182 @@ Context:
 
 Condition: {condition}
 Answer:"""
+# Identical for every request, so backends can prefill it once (warm_prefix)
+PROMPT_PREFIX = SYSTEM_PROMPT[: SYSTEM_PROMPT.index("{context}")]
+
+# How many recent generations the latency stats cover
+STATS_WINDOW = 256
+
+
+def answer_version(backend: str) -> str:
+    """Changes with anything that changes the answers: model, decoding or prompt."""
+    if backend == "llama_cpp":
+        path = Path(LLM_GGUF_PATH)
+        st = path.stat() if path.exists() else None
+        model = [str(path), st.st_size if st else 0, st.st_mtime_ns if st else 0]
+    else:
+        model = [LLM_MODEL_NAME]
+    payload = [backend, model, MAX_TOKENS, REPLY_TEMPERATURE, SYSTEM_PROMPT]
+    return hashlib.blake2b(json.dumps(payload).encode(), digest_size=8).hexdigest()
+
+
+def parse_reply(reply: str, chunks: List[RetrievedChunk]) -> PatientGuideline:
+    """Decoded model reply → PatientGuideline."""
+    # Naïve bullet extraction (robust enough for smoke-test)
+    dos = re.findall(r"- Do:\s*(.+)", reply, re.I)
+    donts = re.findall(r"- Don't:\s*(.+)", reply, re.I)
+
+    return PatientGuideline(
+        summary=reply.split("\n")[0] if reply else "",
+        dos=dos,
+        donts=donts,
+        references=[f"WHO {c.source_file}" for c in chunks],
+    )
+
+
+GenerationRequest = Tuple[List[Condition], List[RetrievedChunk]]
 
 
 class RAGGenerator:
-    def __init__(self) -> None:
-        self.model, self.tokenizer = load_model_and_tokenizer()
+    def __init__(
+        self,
+        backend: str = LLM_BACKEND,
+        max_batch: int = GEN_MAX_BATCH,
+        cache: bool = True,
+    ) -> None:
+        """
+        `backend` is an LLM_BACKEND name (see backends.py); `max_batch > 1`
+        batches concurrent `generate()` calls together; `cache=False` turns
+        off the persistent answer cache.
+        """
+        self.backend = load_backend(backend)
+        self.answer_cache = (
+            AnswerCache(
+                ANSWER_CACHE_PATH,
+                ANSWER_CACHE_MB << 20,
+                ANSWER_CACHE_TTL,
+                answer_version(backend),
+            )
+            if cache and ANSWER_CACHE_MB > 0
+            else None
+        )
+        if LLM_PREFIX_CACHE:
+            self.backend.warm_prefix(PROMPT_PREFIX)
+        # seconds, most recent last
+        self.ttft = deque(maxlen=STATS_WINDOW)
+        self.total = deque(maxlen=STATS_WINDOW)
+        self.scheduler = (
+            GenerationScheduler(
+                self.generate_batch, max_batch, GEN_BATCH_WAIT_MS, GEN_MAX_QUEUE
+            )
+            if max_batch > 1
+            else None
+        )
 
-    def generate(
-        self, conditions: List[Condition], chunks: List[RetrievedChunk]
-    ) -> PatientGuideline:
+    @staticmethod
+    def _prompt(conditions: List[Condition], chunks: List[RetrievedChunk]) -> str:
         context = "\n".join(c.text for c in chunks)
         cond_names = ", ".join(c.name for c in conditions)
+        return SYSTEM_PROMPT.format(context=context, condition=cond_names)
 
-        prompt = f"Context:\n{context}\n\nCondition: {cond_names}\nAnswer:"
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+    def cached(
+        self,
+        conditions: List[Condition],
+        chunks: List[RetrievedChunk],
+        index_version: str,
+    ) -> Optional[PatientGuideline]:
+        """The stored answer for this condition set and context, if any."""
+        if self.answer_cache is None:
+            return None
+        value = self.answer_cache.get(answer_key(conditions, chunks), index_version)
+        return PatientGuideline(**value) if value is not None else None
 
-        gen_config = GenerationConfig(
-            max_new_tokens=MAX_TOKENS,
-            temperature=REPLY_TEMPERATURE,
-            do_sample=True,
-            pad_token_id=self.tokenizer.eos_token_id,
-        )
+    def remember(
+        self,
+        conditions: List[Condition],
+        chunks: List[RetrievedChunk],
+        index_version: str,
+        guideline: PatientGuideline,
+    ) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                answer_key(conditions, chunks), index_version, guideline.model_dump()
+            )
 
-        with torch.no_grad():
-            output_ids = self.model.generate(**inputs, generation_config=gen_config)
-        reply = self.tokenizer.decode(
-            output_ids[0][inputs["input_ids"].shape[-1] :],
-            skip_special_tokens=True,
-        )
+    def generate(
+        self,
+        conditions: List[Condition],
+        chunks: List[RetrievedChunk],
+        index_version: str = "",
+    ) -> PatientGuideline:
+        """
+        Blocking; concurrent callers share batched generate calls. Answers
+        are cached per `index_version` (the retriever's), so a re-indexed
+        store never serves answers generated from the old one.
+        """
+        guideline = self.cached(conditions, chunks, index_version)
+        if guideline is not None:
+            return guideline
+        if self.scheduler is not None:
+            guideline = self.scheduler.submit((conditions, chunks))
+        else:
+            guideline = self.generate_batch([(conditions, chunks)])[0]
+        self.remember(conditions, chunks, index_version, guideline)
+        return guideline
 
-        # Naïve bullet extraction (robust enough for smoke-test)
-        dos = re.findall(r"- Do:\s*(.+)", reply, re.I)
-        donts = re.findall(r"- Don't:\s*(.+)", reply, re.I)
+    def generate_batch(
+        self, requests: List[GenerationRequest]
+    ) -> List[PatientGuideline]:
+        """One backend `generate` call for all requests."""
+        prompts = [self._prompt(conditions, chunks) for conditions, chunks in requests]
+        start = time.perf_counter()
+        replies = self.backend.generate(prompts)
+        self.total.append(time.perf_counter() - start)
+        return [
+            parse_reply(reply, chunks) for reply, (_, chunks) in zip(replies, requests)
+        ]
 
-        return PatientGuideline(
-            summary=reply.split("\n")[0] if reply else "",
-            dos=dos,
-            donts=donts,
-            references=[f"WHO {c.source_file}" for c in chunks],
-        )
+    def stream(
+        self, conditions: List[Condition], chunks: List[RetrievedChunk]
+    ) -> Iterator[str]:
+        """
+        Yield the reply as decoded text pieces while the model produces them;
+        join the pieces and `parse_reply` the result for the structured
+        guideline.
+        """
+        start = time.perf_counter()
+        first = True
+        for piece in self.backend.stream(self._prompt(conditions, chunks)):
+            if not piece:
+                continue
+            if first:
+                self.ttft.append(time.perf_counter() - start)
+                first = False
+            yield piece
+        self.total.append(time.perf_counter() - start)
+
+    def latency_stats(self) -> dict:
+        """
+        p50/p95 time-to-first-token (streamed) and per-call generation time,
+        in ms, plus the scheduler's batch size, queue depth and wait time and
+        the backend's estimated prefix-cache savings and the answer cache's
+        hit ratio.
+        """
+
+        def _summary(samples) -> dict:
+            if not samples:
+                return {"count": 0}
+            ms = 1000 * np.asarray(samples.copy())  # appended to by other threads
+            return {
+                "count": len(ms),
+                "p50_ms": round(float(np.percentile(ms, 50)), 1),
+                "p95_ms": round(float(np.percentile(ms, 95)), 1),
+            }
+
+        return {
+            "time_to_first_token": _summary(self.ttft),
+            "generation": _summary(self.total),
+            "batching": self.scheduler.stats() if self.scheduler else None,
+            **self.backend.stats(),
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+        }
@@ -8,7 +8,10 @@ from config.settings import LLM_MODEL_NAME, USE_4BIT_QUANT
 
 
 def load_model_and_tokenizer():
-    if USE_4BIT_QUANT:
+    # bitsandbytes 4-bit and fp16 matmuls need a GPU; on CPU load plain fp32
+    # (or use LLM_BACKEND=llama_cpp for a quantised CPU model)
+    on_gpu = torch.cuda.is_available()
+    if USE_4BIT_QUANT and on_gpu:
         bnb_config = BitsAndBytesConfig(
             load_in_4bit=True,
             bnb_4bit_compute_dtype=torch.float16,
@@ -26,6 +29,6 @@ def load_model_and_tokenizer():
         LLM_MODEL_NAME,
         quantization_config=bnb_config,
         device_map="auto",
-        torch_dtype=torch.float16,
+        torch_dtype=torch.float16 if on_gpu else torch.float32,
     )
     return model, tokenizer
@@ -0,0 +1,93 @@
+import queue
+import time
+from collections import deque
+from concurrent.futures import Future
+from threading import Thread
+from typing import Any, Callable, List
+
+import numpy as np
+
+# How many recent batches the stats cover
+STATS_WINDOW = 256
+
+
+class GenerationScheduler:
+    """
+    Dynamic micro-batching in front of a batched generate function.
+
+    Callers `submit()` one request and block until its result is ready. A
+    worker thread takes the oldest queued request, then keeps collecting
+    until it has `max_batch` of them or `max_wait_ms` has passed since it
+    took the first. It runs `generate_batch` once for the lot and hands each
+    caller its own result (or the exception the batch raised). When the
+    queue holds `max_queue` requests, `submit()` blocks until there is room.
+    """
+
+    def __init__(
+        self,
+        generate_batch: Callable[[List[Any]], List[Any]],
+        max_batch: int = 8,
+        max_wait_ms: float = 20.0,
+        max_queue: int = 64,
+    ) -> None:
+        self.generate_batch = generate_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.queue: queue.Queue = queue.Queue(maxsize=max(0, max_queue))
+        self.batch_sizes = deque(maxlen=STATS_WINDOW)
+        self.queue_depths = deque(maxlen=STATS_WINDOW)
+        self.waits = deque(maxlen=STATS_WINDOW)  # seconds, per request
+        self._worker = Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, request: Any) -> Any:
+        future: Future = Future()
+        self.queue.put((request, future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self) -> list:
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self.batch_sizes.append(len(batch))
+            self.queue_depths.append(self.queue.qsize())
+            self.waits.extend(started - queued for _, _, queued in batch)
+            try:
+                results = self.generate_batch([request for request, _, _ in batch])
+            except Exception as exc:
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        # Copies: the worker thread keeps appending
+        sizes, depths = self.batch_sizes.copy(), self.queue_depths.copy()
+        waits = 1000 * np.asarray(self.waits.copy())
+        return {
+            "batches": len(sizes),
+            "mean_batch_size": round(float(np.mean(sizes)), 2) if sizes else 0,
+            "max_batch_size": max(sizes, default=0),
+            "queue_depth": self.queue.qsize(),
+            "mean_queue_depth": round(float(np.mean(depths)), 2) if depths else 0,
+            **{
+                f"wait_p{q}_ms": (
+                    round(float(np.percentile(waits, q)), 1) if len(waits) else 0
+                )
+                for q in (50, 95)
+            },
+        }
@@ -0,0 +1,94 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from rag_generator import answer_cache as answer_cache_module
+from rag_generator.answer_cache import AnswerCache, answer_key
+from src.condition_extractor.schemas import Condition
+from src.guideline_retriever.schemas import RetrievedChunk
+
+
+def _clock(monkeypatch) -> list:
+    now = [1000.0]
+    fake_time = SimpleNamespace(time=lambda: now[0])
+    monkeypatch.setattr(answer_cache_module, "time", fake_time)
+    return now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = _clock(monkeypatch)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = AnswerCache(Path(tmp_dir) / "answers.db", 1 << 20, 60, "m1")
+        cache.put("k", "i1", {"summary": "Rest"})
+
+        now[0] += 59
+        assert cache.get("k", "i1") == {"summary": "Rest"}
+        now[0] += 2
+        assert cache.get("k", "i1") is None
+
+        # Expired rows are cleared on the next write
+        cache.put("other", "i1", {})
+        assert cache.stats()["entries"] == 1
+
+
+def test_size_cap_evicts_least_recently_read(monkeypatch):
+    now = _clock(monkeypatch)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        value = {"summary": "x" * 80}
+        cache = AnswerCache(Path(tmp_dir) / "answers.db", 300, 3600, "m1")
+        for key in ("a", "b", "c"):
+            now[0] += 1
+            cache.put(key, "i1", value)
+        now[0] += 1
+        assert cache.get("a", "i1") == value  # b is now the least recently read
+
+        now[0] += 1
+        cache.put("d", "i1", value)
+
+        assert cache.get("b", "i1") is None
+        assert all(cache.get(k, "i1") == value for k in ("a", "c", "d"))
+        assert cache.stats()["bytes"] <= 300
+
+
+def test_versions_are_isolated_without_wiping_each_other():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "answers.db"
+        old = AnswerCache(path, 1 << 20, 3600, "m1")
+        old.put("k", "i1", {"summary": "old model"})
+        new = AnswerCache(path, 1 << 20, 3600, "m2")
+        new.put("k", "i2", {"summary": "new model, new index"})
+
+        # Each worker only reads its own model and index version...
+        assert old.get("k", "i2") is None
+        assert new.get("k", "i1") is None
+        # ...and neither opening nor writing dropped the other's rows
+        assert old.get("k", "i1") == {"summary": "old model"}
+        assert new.get("k", "i2") == {"summary": "new model, new index"}
+        old.put("k", "i3", {"summary": "old model, re-indexed"})
+        assert new.get("k", "i2") == {"summary": "new model, new index"}
+        assert new.stats()["entries"] == 3
+
+
+def test_files_from_an_older_layout_are_emptied():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "answers.db"
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE answers (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute("INSERT INTO answers VALUES ('k', '{}')")
+        db.commit()
+        db.close()
+
+        cache = AnswerCache(path, 1 << 20, 3600, "m1")
+        assert cache.stats()["entries"] == 0
+        cache.put("k", "i1", {})
+        assert cache.get("k", "i1") == {}
+
+
+def test_answer_key_ignores_condition_order():
+    chunks = [RetrievedChunk(text="t", source_file="a.json", score=1.0, chunk_id="c1")]
+    dengue = Condition(name="Dengue", icd10="A90", confidence=1.0)
+    flu = Condition(name="Influenza", icd10="J11", confidence=1.0)
+
+    assert answer_key([dengue, flu], chunks) == answer_key([flu, dengue], chunks)
+    assert answer_key([dengue], chunks) != answer_key([dengue], chunks[:0])
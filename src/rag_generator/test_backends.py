@@ -0,0 +1,202 @@
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from rag_generator.backends import LlamaCppBackend, TransformersBackend
+
+
+class FakeLlama:
+    """Streams one word at a time; every word after the first waits for `gate`."""
+
+    def __init__(self, **kwargs) -> None:
+        self.streamed = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def create_completion(self, prompt, max_tokens, temperature, stream):
+        words = [f"w{i} " for i in range(max_tokens)]
+        if not stream:
+            return {"choices": [{"text": "".join(words)}]}
+        return self._stream(words)
+
+    def _stream(self, words):
+        for word in words:
+            if self.streamed:
+                self.gate.wait(5)
+            if word == "fail ":
+                raise RuntimeError("decode failed")
+            self.streamed += 1
+            yield {"choices": [{"text": word}]}
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setitem(sys.modules, "llama_cpp", SimpleNamespace(Llama=FakeLlama))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model = Path(tmp_dir) / "model.gguf"
+        model.touch()
+        yield LlamaCppBackend(model, max_tokens=3, temperature=0.0)
+
+
+def _generate_within(backend, seconds=5):
+    result = []
+    worker = threading.Thread(target=lambda: result.append(backend.generate(["p"])))
+    worker.start()
+    worker.join(seconds)
+    assert result, "generate() blocked on the stream's lock"
+    return result[0]
+
+
+def test_stream_yields_every_piece(backend):
+    assert list(backend.stream("p")) == ["w0 ", "w1 ", "w2 "]
+
+
+def test_abandoned_stream_does_not_hold_the_lock(backend):
+    pieces = backend.stream("p")
+    assert next(pieces) == "w0 "
+    # Never read again nor closed, like a client that went away mid-stream
+    assert _generate_within(backend) == ["w0 w1 w2 "]
+    del pieces
+
+
+def test_closed_stream_stops_decoding(backend):
+    backend.max_tokens = 10_000
+    backend.llm.gate.clear()
+    pieces = backend.stream("p")
+    assert next(pieces) == "w0 "
+    pieces.close()
+    backend.llm.gate.set()
+
+    backend.max_tokens = 3
+    assert _generate_within(backend) == ["w0 w1 w2 "]
+    assert backend.llm.streamed < 10
+
+
+def test_stream_error_reaches_the_reader_and_frees_the_lock(backend):
+    backend.llm._stream = lambda words: FakeLlama._stream(
+        backend.llm, ["w0 ", "fail "]
+    )
+    pieces = backend.stream("p")
+    assert next(pieces) == "w0 "
+    with pytest.raises(RuntimeError, match="decode failed"):
+        next(pieces)
+    assert _generate_within(backend) == ["w0 w1 w2 "]
+
+
+class FakeEncoding(dict):
+    """BatchEncoding stand-in: a dict of tensors with attribute access."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def to(self, device):
+        return self
+
+
+class FakeTokenizer:
+    """One token per character (its code point) after BOS 1; pads on the left with 0."""
+
+    def __call__(
+        self, texts, return_tensors="pt", padding=False, add_special_tokens=True
+    ):
+        import torch
+
+        if isinstance(texts, str):
+            texts = [texts]
+        ids = [([1] if add_special_tokens else []) + [ord(c) for c in t] for t in texts]
+        width = max(map(len, ids))
+        return FakeEncoding(
+            input_ids=torch.tensor([[0] * (width - len(r)) + r for r in ids]),
+            attention_mask=torch.tensor(
+                [[0] * (width - len(r)) + [1] * len(r) for r in ids]
+            ),
+        )
+
+
+class FakeModel:
+    """
+    Decoder stand-in with one legacy-format layer whose key/value entry for
+    a token is token·1000 + position, the position following the attention
+    mask as in `generate`.
+    """
+
+    device = "cpu"
+
+    def __call__(self, input_ids, attention_mask=None, past_key_values=None, **kw):
+        import torch
+
+        if past_key_values is not None:
+            past = past_key_values[0][0]
+        else:
+            past = input_ids.new_zeros((len(input_ids), 1, 0, 1))
+        if attention_mask is None:
+            attention_mask = torch.ones(
+                (len(input_ids), past.shape[2] + input_ids.shape[1]), dtype=torch.long
+            )
+        positions = (attention_mask.cumsum(-1) - 1)[:, -input_ids.shape[1] :]
+        kv = (input_ids * 1000 + positions)[:, None, :, None]
+        key = torch.cat([past, kv], dim=2)
+        return SimpleNamespace(past_key_values=((key, key),))
+
+
+def _prefill(model, inputs):
+    """What `generate` attends to for each row: its unmasked cache entries."""
+    past = inputs.get("past_key_values")
+    done = past[0][0].shape[2] if past is not None else 0
+    out = model(
+        input_ids=inputs["input_ids"][:, done:],
+        attention_mask=inputs["attention_mask"],
+        past_key_values=past,
+    )
+    key = out.past_key_values[0][0][:, 0, :, 0]
+    mask = inputs["attention_mask"].bool()
+    return [row[m].tolist() for row, m in zip(key, mask)]
+
+
+def _transformers_backend(prefix=None):
+    backend = TransformersBackend.__new__(TransformersBackend)
+    backend.model, backend.tokenizer = FakeModel(), FakeTokenizer()
+    backend.prefix = backend.prefix_ids = backend.prefix_cache = None
+    backend.prefix_prefill = 0.0
+    backend.prefix_reuses = 0
+    if prefix is not None:
+        backend.warm_prefix(prefix)
+    return backend
+
+
+def test_prefix_cache_inputs_match_the_uncached_path():
+    pytest.importorskip("torch")
+    prefix = "You are a doctor.\nContext:\n"
+    prompts = [prefix + "dengue", prefix + "acute watery diarrhoea", prefix + "flu"]
+    plain = _transformers_backend()
+    cached = _transformers_backend(prefix)
+
+    inputs = cached._inputs(prompts)
+
+    # Prefix, then each rest left-padded to the longest one
+    assert inputs["input_ids"].shape == plain._inputs(prompts)["input_ids"].shape
+    assert inputs["past_key_values"][0][0].shape[0] == len(prompts)
+    # Same tokens at the same positions as without the cache, pads masked out
+    expected = _prefill(plain.model, plain._inputs(prompts))
+    assert _prefill(cached.model, inputs) == expected
+    # The warmed cache is copied per batch, never extended in place
+    assert cached.prefix_cache[0][0].shape[0] == 1
+    assert cached.prefix_cache[0][0].shape[2] == len(prefix) + 1
+    assert cached.stats()["prefix_cache"]["reuses"] == len(prompts)
+
+
+def test_prompts_without_the_prefix_skip_the_cache():
+    pytest.importorskip("torch")
+    backend = _transformers_backend("You are a doctor.\n")
+
+    inputs = backend._inputs(["You are a doctor.\nflu", "Something else"])
+
+    assert "past_key_values" not in inputs
+    assert backend.prefix_reuses == 0
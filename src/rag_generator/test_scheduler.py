@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rag_generator.scheduler import GenerationScheduler
+
+
+class FakeBackend:
+    """Batched generate function that records each batch it is handed."""
+
+    def __init__(self, fail_on=None) -> None:
+        self.batches = []
+        self.fail_on = fail_on
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, requests):
+        self.started.set()
+        self.release.wait(5)
+        self.batches.append(list(requests))
+        if self.fail_on in requests:
+            raise ValueError(f"bad request {self.fail_on}")
+        return [f"reply to {r}" for r in requests]
+
+
+def test_concurrent_requests_share_a_batch():
+    backend = FakeBackend()
+    backend.release.clear()
+    scheduler = GenerationScheduler(backend, max_batch=4, max_wait_ms=200)
+    with ThreadPoolExecutor(8) as pool:
+        first = pool.submit(scheduler.submit, 0)
+        backend.started.wait(5)
+        # Queued while the first batch runs: collected together afterwards
+        rest = [pool.submit(scheduler.submit, i) for i in range(1, 5)]
+        while scheduler.queue.qsize() < 4:
+            time.sleep(0.001)
+        backend.release.set()
+        replies = [first.result(5)] + [f.result(5) for f in rest]
+
+    assert replies == [f"reply to {i}" for i in range(5)]
+    assert [len(b) for b in backend.batches] == [1, 4]
+    stats = scheduler.stats()
+    assert stats["batches"] == 2 and stats["max_batch_size"] == 4
+
+
+def test_max_wait_flushes_a_partial_batch():
+    backend = FakeBackend()
+    scheduler = GenerationScheduler(backend, max_batch=8, max_wait_ms=20)
+
+    start = time.perf_counter()
+    assert scheduler.submit("only") == "reply to only"
+    elapsed = time.perf_counter() - start
+
+    assert backend.batches == [["only"]]
+    assert 0.015 <= elapsed < 2
+
+
+def test_batch_error_reaches_every_caller_and_the_worker_survives():
+    backend = FakeBackend(fail_on=1)
+    backend.release.clear()
+    scheduler = GenerationScheduler(backend, max_batch=4, max_wait_ms=200)
+    with ThreadPoolExecutor(4) as pool:
+        blocker = pool.submit(scheduler.submit, 0)
+        backend.started.wait(5)
+        futures = [pool.submit(scheduler.submit, i) for i in (1, 2)]
+        while scheduler.queue.qsize() < 2:
+            time.sleep(0.001)
+        backend.release.set()
+        assert blocker.result(5) == "reply to 0"
+        for future in futures:
+            with pytest.raises(ValueError, match="bad request 1"):
+                future.result(5)
+
+    assert scheduler.submit(3) == "reply to 3"
@@ -0,0 +1,121 @@
+import importlib
+import json
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+for _module in (
+    "src.drug_matching.matcher",
+    "src.condition_extractor.extractor",
+    "src.guideline_retriever.retriever",
+    "src.rag_generator.generator",
+):
+    pytest.importorskip(_module)
+
+from fastapi.testclient import TestClient
+
+from src.guideline_retriever.schemas import RetrievedChunk
+from src.rag_generator.generator import parse_reply
+
+CONDITIONS = [{"name": "Dengue", "icd10": None, "confidence": 0.9}]
+CHUNK = RetrievedChunk(text="Drink fluids", source_file="dengue.json", score=0.8)
+# Bullet markers split across pieces, as a tokenizer would
+PIECES = ["Drink", " water\n- D", "o: rest\n- Don", "'t: smoke"]
+
+
+class FakeRetriever:
+    def retrieve(self, conditions):
+        return [CHUNK.model_copy()], "v1"
+
+
+class FakeGenerator:
+    """Streams PIECES (raising after `fail_after` of them) and remembers answers."""
+
+    def __init__(self) -> None:
+        self.fail_after = None
+        self.streams = 0
+        self.answers = {}
+
+    def cached(self, conditions, chunks, index_version):
+        return self.answers.get(index_version)
+
+    def remember(self, conditions, chunks, index_version, guideline):
+        self.answers[index_version] = guideline
+
+    def stream(self, conditions, chunks):
+        self.streams += 1
+        for i, piece in enumerate(PIECES):
+            if i == self.fail_after:
+                raise RuntimeError("model went away")
+            yield piece
+
+
+@pytest.fixture
+def main(monkeypatch):
+    from src.condition_extractor import extractor
+    from src.drug_matching import matcher
+    from src.guideline_retriever import retriever
+    from src.rag_generator import generator
+
+    monkeypatch.setattr(matcher, "DrugMatcher", lambda: None)
+    monkeypatch.setattr(extractor, "ConditionExtractor", lambda: None)
+    monkeypatch.setattr(retriever, "GuidelineRetriever", FakeRetriever)
+    monkeypatch.setattr(generator, "RAGGenerator", FakeGenerator)
+    sys.modules.pop("src.main", None)
+    yield importlib.import_module("src.main")
+    sys.modules.pop("src.main", None)
+
+
+def _events(text: str):
+    """(event, data) pairs of an SSE body, checking each frame's layout."""
+    events = []
+    assert text.endswith("\n\n")
+    for frame in text[:-2].split("\n\n"):
+        event, data = frame.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        events.append((event[len("event: ") :], json.loads(data[len("data: ") :])))
+    return events
+
+
+def test_tokens_then_the_parsed_guideline(main):
+    client = TestClient(main.app)
+
+    response = client.post("/guidelines/stream", json=CONDITIONS)
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    assert events[:-1] == [("token", piece) for piece in PIECES]
+    name, data = events[-1]
+    expected = parse_reply("".join(PIECES), [CHUNK])
+    assert name == "guideline" and data["guideline"] == expected.model_dump()
+    assert expected.dos == ["rest"] and expected.donts == ["smoke"]
+    assert data["markdown"]
+    # Cached under the index version the chunks came from
+    assert main.generator.answers["v1"] == expected
+
+
+def test_cached_answer_is_sent_alone(main):
+    client = TestClient(main.app)
+    client.post("/guidelines/stream", json=CONDITIONS)
+
+    events = _events(client.post("/guidelines/stream", json=CONDITIONS).text)
+
+    assert [name for name, _ in events] == ["guideline"]
+    assert main.generator.streams == 1
+
+
+def test_failed_stream_ends_with_an_error_event_and_caches_nothing(main):
+    main.generator.fail_after = 2
+    client = TestClient(main.app)
+
+    events = _events(client.post("/guidelines/stream", json=CONDITIONS).text)
+
+    assert events[:-1] == [("token", piece) for piece in PIECES[:2]]
+    name, data = events[-1]
+    assert name == "error" and data["detail"] == "model went away"
+    # The guideline parsed from the reply so far: the cut-off "- D" is no bullet
+    partial = parse_reply("".join(PIECES[:2]), [CHUNK])
+    assert data["guideline"] == partial.model_dump() and partial.dos == []
+    assert main.generator.answers == {}